@@ -14,7 +14,10 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 from config.database import Base
 
 # Importando modelos
-from models.user import User, TokenBlacklist
+from models import (
+    User, TokenBlacklist, Categoria, CatalogoVersion, Proveedor, Ubicacion, Producto, ProductoToken, Stock,
+    StockSnapshot, TipoMovimiento, MovimientoInventario, MovimientoDiario
+)
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,141 @@
+"""inventory tables and composite indexes
+
+Revision ID: 3f2a8c1d5b7e
+Revises: 9467987bef49
+Create Date: 2026-10-18 12:04:37.218406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f2a8c1d5b7e'
+down_revision: Union[str, None] = '9467987bef49'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Índices que no vienen de ``index=True`` en una columna: (tabla, nombre, columnas)
+INDEXES = [
+    ('movimientos_inventario', 'ix_movimientos_inventario_fecha_id', ['fecha', 'id']),
+    ('movimientos_inventario', 'ix_movimientos_inventario_producto_fecha', ['producto_id', 'fecha']),
+    ('movimientos_inventario', 'ix_movimientos_inventario_tipo_fecha', ['tipo_movimiento_id', 'fecha']),
+    ('movimientos_inventario', 'ix_movimientos_inventario_ubicacion_origen_id', ['ubicacion_origen_id']),
+    ('movimientos_inventario', 'ix_movimientos_inventario_ubicacion_destino_id', ['ubicacion_destino_id']),
+    ('stocks', 'ix_stocks_ubicacion_id', ['ubicacion_id']),
+]
+
+
+def create_tables() -> None:
+    op.create_table('categorias',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('nombre', sa.String(length=100), nullable=True),
+    sa.Column('descripcion', sa.String(length=255), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_categorias_id'), 'categorias', ['id'], unique=False)
+    op.create_index(op.f('ix_categorias_nombre'), 'categorias', ['nombre'], unique=True)
+    op.create_table('proveedores',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('nombre', sa.String(length=100), nullable=True),
+    sa.Column('contacto', sa.String(length=100), nullable=True),
+    sa.Column('telefono', sa.String(length=20), nullable=True),
+    sa.Column('email', sa.String(length=100), nullable=True),
+    sa.Column('direccion', sa.String(length=255), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_proveedores_id'), 'proveedores', ['id'], unique=False)
+    op.create_index(op.f('ix_proveedores_nombre'), 'proveedores', ['nombre'], unique=False)
+    op.create_table('tipos_movimiento',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('codigo', sa.String(length=20), nullable=True),
+    sa.Column('nombre', sa.String(length=100), nullable=True),
+    sa.Column('descripcion', sa.String(length=255), nullable=True),
+    sa.Column('afecta_stock', sa.String(length=10), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('nombre')
+    )
+    op.create_index(op.f('ix_tipos_movimiento_codigo'), 'tipos_movimiento', ['codigo'], unique=True)
+    op.create_index(op.f('ix_tipos_movimiento_id'), 'tipos_movimiento', ['id'], unique=False)
+    op.create_table('ubicaciones',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('nombre', sa.String(length=100), nullable=True),
+    sa.Column('direccion', sa.String(length=255), nullable=True),
+    sa.Column('tipo', sa.String(length=50), nullable=True),
+    sa.Column('activo', sa.Boolean(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_ubicaciones_id'), 'ubicaciones', ['id'], unique=False)
+    op.create_index(op.f('ix_ubicaciones_nombre'), 'ubicaciones', ['nombre'], unique=True)
+    op.create_table('productos',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('codigo', sa.String(length=50), nullable=True),
+    sa.Column('nombre', sa.String(length=100), nullable=True),
+    sa.Column('descripcion', sa.Text(), nullable=True),
+    sa.Column('precio_compra', sa.Float(precision=2), nullable=True),
+    sa.Column('precio_venta', sa.Float(precision=2), nullable=True),
+    sa.Column('unidad_medida', sa.String(length=20), nullable=True),
+    sa.Column('stock_minimo', sa.Integer(), nullable=True),
+    sa.Column('activo', sa.Boolean(), nullable=True),
+    sa.Column('categoria_id', sa.Integer(), nullable=True),
+    sa.Column('proveedor_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['categoria_id'], ['categorias.id'], ),
+    sa.ForeignKeyConstraint(['proveedor_id'], ['proveedores.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_productos_codigo'), 'productos', ['codigo'], unique=True)
+    op.create_index(op.f('ix_productos_id'), 'productos', ['id'], unique=False)
+    op.create_index(op.f('ix_productos_nombre'), 'productos', ['nombre'], unique=False)
+    op.create_table('stocks',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('cantidad', sa.Float(precision=2), nullable=True),
+    sa.Column('producto_id', sa.Integer(), nullable=True),
+    sa.Column('ubicacion_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['producto_id'], ['productos.id'], ),
+    sa.ForeignKeyConstraint(['ubicacion_id'], ['ubicaciones.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('producto_id', 'ubicacion_id', name='uix_producto_ubicacion')
+    )
+    op.create_index(op.f('ix_stocks_id'), 'stocks', ['id'], unique=False)
+    op.create_table('movimientos_inventario',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('fecha', sa.DateTime(), nullable=True),
+    sa.Column('cantidad', sa.Float(precision=2), nullable=False),
+    sa.Column('referencia', sa.String(length=50), nullable=True),
+    sa.Column('observaciones', sa.Text(), nullable=True),
+    sa.Column('tipo_movimiento_id', sa.Integer(), nullable=False),
+    sa.Column('producto_id', sa.Integer(), nullable=False),
+    sa.Column('ubicacion_origen_id', sa.Integer(), nullable=True),
+    sa.Column('ubicacion_destino_id', sa.Integer(), nullable=True),
+    sa.Column('usuario_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['producto_id'], ['productos.id'], ),
+    sa.ForeignKeyConstraint(['tipo_movimiento_id'], ['tipos_movimiento.id'], ),
+    sa.ForeignKeyConstraint(['ubicacion_destino_id'], ['ubicaciones.id'], ),
+    sa.ForeignKeyConstraint(['ubicacion_origen_id'], ['ubicaciones.id'], ),
+    sa.ForeignKeyConstraint(['usuario_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_movimientos_inventario_id'), 'movimientos_inventario', ['id'], unique=False)
+
+
+def upgrade() -> None:
+    # Las bases existentes ya tienen estas tablas (creadas con create_all al
+    # arrancar la aplicación): en ese caso solo faltan los índices compuestos
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('movimientos_inventario'):
+        create_tables()
+        inspector = sa.inspect(op.get_bind())
+
+    for table, name, columns in INDEXES:
+        existing = {index['name'] for index in inspector.get_indexes(table)}
+        if name not in existing:
+            op.create_index(name, table, columns, unique=False)
+
+
+def downgrade() -> None:
+    # Las tablas las crea también create_all, así que solo se quitan los índices
+    for table, name, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,77 @@
+"""token_blacklist: digest del jti y expiración en lugar del JWT completo
+
+Revision ID: 9467987bef49
+Revises: 0c11a0e481fc
+Create Date: 2026-10-18 10:12:41.503118
+
+"""
+from datetime import datetime
+import hashlib
+from typing import Sequence, Union
+
+from alembic import op
+import jwt
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9467987bef49'
+down_revision: Union[str, None] = '0c11a0e481fc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+token_blacklist = sa.table(
+    'token_blacklist',
+    sa.column('id', sa.Integer),
+    sa.column('token', sa.String),
+    sa.column('token_hash', sa.String),
+    sa.column('expires_at', sa.DateTime),
+)
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('token_blacklist') as batch_op:
+        batch_op.add_column(sa.Column('token_hash', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('expires_at', sa.DateTime(), nullable=True))
+
+    # Convertir las filas existentes: las de tokens ya expirados se descartan
+    conn = op.get_bind()
+    now = datetime.utcnow()
+    rows = conn.execute(sa.select(token_blacklist.c.id, token_blacklist.c.token)).fetchall()
+    for row_id, token in rows:
+        try:
+            payload = jwt.decode(token, options={"verify_signature": False, "verify_exp": False})
+        except jwt.PyJWTError:
+            payload = {}
+        exp = payload.get("exp")
+        if exp is None or datetime.utcfromtimestamp(exp) <= now:
+            conn.execute(token_blacklist.delete().where(token_blacklist.c.id == row_id))
+            continue
+        key = payload.get("jti") or token
+        conn.execute(
+            token_blacklist.update()
+            .where(token_blacklist.c.id == row_id)
+            .values(token_hash=hashlib.sha256(key.encode()).hexdigest(), expires_at=datetime.utcfromtimestamp(exp))
+        )
+
+    with op.batch_alter_table('token_blacklist') as batch_op:
+        batch_op.drop_index('ix_token_blacklist_token')
+        batch_op.drop_column('token')
+        batch_op.alter_column('token_hash', existing_type=sa.String(length=64), nullable=False)
+        batch_op.alter_column('expires_at', existing_type=sa.DateTime(), nullable=False)
+        batch_op.create_index('ix_token_blacklist_token_hash', ['token_hash'], unique=True)
+        batch_op.create_index('ix_token_blacklist_expires_at', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    # El JWT completo no puede reconstruirse a partir del digest: las
+    # revocaciones vigentes se pierden al volver a la versión anterior
+    op.execute(token_blacklist.delete())
+    with op.batch_alter_table('token_blacklist') as batch_op:
+        batch_op.drop_index('ix_token_blacklist_expires_at')
+        batch_op.drop_index('ix_token_blacklist_token_hash')
+        batch_op.drop_column('expires_at')
+        batch_op.drop_column('token_hash')
+        batch_op.add_column(sa.Column('token', sa.String(length=500), nullable=True))
+        batch_op.create_index('ix_token_blacklist_token', ['token'], unique=True)
@@ -0,0 +1,26 @@
+"""índice del informe de productos bajo mínimo
+
+Revision ID: a2c9e5d7b3f1
+Revises: f1b8d3c6a4e2
+Create Date: 2026-10-18 18:12:37.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a2c9e5d7b3f1'
+down_revision: Union[str, None] = 'f1b8d3c6a4e2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_productos_stock_minimo', 'productos', ['stock_minimo', 'stock_total'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_productos_stock_minimo', table_name='productos')
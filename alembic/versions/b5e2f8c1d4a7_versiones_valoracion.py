@@ -0,0 +1,28 @@
+"""versión de precios para el informe de valoración
+
+Revision ID: b5e2f8c1d4a7
+Revises: a2c9e5d7b3f1
+Create Date: 2026-10-18 18:47:02.913745
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5e2f8c1d4a7'
+down_revision: Union[str, None] = 'a2c9e5d7b3f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+catalogo_versiones = sa.table('catalogo_versiones', sa.column('tabla', sa.String), sa.column('version', sa.Integer))
+
+
+def upgrade() -> None:
+    op.bulk_insert(catalogo_versiones, [{'tabla': 'precios', 'version': 0}])
+
+
+def downgrade() -> None:
+    op.execute(catalogo_versiones.delete().where(catalogo_versiones.c.tabla == 'precios'))
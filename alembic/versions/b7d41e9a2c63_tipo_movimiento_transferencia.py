@@ -0,0 +1,36 @@
+"""tipos_movimiento.afecta_stock admite 'transferencia'
+
+Revision ID: b7d41e9a2c63
+Revises: 3f2a8c1d5b7e
+Create Date: 2026-10-18 13:22:09.641873
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d41e9a2c63'
+down_revision: Union[str, None] = '3f2a8c1d5b7e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 'transferencia' no cabe en String(10)
+    with op.batch_alter_table('tipos_movimiento') as batch_op:
+        batch_op.alter_column('afecta_stock', existing_type=sa.String(length=10), type_=sa.String(length=20), existing_nullable=False)
+
+
+def downgrade() -> None:
+    tipos_movimiento = sa.table('tipos_movimiento', sa.column('afecta_stock', sa.String))
+    conn = op.get_bind()
+    en_uso = conn.execute(
+        sa.select(sa.func.count()).select_from(tipos_movimiento).where(tipos_movimiento.c.afecta_stock == 'transferencia')
+    ).scalar()
+    if en_uso:
+        raise RuntimeError("Hay tipos de movimiento de transferencia; elimínelos o cámbielos antes de volver atrás")
+    with op.batch_alter_table('tipos_movimiento') as batch_op:
+        batch_op.alter_column('afecta_stock', existing_type=sa.String(length=20), type_=sa.String(length=10), existing_nullable=False)
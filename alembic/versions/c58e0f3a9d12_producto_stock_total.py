@@ -0,0 +1,39 @@
+"""productos.stock_total mantenido
+
+Revision ID: c58e0f3a9d12
+Revises: b7d41e9a2c63
+Create Date: 2026-10-18 14:05:51.372904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c58e0f3a9d12'
+down_revision: Union[str, None] = 'b7d41e9a2c63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('productos') as batch_op:
+        batch_op.add_column(sa.Column('stock_total', sa.Float(precision=2), server_default='0', nullable=False))
+
+    # Valor inicial: la suma actual de todas las ubicaciones
+    productos = sa.table('productos', sa.column('id', sa.Integer), sa.column('stock_total', sa.Float))
+    stocks = sa.table('stocks', sa.column('producto_id', sa.Integer), sa.column('cantidad', sa.Float))
+    op.execute(
+        productos.update().values(stock_total=(
+            sa.select(sa.func.coalesce(sa.func.sum(stocks.c.cantidad), 0))
+            .where(stocks.c.producto_id == productos.c.id)
+            .scalar_subquery()
+        ))
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('productos') as batch_op:
+        batch_op.drop_column('stock_total')
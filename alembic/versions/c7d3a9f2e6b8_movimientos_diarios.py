@@ -0,0 +1,47 @@
+"""movimientos_diarios
+
+Revision ID: c7d3a9f2e6b8
+Revises: b5e2f8c1d4a7
+Create Date: 2026-10-18 19:20:44.671302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d3a9f2e6b8'
+down_revision: Union[str, None] = 'b5e2f8c1d4a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # El historial se rellena después con python -m jobs.movimientos_diarios
+    op.create_table('movimientos_diarios',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('fecha', sa.Date(), nullable=False),
+    sa.Column('entradas', sa.Float(precision=2), nullable=False),
+    sa.Column('salidas', sa.Float(precision=2), nullable=False),
+    sa.Column('movimientos', sa.Integer(), nullable=False),
+    sa.Column('producto_id', sa.Integer(), nullable=False),
+    sa.Column('ubicacion_id', sa.Integer(), nullable=False),
+    sa.Column('tipo_movimiento_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['producto_id'], ['productos.id'], ),
+    sa.ForeignKeyConstraint(['tipo_movimiento_id'], ['tipos_movimiento.id'], ),
+    sa.ForeignKeyConstraint(['ubicacion_id'], ['ubicaciones.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('fecha', 'producto_id', 'ubicacion_id', 'tipo_movimiento_id', name='uix_movimiento_diario')
+    )
+    op.create_index(op.f('ix_movimientos_diarios_id'), 'movimientos_diarios', ['id'], unique=False)
+    op.create_index('ix_movimientos_diarios_producto_fecha', 'movimientos_diarios', ['producto_id', 'fecha'], unique=False)
+    op.create_index('ix_movimientos_diarios_ubicacion_fecha', 'movimientos_diarios', ['ubicacion_id', 'fecha'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_movimientos_diarios_ubicacion_fecha', table_name='movimientos_diarios')
+    op.drop_index('ix_movimientos_diarios_producto_fecha', table_name='movimientos_diarios')
+    op.drop_index(op.f('ix_movimientos_diarios_id'), table_name='movimientos_diarios')
+    op.drop_table('movimientos_diarios')
@@ -0,0 +1,39 @@
+"""stock_snapshots
+
+Revision ID: d93b6a4e1f08
+Revises: c58e0f3a9d12
+Create Date: 2026-10-18 14:48:16.905127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd93b6a4e1f08'
+down_revision: Union[str, None] = 'c58e0f3a9d12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('stock_snapshots',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('fecha', sa.DateTime(), nullable=False),
+    sa.Column('cantidad', sa.Float(precision=2), nullable=False),
+    sa.Column('producto_id', sa.Integer(), nullable=False),
+    sa.Column('ubicacion_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['producto_id'], ['productos.id'], ),
+    sa.ForeignKeyConstraint(['ubicacion_id'], ['ubicaciones.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_stock_snapshots_id'), 'stock_snapshots', ['id'], unique=False)
+    op.create_index('ix_stock_snapshots_fecha_ubicacion', 'stock_snapshots', ['fecha', 'ubicacion_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_stock_snapshots_fecha_ubicacion', table_name='stock_snapshots')
+    op.drop_index(op.f('ix_stock_snapshots_id'), table_name='stock_snapshots')
+    op.drop_table('stock_snapshots')
@@ -0,0 +1,36 @@
+"""catalogo_versiones
+
+Revision ID: e4c7f2a9b1d6
+Revises: d93b6a4e1f08
+Create Date: 2026-10-18 16:22:41.530918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4c7f2a9b1d6'
+down_revision: Union[str, None] = 'd93b6a4e1f08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    catalogo_versiones = op.create_table('catalogo_versiones',
+    sa.Column('tabla', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('tabla')
+    )
+    # Las filas se crean también al primer cambio; así la primera escritura
+    # no tiene que insertarlas
+    op.bulk_insert(catalogo_versiones, [
+        {'tabla': tabla, 'version': 0}
+        for tabla in ('categorias', 'proveedores', 'ubicaciones', 'tipos_movimiento', 'productos')
+    ])
+
+
+def downgrade() -> None:
+    op.drop_table('catalogo_versiones')
@@ -0,0 +1,60 @@
+"""producto_tokens
+
+Revision ID: f1b8d3c6a4e2
+Revises: e4c7f2a9b1d6
+Create Date: 2026-10-18 17:41:09.264173
+
+"""
+import re
+import unicodedata
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1b8d3c6a4e2'
+down_revision: Union[str, None] = 'e4c7f2a9b1d6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def tokens(*textos):
+    # Copia de utils.productos.tokens_busqueda en el momento de esta revisión
+    resultado = []
+    for texto in textos:
+        texto = unicodedata.normalize("NFKD", texto or "").encode("ascii", "ignore").decode().lower()
+        resultado += [token[:50] for token in re.findall(r"[a-z0-9]+", texto)]
+    return list(dict.fromkeys(resultado))
+
+
+def upgrade() -> None:
+    producto_tokens = op.create_table('producto_tokens',
+    sa.Column('token', sa.String(length=50), nullable=False),
+    sa.Column('producto_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['producto_id'], ['productos.id'], ),
+    sa.PrimaryKeyConstraint('token', 'producto_id')
+    )
+    op.create_index('ix_producto_tokens_producto_id', 'producto_tokens', ['producto_id'], unique=False)
+
+    # Indexar los productos existentes por bloques
+    productos = sa.table('productos', sa.column('id', sa.Integer), sa.column('codigo', sa.String), sa.column('nombre', sa.String))
+    bind = op.get_bind()
+    ultimo = 0
+    while True:
+        filas = bind.execute(
+            sa.select(productos.c.id, productos.c.codigo, productos.c.nombre)
+            .where(productos.c.id > ultimo).order_by(productos.c.id).limit(5000)
+        ).all()
+        if not filas:
+            break
+        lote = [{'token': token, 'producto_id': fila.id} for fila in filas for token in tokens(fila.codigo, fila.nombre)]
+        if lote:
+            bind.execute(producto_tokens.insert(), lote)
+        ultimo = filas[-1].id
+
+
+def downgrade() -> None:
+    op.drop_index('ix_producto_tokens_producto_id', table_name='producto_tokens')
+    op.drop_table('producto_tokens')
@@ -1,20 +1,41 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Depends, HTTPException, Request, status
+from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 
-from config.database import Base, engine, get_db
+from config.database import Base, engine, get_async_db
 # Importar todos los modelos para asegurar que se creen todas las tablas
-from models import User as UserModel, TokenBlacklist, Categoria, Proveedor, Ubicacion, Producto, Stock, TipoMovimiento, MovimientoInventario
+from models import User as UserModel, TokenBlacklist, Categoria, CatalogoVersion, Proveedor, Ubicacion, Producto, ProductoToken, Stock, StockSnapshot, TipoMovimiento, MovimientoInventario, MovimientoDiario
 from schemas.token import Token
 from schemas.user import UserCreate, UserResponse
-from utils.utils import create_access_token, get_password_hash, verify_password, add_token_to_blacklist
-from routes import users, profile, categorias, proveedores, ubicaciones, productos, stocks, tipos_movimiento, movimientos
+from utils.utils import create_access_token, decode_access_token, get_password_hash_async, verify_password_async, add_token_to_blacklist, password_hash_pool
+from utils.auth import invalidate_principal
+from utils.password_pool import PasswordPoolSaturated
+from routes import users, profile, categorias, proveedores, ubicaciones, productos, stocks, tipos_movimiento, movimientos, reportes, metrics
+from jobs import stock_snapshot, token_purge
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Tareas periódicas en segundo plano mientras el proceso atiende peticiones
+    tasks = [
+        asyncio.create_task(token_purge.run_periodically()),
+        asyncio.create_task(stock_snapshot.run_periodically()),
+    ]
+    yield
+    for task in tasks:
+        task.cancel()
+    password_hash_pool.shutdown()
 
 app = FastAPI(
     title="Sistema de Inventario API",
     description="API para la gestión de inventario de productos",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Crear tablas
@@ -22,12 +43,21 @@ Base.metadata.create_all(bind=engine)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
+@app.exception_handler(PasswordPoolSaturated)
+async def password_pool_saturated_handler(request: Request, exc: PasswordPoolSaturated):
+    # Rechazo rápido en lugar de dejar crecer la cola de hashing sin límite
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Authentication service busy, try again shortly"},
+        headers={"Retry-After": "1"},
+    )
+
 @app.post("/signup", response_model=UserResponse)
-async def create_user(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(UserModel).filter(UserModel.username == user.username).first()
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    db_user = await db.scalar(select(UserModel).where(UserModel.username == user.username))
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash_async(user.password)
     db_user = UserModel(
         username=user.username,
         first_name=user.first_name,
@@ -37,14 +67,14 @@ async def create_user(user: UserCreate, db: Session = Depends(get_db)):
         role=user.role,
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 @app.post("/login", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(UserModel).filter(UserModel.username == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await db.scalar(select(UserModel).where(UserModel.username == form_data.username))
+    if not user or not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -57,8 +87,11 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.post("/logout")
-async def logout(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    add_token_to_blacklist(token, db)
+async def logout(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    await add_token_to_blacklist(token, db)
+    payload = decode_access_token(token)
+    if payload is not None:
+        invalidate_principal(payload.get("sub"))
     return {"msg": "Successfully logged out"}
 
 # Incluir rutas
@@ -71,3 +104,5 @@ app.include_router(productos.router)
 app.include_router(stocks.router)
 app.include_router(tipos_movimiento.router)
 app.include_router(movimientos.router)
+app.include_router(reportes.router)
+app.include_router(metrics.router)
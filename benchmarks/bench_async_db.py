@@ -0,0 +1,134 @@
+"""Throughput concurrente: Session síncrona vs AsyncSession en handlers async.
+
+Monta dos aplicaciones mínimas sobre la misma base SQLite. Cada consulta pasa
+por la función ``demora(ms)``, que simula la latencia de red de un servidor
+MySQL real. La versión "antes" reproduce el patrón original (``async def`` con
+una ``Session`` bloqueante) y la versión "después" usa ``AsyncSession``.
+
+Uso:
+    python benchmarks/bench_async_db.py --requests 200 --concurrency 50 --latency-ms 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine, event, select, func, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.database import Base
+from models import Categoria
+
+
+def _registrar_demora(dbapi_connection, connection_record):
+    dbapi_connection.create_function("demora", 1, lambda ms: time.sleep(ms / 1000.0) or 1)
+
+
+def build_sync_app(url, latency_ms, pool_size):
+    # Con un pool menor que la concurrencia el patrón síncrono se bloquea por
+    # completo: el handler espera una conexión con el event loop detenido
+    engine = create_engine(url, connect_args={"check_same_thread": False}, pool_size=pool_size)
+    event.listen(engine, "connect", _registrar_demora)
+    SessionLocal = sessionmaker(bind=engine)
+
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+
+    @app.get("/categorias")
+    async def read_categorias(db: Session = Depends(get_db)):
+        db.execute(select(func.demora(latency_ms)))
+        return [c.nombre for c in db.scalars(select(Categoria)).all()]
+
+    return app, engine
+
+
+def build_async_app(url, latency_ms):
+    engine = create_async_engine(url)
+    event.listen(engine.sync_engine, "connect", _registrar_demora)
+    AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def get_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    app = FastAPI()
+
+    @app.get("/categorias")
+    async def read_categorias(db: AsyncSession = Depends(get_async_db)):
+        await db.execute(select(func.demora(latency_ms)))
+        return [c.nombre for c in (await db.scalars(select(Categoria))).all()]
+
+    return app, engine
+
+
+async def run_load(app, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get("/categorias")
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "rps": total / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        seed = create_engine(f"sqlite:///{path}")
+        Base.metadata.create_all(seed)
+        with seed.begin() as conn:
+            conn.execute(text("PRAGMA journal_mode=WAL"))
+            conn.execute(Categoria.__table__.insert(), [{"nombre": f"cat-{i}"} for i in range(20)])
+        seed.dispose()
+
+        resultados = {}
+        app, engine = build_sync_app(f"sqlite:///{path}", args.latency_ms, args.concurrency)
+        resultados["antes (Session)"] = asyncio.run(run_load(app, args.requests, args.concurrency))
+        engine.dispose()
+
+        app, engine = build_async_app(f"sqlite+aiosqlite:///{path}", args.latency_ms)
+        resultados["después (AsyncSession)"] = asyncio.run(run_load(app, args.requests, args.concurrency))
+        asyncio.run(engine.dispose())
+
+    print(f"{args.requests} peticiones, concurrencia {args.concurrency}, latencia simulada {args.latency_ms} ms")
+    for nombre, r in resultados.items():
+        print(f"{nombre:<24} {r['rps']:>8.1f} req/s   p50 {r['p50_ms']:>7.1f} ms   p99 {r['p99_ms']:>7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
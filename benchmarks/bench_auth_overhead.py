@@ -0,0 +1,88 @@
+"""Coste de autenticación por petición con y sin la caché local de revocaciones.
+
+Crea una base SQLite con ``--revoked`` tokens revocados y mide cuánto tarda la
+dependencia ``get_current_user`` para un token válido, consultando
+``token_blacklist`` en cada llamada (antes) o pasando por ``revocation_cache``
+(después).
+
+Uso:
+    python benchmarks/bench_auth_overhead.py --revoked 50000 --iterations 2000
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.database import Base
+from models import User, TokenBlacklist
+from utils import utils
+from utils import auth
+from utils.auth import get_current_user
+
+
+async def measure(session_factory, token, iterations):
+    async with session_factory() as db:
+        await get_current_user(token, db)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await get_current_user(token, db)
+        return (time.perf_counter() - start) / iterations * 1e6
+
+
+async def run(path, iterations):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    token = utils.create_access_token(data={"sub": "bench"}, expires_delta=timedelta(minutes=30))
+
+    async def sin_cache(token, db, payload):
+        return await utils._is_token_blacklisted_db(utils.token_revocation_hash(token, payload), db)
+
+    # Antes: get_current_user consulta token_blacklist en cada llamada
+    auth.is_token_blacklisted = sin_cache
+    try:
+        antes = await measure(session_factory, token, iterations)
+    finally:
+        auth.is_token_blacklisted = utils.is_token_blacklisted
+    despues = await measure(session_factory, token, iterations)
+    await engine.dispose()
+    return antes, despues
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--revoked", type=int, default=50000)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        seed = create_engine(f"sqlite:///{path}")
+        Base.metadata.create_all(seed)
+        with seed.begin() as conn:
+            conn.execute(User.__table__.insert(), [{"username": "bench", "email": "bench@example.com", "role": "user"}])
+            expires_at = datetime.utcnow() + timedelta(minutes=30)
+            tokens = [
+                {"token_hash": hashlib.sha256(f"jti-{i}".encode()).hexdigest(), "expires_at": expires_at}
+                for i in range(args.revoked)
+            ]
+            conn.execute(TokenBlacklist.__table__.insert(), tokens)
+        seed.dispose()
+
+        antes, despues = asyncio.run(run(path, args.iterations))
+
+    print(f"{args.revoked} tokens revocados, {args.iterations} iteraciones")
+    print(f"antes (SELECT en token_blacklist)   {antes:>8.1f} µs/petición")
+    print(f"después (revocation_cache)          {despues:>8.1f} µs/petición")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Informe de productos bajo mínimo: agrupar stocks frente a leer productos.stock_total.
+
+Siembra ``--rows`` productos con existencias en dos ubicaciones; uno de cada
+diez tiene ``stock_minimo``. La versión "antes" calcula el informe con un
+GROUP BY/HAVING sobre ``stocks`` unido a ``productos``; la versión "después"
+es ``GET /reportes/bajo-minimo`` de la aplicación real, que compara el
+``stock_total`` mantenido sobre el índice ``ix_productos_stock_minimo``. Antes
+de medir se comprueba que ambas devuelven lo mismo.
+
+Uso:
+    python benchmarks/bench_bajo_minimo.py --rows 200000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Optional
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app as real_app
+from config.database import Base, get_async_db
+from models import Categoria, Producto, Stock, Ubicacion
+from routes import reportes
+from utils.auth import Principal, get_current_active_user
+
+PRINCIPAL = Principal(id=1, username="bench", role="user")
+BLOQUE = 50_000
+
+
+def seed(path, rows):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(Categoria.__table__.insert(), [{"id": i, "nombre": f"Categoría {i}"} for i in range(1, 21)])
+        conn.execute(Ubicacion.__table__.insert(), [{"id": 1, "nombre": "Almacén", "activo": True},
+                                                    {"id": 2, "nombre": "Tienda", "activo": True}])
+        for inicio in range(1, rows + 1, BLOQUE):
+            ids = range(inicio, min(inicio + BLOQUE, rows + 1))
+            conn.execute(Producto.__table__.insert(), [
+                {"id": i, "codigo": f"SKU{i:07d}", "nombre": f"Producto {i}", "precio_compra": 1.5, "precio_venta": 2.5,
+                 "unidad_medida": "unidad", "stock_minimo": 20 if i % 10 == 0 else 0, "activo": True,
+                 "categoria_id": i % 20 + 1, "stock_total": float(i % 37)}
+                for i in ids
+            ])
+            conn.execute(Stock.__table__.insert(), [
+                {"producto_id": i, "ubicacion_id": ubicacion, "cantidad": float(i % 37) / 2}
+                for i in ids for ubicacion in (1, 2)
+            ])
+    engine.dispose()
+
+
+def build_before_app(get_db):
+    app = FastAPI()
+
+    @app.get("/reportes/bajo-minimo")
+    async def read_bajo_minimo(limit: int = 100, categoria_id: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+        suma = func.coalesce(func.sum(Stock.cantidad), 0)
+        query = (
+            select(*reportes.PRODUCTO_PROYECCION.columnas, (Producto.stock_minimo - suma).label("faltante"))
+            .outerjoin(Stock, Stock.producto_id == Producto.id)
+            .group_by(Producto.id)
+            .having(suma < Producto.stock_minimo)
+            .order_by((Producto.stock_minimo - suma).desc(), Producto.id)
+            .limit(limit)
+        )
+        if categoria_id is not None:
+            query = query.where(Producto.categoria_id == categoria_id)
+        productos = []
+        for fila in await db.execute(query):
+            producto, fin = reportes.PRODUCTO_PROYECCION.construir(fila)
+            producto["faltante"] = fila[fin]
+            productos.append(producto)
+        return productos
+
+    return app
+
+
+async def measure(app, repeat):
+    tiempos, cuerpos = {}, {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+        for params in ({}, {"categoria_id": 1}):
+            clave = "categoria_id=1" if params else "todos"
+            muestras = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                response = await client.get("/reportes/bajo-minimo", params=params)
+                muestras.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 200, response.text
+            tiempos[clave] = statistics.median(muestras)
+            cuerpos[clave] = response.json()
+    return tiempos, cuerpos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        seed(path, args.rows)
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        SessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+        async def get_db():
+            async with SessionLocal() as db:
+                yield db
+
+        real_app.dependency_overrides[get_async_db] = get_db
+        real_app.dependency_overrides[get_current_active_user] = lambda: PRINCIPAL
+        try:
+            antes, cuerpos_antes = asyncio.run(measure(build_before_app(get_db), args.repeat))
+            despues, cuerpos_despues = asyncio.run(measure(real_app, args.repeat))
+        finally:
+            real_app.dependency_overrides = {}
+            asyncio.run(engine.dispose())
+
+    print(f"{args.rows} productos")
+    print(f"{'filtro':<16}{'antes':>12}{'después':>12}{'mejora':>9}")
+    for clave in antes:
+        assert cuerpos_antes[clave] == cuerpos_despues[clave], f"{clave}: respuestas distintas"
+        print(f"{clave:<16}{antes[clave]:>9.1f} ms{despues[clave]:>9.1f} ms{antes[clave] / despues[clave]:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Coste de autenticación por petición con y sin la caché de tokens decodificados.
+
+Mide ``decode_access_token`` aislado y la dependencia ``get_current_user``
+completa (con las cachés de revocación y de usuario ya calientes) cuando cada
+llamada verifica la firma HS256 y parsea el payload (antes) o reutiliza los
+claims guardados en ``decoded_token_cache`` (después).
+
+Uso:
+    python benchmarks/bench_jwt_cache.py --iterations 20000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.database import Base
+from models import User
+from utils import utils
+from utils.auth import get_current_user
+from utils.cache import TTLCache
+
+
+def per_call_us(fn, iterations):
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+async def get_current_user_us(session_factory, token, iterations):
+    async with session_factory() as db:
+        await get_current_user(token, db)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await get_current_user(token, db)
+        return (time.perf_counter() - start) / iterations * 1e6
+
+
+def measure(path, token, iterations):
+    async def run():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        try:
+            return await get_current_user_us(async_sessionmaker(engine), token, iterations)
+        finally:
+            await engine.dispose()
+
+    decode = per_call_us(lambda: utils.decode_access_token(token), iterations)
+    return decode, asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        seed = create_engine(f"sqlite:///{path}")
+        Base.metadata.create_all(seed)
+        with seed.begin() as conn:
+            conn.execute(User.__table__.insert(), [{"username": "bench", "email": "bench@example.com", "role": "user"}])
+        seed.dispose()
+
+        token = utils.create_access_token(data={"sub": "bench"}, expires_delta=timedelta(minutes=30))
+        cache = utils.decoded_token_cache
+        # Una caché de tamaño cero nunca guarda nada: cada llamada verifica la firma
+        utils.decoded_token_cache = TTLCache(maxsize=0, ttl=0)
+        try:
+            antes = measure(path, token, args.iterations)
+        finally:
+            utils.decoded_token_cache = cache
+        despues = measure(path, token, args.iterations)
+
+    print(f"{args.iterations} iteraciones")
+    print(f"{'':<32}{'decode_access_token':>22}{'get_current_user':>20}")
+    print(f"{'antes (HS256 + JSON)':<32}{antes[0]:>19.1f} µs{antes[1]:>17.1f} µs")
+    print(f"{'después (decoded_token_cache)':<32}{despues[0]:>19.1f} µs{despues[1]:>17.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Kardex de un producto: reconstruirlo desde /movimientos/ frente a GET /productos/{id}/kardex.
+
+Siembra ``--rows`` movimientos de un mismo producto entre varias ubicaciones.
+La versión "antes" es lo que hacía el cliente: recorrer ``/movimientos/`` con
+el cursor, página a página, y acumular el saldo por ubicación en Python; la
+versión "después" lee el kardex ya calculado en la base (función de ventana)
+del endpoint, enviado por bloques. Se comprueba que ambos saldos coinciden.
+
+Uso:
+    python benchmarks/bench_kardex.py --rows 200000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from config.database import Base, get_async_db
+from models import Categoria, MovimientoInventario, Producto, TipoMovimiento, Ubicacion, User
+from utils.auth import Principal, get_current_active_user
+
+PRINCIPAL = Principal(id=1, username="bench", role="user")
+UBICACIONES = 5
+BLOQUE = 50_000
+PAGINA = 1000
+
+
+def seed(path, rows):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    inicio = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [{"id": 1, "username": "bench", "first_name": "Bench", "last_name": "Mark",
+                                                "email": "bench@example.com", "role": "user"}])
+        conn.execute(Categoria.__table__.insert(), [{"id": 1, "nombre": "Categoría"}])
+        conn.execute(TipoMovimiento.__table__.insert(), [
+            {"id": 1, "codigo": "ENT", "nombre": "Entrada", "afecta_stock": "entrada"},
+            {"id": 2, "codigo": "SAL", "nombre": "Salida", "afecta_stock": "salida"},
+            {"id": 3, "codigo": "TRF", "nombre": "Transferencia", "afecta_stock": "transferencia"},
+        ])
+        conn.execute(Ubicacion.__table__.insert(), [
+            {"id": i, "nombre": f"Ubicación {i}", "activo": True} for i in range(1, UBICACIONES + 1)
+        ])
+        # El producto medido y otros con historial propio en la misma tabla
+        conn.execute(Producto.__table__.insert(), [
+            {"id": i, "codigo": f"P{i:06d}", "nombre": f"Producto {i}", "unidad_medida": "unidad", "stock_minimo": 0,
+             "activo": True, "categoria_id": 1, "stock_total": 0.0}
+            for i in range(1, 11)
+        ])
+        for desde in range(0, rows * 2, BLOQUE):
+            filas = []
+            for i in range(desde, min(desde + BLOQUE, rows * 2)):
+                tipo = (i // 2) % 3 + 1
+                filas.append({
+                    "fecha": inicio + timedelta(seconds=i * 60), "cantidad": float(i % 7 + 1), "tipo_movimiento_id": tipo,
+                    "producto_id": 1 if i % 2 == 0 else i % 9 + 2,
+                    "ubicacion_origen_id": i % UBICACIONES + 1 if tipo in (2, 3) else None,
+                    "ubicacion_destino_id": (i + 2) % UBICACIONES + 1 if tipo in (1, 3) else None,
+                    "usuario_id": 1, "referencia": f"DOC-{i}",
+                })
+            conn.execute(MovimientoInventario.__table__.insert(), filas)
+    engine.dispose()
+
+
+async def desde_movimientos(client):
+    # Las páginas vienen de la más reciente a la más antigua: se acumula al final
+    movimientos, cursor = [], None
+    while True:
+        params = {"producto_id": 1, "limit": PAGINA}
+        if cursor:
+            params["cursor"] = cursor
+        response = await client.get("/movimientos/", params=params)
+        assert response.status_code == 200, response.text
+        movimientos += response.json()
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    saldos, kardex = {}, []
+    for m in sorted(movimientos, key=lambda m: (m["fecha"], m["id"])):
+        afecta_stock = m["tipo_movimiento"]["afecta_stock"]
+        if m["ubicacion_destino_id"]:
+            variacion = m["cantidad"] if afecta_stock in ("entrada", "transferencia") else 0
+            saldos[m["ubicacion_destino_id"]] = saldos.get(m["ubicacion_destino_id"], 0) + variacion
+            kardex.append((m["ubicacion_destino_id"], m["id"], saldos[m["ubicacion_destino_id"]]))
+        if m["ubicacion_origen_id"]:
+            variacion = -m["cantidad"] if afecta_stock in ("salida", "transferencia") else 0
+            saldos[m["ubicacion_origen_id"]] = saldos.get(m["ubicacion_origen_id"], 0) + variacion
+            kardex.append((m["ubicacion_origen_id"], m["id"], saldos[m["ubicacion_origen_id"]]))
+    return sorted(kardex)
+
+
+async def kardex(client):
+    filas = []
+    async with client.stream("GET", "/productos/1/kardex", params={"format": "ndjson"}) as response:
+        assert response.status_code == 200
+        async for linea in response.aiter_lines():
+            if linea:
+                fila = json.loads(linea)
+                filas.append((fila["ubicacion_id"], fila["movimiento_id"], fila["saldo"]))
+    return filas
+
+
+async def run(path, fn):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    SessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+    async def get_db():
+        async with SessionLocal() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = get_db
+    app.dependency_overrides[get_current_active_user] = lambda: PRINCIPAL
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+            start = time.perf_counter()
+            filas = await fn(client)
+            elapsed = time.perf_counter() - start
+    finally:
+        app.dependency_overrides = {}
+        await engine.dispose()
+    return elapsed, filas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        seed(path, args.rows)
+        antes, filas_antes = asyncio.run(run(path, desde_movimientos))
+        despues, filas_despues = asyncio.run(run(path, kardex))
+
+    assert filas_antes == filas_despues, "saldos distintos"
+    print(f"{args.rows} movimientos del producto, {len(filas_despues)} filas de kardex")
+    print(f"{'antes (páginas de /movimientos/)':<36} {antes:>7.2f} s")
+    print(f"{'después (/productos/1/kardex)':<36} {despues:>7.2f} s   {antes / despues:>5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
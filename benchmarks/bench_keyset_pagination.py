@@ -0,0 +1,110 @@
+"""Coste de una página de /movimientos/ según su profundidad: OFFSET frente a cursor.
+
+Llama a ``read_movimientos`` sobre un historial sintético y mide cuánto tarda
+la página N pidiéndola con ``skip`` (antes) o con el cursor ``(fecha, id)``
+de la página anterior (después). Con OFFSET la base recorre y descarta todas
+las filas previas; con el cursor entra directamente por el índice.
+
+Uso:
+    python benchmarks/bench_keyset_pagination.py --rows 200000 --pages 1 100 1000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import orjson
+from fastapi import Response
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.database import Base
+from models import MovimientoInventario, Producto, TipoMovimiento, User
+from routes.movimientos import read_movimientos
+from utils.auth import Principal
+from utils.pagination import encode_cursor
+
+PRINCIPAL = Principal(id=1, username="bench", role="user")
+
+
+def seed(path, rows):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    inicio = datetime(2020, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [{"id": 1, "username": "bench", "email": "bench@example.com", "role": "user"}])
+        conn.execute(TipoMovimiento.__table__.insert(), [{"id": 1, "codigo": "ENT", "nombre": "Entrada", "afecta_stock": "entrada"}])
+        conn.execute(Producto.__table__.insert(), [{"id": 1, "codigo": "P1", "nombre": "Producto", "precio_compra": 1, "precio_venta": 2}])
+        for start in range(0, rows, 10_000):
+            conn.execute(MovimientoInventario.__table__.insert(), [
+                {"cantidad": 1.0, "fecha": inicio + timedelta(minutes=i), "tipo_movimiento_id": 1,
+                 "producto_id": 1, "usuario_id": 1}
+                for i in range(start, min(rows, start + 10_000))
+            ])
+    engine.dispose()
+
+
+async def measure(path, pages, limit, repeat):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    resultados = []
+    try:
+        async with AsyncSession(engine) as db:
+            for page in pages:
+                skip = (page - 1) * limit
+                cursor = None
+                if skip:
+                    # Cursor que habría devuelto la página anterior
+                    ultimo = (await db.execute(
+                        select(MovimientoInventario.fecha, MovimientoInventario.id)
+                        .order_by(MovimientoInventario.fecha.desc(), MovimientoInventario.id.desc())
+                        .offset(skip - 1).limit(1)
+                    )).one()
+                    cursor = encode_cursor(ultimo.fecha, ultimo.id)
+
+                async def offset():
+                    return await read_movimientos(Response(), skip=skip, limit=limit, current_user=PRINCIPAL, db=db)
+
+                async def keyset():
+                    return await read_movimientos(Response(), limit=limit, cursor=cursor, current_user=PRINCIPAL, db=db)
+
+                tiempos = []
+                for fn in (offset, keyset):
+                    filas = orjson.loads((await fn()).body)
+                    start = time.perf_counter()
+                    for _ in range(repeat):
+                        db.expunge_all()
+                        await fn()
+                    tiempos.append((time.perf_counter() - start) / repeat * 1000)
+                    assert len(filas) == limit
+                resultados.append((page, *tiempos))
+    finally:
+        await engine.dispose()
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        seed(path, args.rows)
+        resultados = asyncio.run(measure(path, args.pages, args.limit, args.repeat))
+
+    print(f"{args.rows} movimientos, {args.limit} por página")
+    print(f"{'página':>8}{'antes (OFFSET)':>18}{'después (cursor)':>20}")
+    for page, offset_ms, keyset_ms in resultados:
+        print(f"{page:>8}{offset_ms:>15.2f} ms{keyset_ms:>17.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Coste de serializar los listados grandes: entidades ORM + response_model frente a columnas + orjson.
+
+Llama a ``/movimientos/``, ``/stocks/`` y ``/productos/`` con ``limit`` igual al
+número de filas. La versión "antes" reproduce las rutas originales (cargar
+entidades con joinedload y devolverlas para que FastAPI las valide con el
+``response_model`` y las codifique); la versión "después" es la aplicación
+real, que lee tuplas de columnas y codifica el JSON con orjson. Antes de medir
+se comprueba que ambas devuelven el mismo JSON.
+
+Uso:
+    python benchmarks/bench_list_serialization.py --rows 1000 10000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app as real_app
+from config.database import Base, get_async_db
+from models import Categoria, MovimientoInventario, Producto, Stock, TipoMovimiento, Ubicacion, User
+from routes import movimientos, stocks
+from schemas.movimiento_inventario import MovimientoInventarioDetalleResponse
+from schemas.producto import ProductoResponse
+from schemas.stock import StockDetalleResponse
+from utils.auth import Principal, get_current_active_user
+
+PRINCIPAL = Principal(id=1, username="bench", role="user")
+ENDPOINTS = ("/movimientos/", "/stocks/", "/productos/")
+
+
+def seed(path, rows):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    inicio = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [{"id": 1, "username": "bench", "first_name": "Bench", "last_name": "Mark",
+                                                "email": "bench@example.com", "role": "user"}])
+        conn.execute(Categoria.__table__.insert(), [{"id": 1, "nombre": "Categoría"}])
+        conn.execute(TipoMovimiento.__table__.insert(), [{"id": 1, "codigo": "ENT", "nombre": "Entrada", "afecta_stock": "entrada"}])
+        conn.execute(Ubicacion.__table__.insert(), [{"id": i, "nombre": f"Ubicación {i}", "activo": True} for i in range(1, 11)])
+        conn.execute(Producto.__table__.insert(), [
+            {"id": i, "codigo": f"P{i:06d}", "nombre": f"Producto {i}", "precio_compra": 1.5, "precio_venta": 2.5,
+             "unidad_medida": "unidad", "stock_minimo": 0, "activo": True, "categoria_id": 1, "stock_total": 10.0}
+            for i in range(1, rows + 1)
+        ])
+        conn.execute(Stock.__table__.insert(), [
+            {"producto_id": i, "ubicacion_id": i % 10 + 1, "cantidad": 10.0} for i in range(1, rows + 1)
+        ])
+        conn.execute(MovimientoInventario.__table__.insert(), [
+            {"fecha": inicio + timedelta(minutes=i), "cantidad": 10.0, "referencia": f"REF-{i}", "tipo_movimiento_id": 1,
+             "producto_id": i % rows + 1, "ubicacion_destino_id": i % 10 + 1, "usuario_id": 1}
+            for i in range(rows)
+        ])
+    engine.dispose()
+
+
+def build_before_app(get_db):
+    app = FastAPI()
+
+    @app.get("/movimientos/", response_model=List[MovimientoInventarioDetalleResponse])
+    async def read_movimientos(limit: int = 100, db: AsyncSession = Depends(get_db)):
+        query = (
+            select(MovimientoInventario).options(*movimientos.DETALLE_OPTIONS)
+            .order_by(MovimientoInventario.fecha.desc(), MovimientoInventario.id.desc())
+        )
+        return (await db.scalars(query.limit(limit))).all()
+
+    @app.get("/stocks/", response_model=List[StockDetalleResponse])
+    async def read_stocks(limit: int = 100, db: AsyncSession = Depends(get_db)):
+        return (await db.scalars(select(Stock).options(*stocks.DETALLE_OPTIONS).limit(limit))).all()
+
+    @app.get("/productos/", response_model=List[ProductoResponse])
+    async def read_productos(limit: int = 100, db: AsyncSession = Depends(get_db)):
+        return (await db.scalars(select(Producto).limit(limit))).all()
+
+    return app
+
+
+async def measure(app, rows, repeat):
+    tiempos, cuerpos = {}, {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for url in ENDPOINTS:
+            muestras = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                response = await client.get(url, params={"limit": rows})
+                muestras.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 200, response.text
+            tiempos[url] = statistics.median(muestras)
+            cuerpos[url] = response.json()
+    return tiempos, cuerpos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10_000])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'filas':>7}  {'endpoint':<14}{'antes':>12}{'después':>12}{'mejora':>9}")
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.db")
+            seed(path, rows)
+            engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+            SessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+            async def get_db():
+                async with SessionLocal() as db:
+                    yield db
+
+            real_app.dependency_overrides[get_async_db] = get_db
+            real_app.dependency_overrides[get_current_active_user] = lambda: PRINCIPAL
+            try:
+                antes, cuerpos_antes = asyncio.run(measure(build_before_app(get_db), rows, args.repeat))
+                despues, cuerpos_despues = asyncio.run(measure(real_app, rows, args.repeat))
+            finally:
+                real_app.dependency_overrides = {}
+                asyncio.run(engine.dispose())
+
+        for url in ENDPOINTS:
+            assert cuerpos_antes[url] == cuerpos_despues[url], f"{url}: respuestas distintas"
+            print(f"{rows:>7}  {url:<14}{antes[url]:>9.1f} ms{despues[url]:>9.1f} ms{antes[url] / despues[url]:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
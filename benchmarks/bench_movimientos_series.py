@@ -0,0 +1,172 @@
+"""Series diarias de entradas y salidas: agrupar movimientos_inventario frente a leer movimientos_diarios.
+
+Siembra ``--rows`` movimientos repartidos en un año y rellena el resumen con
+``jobs.movimientos_diarios`` (se informa también de lo que tarda). La versión
+"antes" calcula la serie agrupando por día los movimientos del rango, como
+hacía cada gráfico; la versión "después" es ``GET /movimientos/series`` de la
+aplicación real, que solo lee el resumen. Antes de medir se comprueba que
+ambas devuelven lo mismo.
+
+Uso:
+    python benchmarks/bench_movimientos_series.py --rows 1000000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import case, create_engine, func, literal, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app as real_app
+from config.database import Base, get_async_db
+from jobs import movimientos_diarios
+from models import Categoria, MovimientoInventario, Producto, TipoMovimiento, Ubicacion, User
+from utils.auth import Principal, get_current_active_user
+
+PRINCIPAL = Principal(id=1, username="bench", role="user")
+PRODUCTOS = 100
+UBICACIONES = 10
+BLOQUE = 100_000
+CONSULTAS = {
+    "producto, 1 año": {"producto_id": 7},
+    "ubicación, 90 días": {"ubicacion_id": 3, "fecha_desde": "2024-10-03"},
+    "todo, 30 días": {"fecha_desde": "2024-12-01"},
+}
+
+
+def seed(path, rows):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    inicio = datetime(2024, 1, 1)
+    paso = 365 * 24 * 3600 / rows
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [{"id": 1, "username": "bench", "first_name": "Bench", "last_name": "Mark",
+                                                "email": "bench@example.com", "role": "user"}])
+        conn.execute(Categoria.__table__.insert(), [{"id": 1, "nombre": "Categoría"}])
+        conn.execute(TipoMovimiento.__table__.insert(), [
+            {"id": 1, "codigo": "ENT", "nombre": "Entrada", "afecta_stock": "entrada"},
+            {"id": 2, "codigo": "SAL", "nombre": "Salida", "afecta_stock": "salida"},
+            {"id": 3, "codigo": "TRF", "nombre": "Transferencia", "afecta_stock": "transferencia"},
+        ])
+        conn.execute(Ubicacion.__table__.insert(), [
+            {"id": i, "nombre": f"Ubicación {i}", "activo": True} for i in range(1, UBICACIONES + 1)
+        ])
+        conn.execute(Producto.__table__.insert(), [
+            {"id": i, "codigo": f"P{i:06d}", "nombre": f"Producto {i}", "unidad_medida": "unidad", "stock_minimo": 0,
+             "activo": True, "categoria_id": 1, "stock_total": 0.0}
+            for i in range(1, PRODUCTOS + 1)
+        ])
+        for desde in range(0, rows, BLOQUE):
+            filas = []
+            for i in range(desde, min(desde + BLOQUE, rows)):
+                tipo = i % 3 + 1
+                origen = i % UBICACIONES + 1 if tipo in (2, 3) else None
+                destino = (i + 1) % UBICACIONES + 1 if tipo in (1, 3) else None
+                filas.append({"fecha": inicio + timedelta(seconds=i * paso), "cantidad": float(i % 9 + 1),
+                              "tipo_movimiento_id": tipo, "producto_id": i % PRODUCTOS + 1,
+                              "ubicacion_origen_id": origen, "ubicacion_destino_id": destino, "usuario_id": 1})
+            conn.execute(MovimientoInventario.__table__.insert(), filas)
+    engine.dispose()
+
+
+def build_before_app(get_db):
+    app = FastAPI()
+
+    @app.get("/movimientos/series")
+    async def read_series(
+        producto_id: Optional[int] = None,
+        ubicacion_id: Optional[int] = None,
+        fecha_desde: Optional[date] = None,
+        db: AsyncSession = Depends(get_db),
+    ):
+        M = MovimientoInventario
+        tramos = []
+        # La transferencia (tipo 3) se cuenta una vez, en su destino
+        for columna, tipos, entradas, salidas, cuenta in (
+            (M.ubicacion_destino_id, (1, 3), M.cantidad, literal(0.0), literal(1)),
+            (M.ubicacion_origen_id, (2, 3), literal(0.0), M.cantidad, case((M.tipo_movimiento_id == 3, 0), else_=1)),
+        ):
+            query = select(func.date(M.fecha).label("fecha"), entradas.label("entradas"), salidas.label("salidas"),
+                           cuenta.label("cuenta")) \
+                .where(M.tipo_movimiento_id.in_(tipos), columna.is_not(None))
+            if producto_id:
+                query = query.where(M.producto_id == producto_id)
+            if ubicacion_id:
+                query = query.where(columna == ubicacion_id)
+            if fecha_desde:
+                query = query.where(M.fecha >= datetime.combine(fecha_desde, datetime.min.time()))
+            tramos.append(query)
+        tramos = union_all(*tramos).subquery()
+        result = await db.execute(
+            select(tramos.c.fecha, func.sum(tramos.c.entradas), func.sum(tramos.c.salidas), func.sum(tramos.c.cuenta))
+            .group_by(tramos.c.fecha).order_by(tramos.c.fecha)
+        )
+        return [{"fecha": f, "entradas": e, "salidas": s, "movimientos": n} for f, e, s, n in result]
+
+    return app
+
+
+async def measure(app, repeat):
+    tiempos, cuerpos = {}, {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for nombre, params in CONSULTAS.items():
+            muestras = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                response = await client.get("/movimientos/series", params=params)
+                muestras.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 200, response.text
+            tiempos[nombre] = statistics.median(muestras)
+            cuerpos[nombre] = response.json()
+    return tiempos, cuerpos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        seed(path, args.rows)
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        SessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+        async def get_db():
+            async with SessionLocal() as db:
+                yield db
+
+        # El job usa la sesión de la aplicación: se apunta a la base del benchmark
+        movimientos_diarios.AsyncSessionLocal = SessionLocal
+        start = time.perf_counter()
+        filas = asyncio.run(movimientos_diarios.reconstruir())
+        print(f"{args.rows} movimientos; reconstrucción del resumen: {filas} filas en {time.perf_counter() - start:.1f} s")
+
+        real_app.dependency_overrides[get_async_db] = get_db
+        real_app.dependency_overrides[get_current_active_user] = lambda: PRINCIPAL
+        try:
+            antes, cuerpos_antes = asyncio.run(measure(build_before_app(get_db), args.repeat))
+            despues, cuerpos_despues = asyncio.run(measure(real_app, args.repeat))
+        finally:
+            real_app.dependency_overrides = {}
+            asyncio.run(engine.dispose())
+
+    print(f"{'consulta':<22}{'antes':>12}{'después':>12}{'mejora':>9}")
+    for nombre in CONSULTAS:
+        assert cuerpos_antes[nombre] == cuerpos_despues[nombre], f"{nombre}: respuestas distintas"
+        print(f"{nombre:<22}{antes[nombre]:>9.1f} ms{despues[nombre]:>9.1f} ms{antes[nombre] / despues[nombre]:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Alta de un catálogo de productos: un POST por producto frente a la importación CSV.
+
+Da de alta ``--rows`` productos en una base vacía. La versión "antes" es el
+camino que había hasta ahora, un ``POST /productos/`` por fila (consulta de
+código duplicado, INSERT, commit y refresh cada vez); la versión "después"
+sube el mismo catálogo como CSV a ``POST /productos/import``, que resuelve la
+categoría por nombre y escribe por bloques.
+
+Uso:
+    python benchmarks/bench_producto_import.py --rows 20000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from config.database import Base, get_async_db
+from models import Categoria, Producto, Proveedor
+from utils.auth import Principal, get_current_active_user
+
+PRINCIPAL = Principal(id=1, username="bench", role="user")
+
+
+def seed(path):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(Categoria.__table__.insert(), [{"id": i, "nombre": f"Categoría {i}"} for i in range(1, 21)])
+        conn.execute(Proveedor.__table__.insert(), [{"id": i, "nombre": f"Proveedor {i}"} for i in range(1, 6)])
+    engine.dispose()
+
+
+def catalogo(rows):
+    return [
+        {"codigo": f"SKU{i:06d}", "nombre": f"Producto {i}", "precio_compra": 10.0, "precio_venta": 15.5,
+         "unidad_medida": "unidad", "categoria_id": i % 20 + 1, "proveedor_id": i % 5 + 1}
+        for i in range(rows)
+    ]
+
+
+async def uno_a_uno(client, productos):
+    for producto in productos:
+        response = await client.post("/productos/", json=producto)
+        assert response.status_code == 200, response.text
+
+
+async def importacion(client, productos):
+    lineas = ["codigo,nombre,precio_compra,precio_venta,unidad_medida,categoria,proveedor_id"]
+    lineas += [
+        f"{p['codigo']},{p['nombre']},{p['precio_compra']},{p['precio_venta']},{p['unidad_medida']},"
+        f"Categoría {p['categoria_id']},{p['proveedor_id']}"
+        for p in productos
+    ]
+    response = await client.post("/productos/import", files={"archivo": ("catalogo.csv", "\n".join(lineas).encode())})
+    assert response.status_code == 200 and not response.json()["errores"], response.text
+
+
+async def run(path, fn, productos):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    SessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+    async def get_db():
+        async with SessionLocal() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = get_db
+    app.dependency_overrides[get_current_active_user] = lambda: PRINCIPAL
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+            start = time.perf_counter()
+            await fn(client, productos)
+            elapsed = time.perf_counter() - start
+    finally:
+        app.dependency_overrides = {}
+        await engine.dispose()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20_000)
+    args = parser.parse_args()
+
+    productos = catalogo(args.rows)
+    print(f"{args.rows} productos")
+    for nombre, fn in (("antes (POST por producto)", uno_a_uno), ("después (importación CSV)", importacion)):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.db")
+            seed(path)
+            elapsed = asyncio.run(run(path, fn, productos))
+            engine = create_engine(f"sqlite:///{path}")
+            with engine.connect() as conn:
+                total = conn.execute(select(func.count()).select_from(Producto)).scalar_one()
+            engine.dispose()
+        print(f"{nombre:<28} {elapsed:>8.2f} s   {total / elapsed:>9.0f} filas/s   productos {total}")
+
+
+if __name__ == "__main__":
+    main()
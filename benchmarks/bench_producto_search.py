@@ -0,0 +1,123 @@
+"""Búsqueda de productos por código y nombre: LIKE sobre la tabla frente al índice de tokens.
+
+Siembra ``--rows`` productos (y sus tokens) y lanza una serie de búsquedas
+por prefijo y de varias palabras. La versión "antes" es lo que podía hacerse
+sin índice, ``LIKE '%palabra%'`` sobre ``codigo`` y ``nombre`` para cada
+palabra, con el mismo orden y límite; la versión "después" es
+``GET /productos/search`` de la aplicación real. Se dan la mediana y el p99.
+
+Uso:
+    python benchmarks/bench_producto_search.py --rows 500000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import and_, create_engine, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app as real_app
+from config.database import Base, get_async_db
+from models import Categoria, Producto, ProductoToken
+from routes import productos
+from utils.auth import Principal, get_current_active_user
+from utils.productos import tokens_busqueda
+
+PRINCIPAL = Principal(id=1, username="bench", role="user")
+PIEZAS = ["Tornillo", "Tuerca", "Arandela", "Clavo", "Perno", "Taco", "Bisagra", "Cerrojo", "Cable", "Tubo"]
+MATERIALES = ["acero", "inox", "latón", "zinc", "PVC", "cobre", "aluminio", "galvanizado"]
+MEDIDAS = ["1/8", "1/4", "3/8", "1/2", "5/8", "3/4", "1", "2", "M6", "M8", "M10", "M12"]
+BUSQUEDAS = ["torn", "tornillo 3/8", "tuer inox", "bis", "cable cobre 2", "SKU0123", "perno galv m10", "arandela", "cerr lat", "tubo"]
+BLOQUE = 50_000
+
+
+def seed(path, rows):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    rnd = random.Random(1)
+    with engine.begin() as conn:
+        conn.execute(Categoria.__table__.insert(), [{"id": 1, "nombre": "Categoría"}])
+        for inicio in range(0, rows, BLOQUE):
+            filas = [
+                {"id": i + 1, "codigo": f"SKU{i:07d}",
+                 "nombre": f"{rnd.choice(PIEZAS)} {rnd.choice(MATERIALES)} {rnd.choice(MEDIDAS)}",
+                 "precio_compra": 1.5, "precio_venta": 2.5, "unidad_medida": "unidad", "stock_minimo": 0,
+                 "activo": True, "categoria_id": 1, "stock_total": 0.0}
+                for i in range(inicio, min(inicio + BLOQUE, rows))
+            ]
+            conn.execute(Producto.__table__.insert(), filas)
+            conn.execute(ProductoToken.__table__.insert(), [
+                {"token": token, "producto_id": fila["id"]} for fila in filas for token in tokens_busqueda(fila["codigo"], fila["nombre"])
+            ])
+    engine.dispose()
+
+
+def build_before_app(get_db):
+    app = FastAPI()
+
+    @app.get("/productos/search")
+    async def search_productos(q: str, limit: int = 20, db: AsyncSession = Depends(get_db)):
+        condiciones = [
+            or_(Producto.codigo.like(f"%{palabra}%"), Producto.nombre.like(f"%{palabra}%")) for palabra in q.split()
+        ]
+        query = select(*productos.PROYECCION.columnas).where(and_(*condiciones)).order_by(Producto.nombre, Producto.id)
+        return productos.PROYECCION.lista(await db.execute(query.limit(limit)))
+
+    return app
+
+
+async def measure(app, repeat):
+    muestras, resultados = [], {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+        for _ in range(repeat):
+            for q in BUSQUEDAS:
+                start = time.perf_counter()
+                response = await client.get("/productos/search", params={"q": q, "limit": 20})
+                muestras.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 200, response.text
+                resultados[q] = len(response.json())
+    muestras.sort()
+    return statistics.median(muestras), muestras[int(len(muestras) * 0.99) - 1], resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        seed(path, args.rows)
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        SessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+        async def get_db():
+            async with SessionLocal() as db:
+                yield db
+
+        real_app.dependency_overrides[get_async_db] = get_db
+        real_app.dependency_overrides[get_current_active_user] = lambda: PRINCIPAL
+        try:
+            antes = asyncio.run(measure(build_before_app(get_db), args.repeat))
+            despues = asyncio.run(measure(real_app, args.repeat))
+        finally:
+            real_app.dependency_overrides = {}
+            asyncio.run(engine.dispose())
+
+    print(f"{args.rows} productos, {len(BUSQUEDAS)} búsquedas x {args.repeat}")
+    for nombre, (p50, p99, resultados) in (("antes (LIKE '%q%')", antes), ("después (/productos/search)", despues)):
+        print(f"{nombre:<30} p50 {p50:>8.1f} ms   p99 {p99:>8.1f} ms   resultados {sum(resultados.values())}")
+
+
+if __name__ == "__main__":
+    main()
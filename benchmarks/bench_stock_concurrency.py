@@ -0,0 +1,141 @@
+"""Salidas concurrentes contra un mismo stock: movimientos por segundo y sobreventa.
+
+Lanza ``--requests`` salidas de una unidad contra un stock de ``--stock``
+unidades (más peticiones que existencias) con ``--concurrency`` clientes a la
+vez. La versión "antes" reproduce el patrón original de ``create_movimiento``
+(leer el stock, comprobarlo en Python y restar); la versión "después" es la
+ruta real, con el UPDATE condicional de ``utils.stock``.
+
+Uso:
+    python benchmarks/bench_stock_concurrency.py --requests 400 --stock 300 --concurrency 20
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+from fastapi import Depends, FastAPI, HTTPException
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app as real_app
+from config.database import Base, get_async_db
+from models import MovimientoInventario, Producto, Stock, TipoMovimiento, Ubicacion, User
+from schemas.movimiento_inventario import MovimientoInventarioCreate
+from utils.auth import Principal, get_current_active_user
+
+PRINCIPAL = Principal(id=1, username="bench", role="user")
+
+
+def seed(path, stock):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("PRAGMA journal_mode=WAL"))
+        conn.execute(User.__table__.insert(), [{"id": 1, "username": "bench", "email": "bench@example.com", "role": "user"}])
+        conn.execute(TipoMovimiento.__table__.insert(), [{"id": 1, "codigo": "SAL", "nombre": "Salida", "afecta_stock": "salida"}])
+        conn.execute(Producto.__table__.insert(), [{"id": 1, "codigo": "P1", "nombre": "Producto"}])
+        conn.execute(Ubicacion.__table__.insert(), [{"id": 1, "nombre": "Almacén"}])
+        conn.execute(Stock.__table__.insert(), [{"producto_id": 1, "ubicacion_id": 1, "cantidad": stock}])
+    engine.dispose()
+
+
+def build_before_app(get_db):
+    app = FastAPI()
+
+    @app.post("/movimientos/")
+    async def create_movimiento(movimiento: MovimientoInventarioCreate, db: AsyncSession = Depends(get_db)):
+        # Las mismas comprobaciones previas que la ruta real
+        await db.get(Producto, movimiento.producto_id)
+        await db.get(TipoMovimiento, movimiento.tipo_movimiento_id)
+        await db.get(Ubicacion, movimiento.ubicacion_origen_id)
+        query = select(Stock).where(Stock.producto_id == movimiento.producto_id, Stock.ubicacion_id == movimiento.ubicacion_origen_id)
+        stock = await db.scalar(query)
+        if not stock or stock.cantidad < movimiento.cantidad:
+            raise HTTPException(status_code=400, detail="Stock insuficiente")
+        db_movimiento = MovimientoInventario(**movimiento.model_dump(), usuario_id=1)
+        db.add(db_movimiento)
+        stock = await db.scalar(query)
+        stock.cantidad -= movimiento.cantidad
+        await db.commit()
+        await db.refresh(db_movimiento)
+        return {"id": db_movimiento.id}
+
+    return app
+
+
+async def run_load(app, path, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    cuerpo = {"cantidad": 1.0, "tipo_movimiento_id": 1, "producto_id": 1, "ubicacion_origen_id": 1}
+    codigos = []
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def one():
+            async with semaphore:
+                response = await client.post("/movimientos/", json=cuerpo)
+                codigos.append(response.status_code)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - start
+
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.connect() as conn:
+        final = conn.execute(select(Stock.cantidad)).scalar_one()
+        movimientos = conn.execute(select(MovimientoInventario.id)).all()
+    engine.dispose()
+    return {
+        "mov_s": codigos.count(200) / elapsed,
+        "aceptadas": codigos.count(200),
+        "errores": sum(1 for c in codigos if c >= 500),
+        "movimientos": len(movimientos),
+        "stock_final": final,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--stock", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    resultados = {}
+    for nombre in ("antes (leer y restar)", "después (UPDATE condicional)"):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.db")
+            seed(path, args.stock)
+            engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+            SessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+            async def get_db():
+                async with SessionLocal() as db:
+                    yield db
+
+            if nombre.startswith("antes"):
+                app = build_before_app(get_db)
+            else:
+                app = real_app
+                app.dependency_overrides[get_async_db] = get_db
+                app.dependency_overrides[get_current_active_user] = lambda: PRINCIPAL
+            try:
+                resultados[nombre] = asyncio.run(run_load(app, path, args.requests, args.concurrency))
+            finally:
+                real_app.dependency_overrides = {}
+                asyncio.run(engine.dispose())
+
+    print(f"{args.requests} salidas de 1 unidad, stock inicial {args.stock}, concurrencia {args.concurrency}")
+    for nombre, r in resultados.items():
+        print(
+            f"{nombre:<30} {r['mov_s']:>7.1f} mov/s   aceptadas {r['aceptadas']:>4}   "
+            f"movimientos {r['movimientos']:>4}   stock final {r['stock_final']:>6.1f}   errores 5xx {r['errores']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Informe de valoración: agregado en cada petición frente a la caché por versión.
+
+Siembra ``--rows`` productos con existencias en diez ubicaciones y pide
+``--requests`` veces ``GET /reportes/valoracion``, como un panel que se
+refresca. La versión "antes" vacía la caché antes de cada petición, así que
+cada una vuelve a agregar ``stocks``; la versión "después" es el
+comportamiento real: la primera agrega y las demás solo leen las versiones.
+También se mide la petición condicional con If-None-Match (304).
+
+Uso:
+    python benchmarks/bench_valoracion.py --rows 200000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from config.database import Base, get_async_db
+from models import Categoria, Producto, Stock, Ubicacion
+from routes.reportes import valoracion_cache
+from utils.auth import Principal, get_current_active_user
+
+PRINCIPAL = Principal(id=1, username="bench", role="user")
+UBICACIONES = 10
+BLOQUE = 50_000
+
+
+def seed(path, rows):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(Categoria.__table__.insert(), [{"id": i, "nombre": f"Categoría {i}"} for i in range(1, 21)])
+        conn.execute(Ubicacion.__table__.insert(), [
+            {"id": i, "nombre": f"Ubicación {i}", "activo": True} for i in range(1, UBICACIONES + 1)
+        ])
+        for inicio in range(1, rows + 1, BLOQUE):
+            ids = range(inicio, min(inicio + BLOQUE, rows + 1))
+            conn.execute(Producto.__table__.insert(), [
+                {"id": i, "codigo": f"SKU{i:07d}", "nombre": f"Producto {i}", "precio_compra": 1.0 + i % 50,
+                 "precio_venta": 2.5, "unidad_medida": "unidad", "stock_minimo": 0, "activo": True,
+                 "categoria_id": i % 20 + 1, "stock_total": 0.0}
+                for i in ids
+            ])
+            conn.execute(Stock.__table__.insert(), [
+                {"producto_id": i, "ubicacion_id": (i + k) % UBICACIONES + 1, "cantidad": float(i % 13)}
+                for i in ids for k in range(3)
+            ])
+    engine.dispose()
+
+
+async def measure(client, requests, vaciar, headers=None):
+    muestras = []
+    for _ in range(requests):
+        if vaciar:
+            valoracion_cache.clear()
+        start = time.perf_counter()
+        response = await client.get("/reportes/valoracion", headers=headers)
+        muestras.append((time.perf_counter() - start) * 1000)
+        assert response.status_code in (200, 304), response.text
+    return statistics.median(muestras), response
+
+
+async def run(path, requests):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    SessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+    async def get_db():
+        async with SessionLocal() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = get_db
+    app.dependency_overrides[get_current_active_user] = lambda: PRINCIPAL
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            antes, response = await measure(client, requests, vaciar=True)
+            despues, _ = await measure(client, requests, vaciar=False)
+            condicional, _ = await measure(client, requests, vaciar=False, headers={"If-None-Match": response.headers["ETag"]})
+    finally:
+        app.dependency_overrides = {}
+        await engine.dispose()
+    return antes, despues, condicional
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        seed(path, args.rows)
+        antes, despues, condicional = asyncio.run(run(path, args.requests))
+
+    print(f"{args.rows} productos, {args.rows * 3} stocks, {args.requests} peticiones (mediana)")
+    print(f"{'antes (agregado cada vez)':<30} {antes:>9.1f} ms")
+    print(f"{'después (caché por versión)':<30} {despues:>9.1f} ms   {antes / despues:>7.1f}x")
+    print(f"{'después con If-None-Match':<30} {condicional:>9.1f} ms   {antes / condicional:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
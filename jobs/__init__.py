@@ -0,0 +1 @@
+# Tareas periódicas y de mantenimiento (se lanzan desde app.py o con python -m jobs.<nombre>)
@@ -0,0 +1,45 @@
+"""Reconstrucción de movimientos_diarios desde movimientos_inventario.
+
+``python -m jobs.movimientos_diarios`` rellena todo el historial; con
+``--desde``/``--hasta`` solo esos días. Cada bloque de días se borra y se
+recalcula en su propia transacción, así que se puede repetir sin duplicar.
+"""
+import argparse
+import asyncio
+from datetime import date, timedelta
+from typing import Optional
+
+from sqlalchemy import func, select
+
+from config.database import AsyncSessionLocal
+from models.movimiento_inventario import MovimientoInventario as MovimientoModel
+from utils.stock import reconstruir_movimientos_diarios
+
+BACKFILL_CHUNK_DAYS = 31
+
+async def reconstruir(desde: Optional[date] = None, hasta: Optional[date] = None) -> int:
+    async with AsyncSessionLocal() as db:
+        if desde is None or hasta is None:
+            primera, ultima = (await db.execute(
+                select(func.min(MovimientoModel.fecha), func.max(MovimientoModel.fecha))
+            )).one()
+            if primera is None:
+                return 0
+            desde = desde or primera.date()
+            hasta = hasta or ultima.date()
+
+        filas = 0
+        while desde <= hasta:
+            fin = min(desde + timedelta(days=BACKFILL_CHUNK_DAYS - 1), hasta)
+            filas += await reconstruir_movimientos_diarios(db, desde, fin)
+            await db.commit()
+            desde = fin + timedelta(days=1)
+        return filas
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconstruye movimientos_diarios desde movimientos_inventario")
+    parser.add_argument("--desde", type=date.fromisoformat, help="primer día (AAAA-MM-DD); por defecto el del primer movimiento")
+    parser.add_argument("--hasta", type=date.fromisoformat, help="último día (AAAA-MM-DD); por defecto el del último movimiento")
+    args = parser.parse_args()
+
+    print(f"{asyncio.run(reconstruir(args.desde, args.hasta))} filas en movimientos_diarios")
@@ -0,0 +1,65 @@
+"""Copias periódicas de stocks para GET /stocks/at.
+
+app.py la ejecuta en segundo plano; ``python -m jobs.stock_snapshot`` toma una
+copia en el momento. El intervalo acota cuántos movimientos hay que aplicar
+sobre la copia para responder una consulta.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from config.database import AsyncSessionLocal
+from models.stock_snapshot import StockSnapshot as StockSnapshotModel
+from utils.stock import tomar_snapshot
+
+STOCK_SNAPSHOT_INTERVAL_SECONDS = 24 * 60 * 60
+# Al arrancar se espera un poco antes de mirar la última copia, para no
+# competir con el arranque; tras un error se reintenta con esta pausa
+STOCK_SNAPSHOT_STARTUP_DELAY_SECONDS = 60
+STOCK_SNAPSHOT_RETRY_SECONDS = 60
+
+logger = logging.getLogger(__name__)
+
+async def snapshot_once(interval: float = 0) -> int:
+    async with AsyncSessionLocal() as db:
+        # Con varios workers, solo el primero en llegar toma la copia
+        ultima = await db.scalar(select(func.max(StockSnapshotModel.fecha)))
+        if ultima is not None and datetime.now() - ultima < timedelta(seconds=interval):
+            return 0
+        filas = await tomar_snapshot(db)
+        await db.commit()
+        return filas
+
+async def segundos_hasta_copia(interval: float) -> float:
+    """Lo que falta para que la última copia tenga ``interval`` de antigüedad (0 si ya la tiene)."""
+    async with AsyncSessionLocal() as db:
+        ultima = await db.scalar(select(func.max(StockSnapshotModel.fecha)))
+    if ultima is None:
+        return 0
+    return max(0.0, interval - (datetime.now() - ultima).total_seconds())
+
+async def run_periodically(
+    interval: float = STOCK_SNAPSHOT_INTERVAL_SECONDS,
+    startup_delay: float = STOCK_SNAPSHOT_STARTUP_DELAY_SECONDS,
+):
+    # La espera se calcula desde la última copia y no desde el arranque: si
+    # el proceso se reinicia a menudo, la copia vencida se toma igualmente
+    await asyncio.sleep(startup_delay)
+    while True:
+        try:
+            espera = await segundos_hasta_copia(interval)
+            if espera == 0:
+                filas = await snapshot_once(interval)
+                if filas:
+                    logger.info("stock_snapshots: copia de %s filas", filas)
+                espera = await segundos_hasta_copia(interval)
+        except Exception:
+            logger.exception("Error al copiar stocks en stock_snapshots")
+            espera = STOCK_SNAPSHOT_RETRY_SECONDS
+        # Nunca 0: si el reloj de la base va por detrás, no se gira en vacío
+        await asyncio.sleep(max(espera, 1))
+
+if __name__ == "__main__":
+    print(f"{asyncio.run(snapshot_once())} filas copiadas")
@@ -0,0 +1,46 @@
+"""Conciliación de productos.stock_total con la suma de stocks.cantidad.
+
+``python -m jobs.stock_total`` lista los productos descuadrados y termina con
+código 1 si hay alguno; con ``--corregir`` además recalcula sus totales.
+"""
+import argparse
+import asyncio
+import sys
+
+from sqlalchemy import func, select, update
+
+from config.database import AsyncSessionLocal
+from models.producto import Producto as ProductoModel
+from models.stock import Stock as StockModel
+from utils.stock import diferencias_stock_total, registrar_cambio_stock
+
+async def conciliar(corregir: bool = False):
+    async with AsyncSessionLocal() as db:
+        diferencias = await diferencias_stock_total(db)
+        if corregir and diferencias:
+            # La suma se recalcula en la propia sentencia, no con el valor leído
+            suma = (
+                select(func.coalesce(func.sum(StockModel.cantidad), 0))
+                .where(StockModel.producto_id == ProductoModel.id)
+                .scalar_subquery()
+            )
+            await db.execute(
+                update(ProductoModel)
+                .where(ProductoModel.id.in_([d["producto_id"] for d in diferencias]))
+                .values(stock_total=suma)
+                .execution_options(synchronize_session=False)
+            )
+            await registrar_cambio_stock(db, [d["producto_id"] for d in diferencias])
+            await db.commit()
+        return diferencias
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concilia productos.stock_total con la suma de stocks")
+    parser.add_argument("--corregir", action="store_true", help="recalcula los totales descuadrados")
+    args = parser.parse_args()
+
+    diferencias = asyncio.run(conciliar(args.corregir))
+    for diferencia in diferencias:
+        print(f"producto {diferencia['producto_id']}: stock_total={diferencia['stock_total']} suma={diferencia['suma']}")
+    print(f"{len(diferencias)} productos descuadrados")
+    sys.exit(1 if diferencias and not args.corregir else 0)
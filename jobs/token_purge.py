@@ -0,0 +1,31 @@
+"""Purga de token_blacklist.
+
+Las filas de tokens ya expirados no protegen nada: app.py ejecuta esta purga en
+segundo plano y también puede lanzarse a mano con ``python -m jobs.token_purge``.
+"""
+import asyncio
+import logging
+
+from config.database import AsyncSessionLocal
+from utils.utils import purge_expired_tokens
+
+TOKEN_PURGE_INTERVAL_SECONDS = 10 * 60
+
+logger = logging.getLogger(__name__)
+
+async def purge_once() -> int:
+    async with AsyncSessionLocal() as db:
+        return await purge_expired_tokens(db)
+
+async def run_periodically(interval: float = TOKEN_PURGE_INTERVAL_SECONDS):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            deleted = await purge_once()
+            if deleted:
+                logger.info("token_blacklist: %s tokens expirados eliminados", deleted)
+        except Exception:
+            logger.exception("Error al purgar token_blacklist")
+
+if __name__ == "__main__":
+    print(f"{asyncio.run(purge_once())} tokens expirados eliminados")
@@ -1,8 +1,12 @@
 from models.user import User, TokenBlacklist
 from models.categoria import Categoria
+from models.catalogo_version import CatalogoVersion
 from models.proveedor import Proveedor
 from models.ubicacion import Ubicacion
 from models.producto import Producto
+from models.producto_token import ProductoToken
 from models.stock import Stock
+from models.stock_snapshot import StockSnapshot
 from models.tipo_movimiento import TipoMovimiento
-from models.movimiento_inventario import MovimientoInventario 
\ No newline at end of file
+from models.movimiento_inventario import MovimientoInventario
+from models.movimiento_diario import MovimientoDiario 
\ No newline at end of file
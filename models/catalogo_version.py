@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String
+from config.database import Base
+
+class CatalogoVersion(Base):
+    """Contador de cambios de una tabla del catálogo, para las ETag de sus listados.
+
+    Además de las tablas hay un contador para el informe de valoración:
+    "precios" (precio de compra o categoría de un producto). La versión de las
+    existencias se reparte en varias filas "stocks.N" según el producto
+    (utils.stock.registrar_cambio_stock).
+    """
+    __tablename__ = 'catalogo_versiones'
+
+    tabla = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0, server_default="0")
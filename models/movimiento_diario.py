@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, Float, Date, ForeignKey, Index, UniqueConstraint
+from config.database import Base
+
+class MovimientoDiario(Base):
+    """Resumen diario de movimientos por producto, ubicación y tipo, para las series de GET /movimientos/series.
+
+    Cada movimiento cuenta como salida en su ubicación de origen y como
+    entrada en la de destino (una transferencia aparece en las dos). Lo
+    mantienen las rutas que crean movimientos (utils.stock.sumar_movimientos_diarios);
+    jobs.movimientos_diarios lo reconstruye desde movimientos_inventario.
+    """
+    __tablename__ = 'movimientos_diarios'
+
+    id = Column(Integer, primary_key=True, index=True)
+    fecha = Column(Date, nullable=False)
+    entradas = Column(Float(precision=2), nullable=False, default=0)
+    salidas = Column(Float(precision=2), nullable=False, default=0)
+    movimientos = Column(Integer, nullable=False, default=0)
+    
+    # Claves foráneas
+    producto_id = Column(Integer, ForeignKey("productos.id"), nullable=False)
+    ubicacion_id = Column(Integer, ForeignKey("ubicaciones.id"), nullable=False)
+    tipo_movimiento_id = Column(Integer, ForeignKey("tipos_movimiento.id"), nullable=False)
+    
+    __table_args__ = (
+        # Clave del upsert y, por empezar por fecha, de las series sin filtros
+        UniqueConstraint('fecha', 'producto_id', 'ubicacion_id', 'tipo_movimiento_id', name='uix_movimiento_diario'),
+        Index('ix_movimientos_diarios_producto_fecha', 'producto_id', 'fecha'),
+        Index('ix_movimientos_diarios_ubicacion_fecha', 'ubicacion_id', 'fecha'),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Index, Text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from config.database import Base
@@ -24,4 +24,14 @@ class MovimientoInventario(Base):
     producto = relationship("Producto", back_populates="movimientos")
     ubicacion_origen = relationship("Ubicacion", foreign_keys=[ubicacion_origen_id], back_populates="movimientos_origen")
     ubicacion_destino = relationship("Ubicacion", foreign_keys=[ubicacion_destino_id], back_populates="movimientos_destino") 
-    usuario = relationship("User", backref="movimientos_registrados") 
\ No newline at end of file
+    usuario = relationship("User", backref="movimientos_registrados")
+
+    __table_args__ = (
+        # Orden del listado y clave de la paginación por cursor
+        Index('ix_movimientos_inventario_fecha_id', 'fecha', 'id'),
+        # Filtros de read_movimientos, ya ordenados por fecha dentro de cada valor
+        Index('ix_movimientos_inventario_producto_fecha', 'producto_id', 'fecha'),
+        Index('ix_movimientos_inventario_tipo_fecha', 'tipo_movimiento_id', 'fecha'),
+        Index('ix_movimientos_inventario_ubicacion_origen_id', 'ubicacion_origen_id'),
+        Index('ix_movimientos_inventario_ubicacion_destino_id', 'ubicacion_destino_id'),
+    )
\ No newline at end of file
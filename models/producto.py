@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, Index, Text
 from sqlalchemy.orm import relationship
 from config.database import Base
 
@@ -13,6 +13,10 @@ class Producto(Base):
     precio_venta = Column(Float(precision=2), nullable=True)
     unidad_medida = Column(String(20), nullable=True)  # unidad, kg, litro, etc.
     stock_minimo = Column(Integer, default=0)
+    # Suma de stocks.cantidad de todas las ubicaciones. La mantienen las rutas
+    # que modifican stocks (utils.stock.ajustar_stock_total); jobs.stock_total
+    # comprueba que coincide con la suma real
+    stock_total = Column(Float(precision=2), nullable=False, default=0, server_default="0")
     activo = Column(Boolean, default=True)
     
     # Claves foráneas
@@ -23,4 +27,10 @@ class Producto(Base):
     categoria = relationship("Categoria", back_populates="productos")
     proveedor = relationship("Proveedor", back_populates="productos")
     stocks = relationship("Stock", back_populates="producto")
-    movimientos = relationship("MovimientoInventario", back_populates="producto") 
\ No newline at end of file
+    movimientos = relationship("MovimientoInventario", back_populates="producto")
+
+    # Informe de productos bajo mínimo: rango sobre stock_minimo > 0 (la
+    # mayoría no tiene mínimo) comparando stock_total sin leer la tabla
+    __table_args__ = (
+        Index('ix_productos_stock_minimo', 'stock_minimo', 'stock_total'),
+    )
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
+from config.database import Base
+
+class ProductoToken(Base):
+    """Índice de búsqueda: una fila por cada palabra del código o el nombre de un producto.
+
+    Las palabras se guardan normalizadas (minúsculas, sin acentos), así que
+    una búsqueda por prefijo es un recorrido por rango de la clave primaria.
+    La mantiene utils.productos.indexar_productos.
+    """
+    __tablename__ = 'producto_tokens'
+
+    token = Column(String(50), primary_key=True)
+    producto_id = Column(Integer, ForeignKey("productos.id"), primary_key=True)
+    
+    __table_args__ = (
+        Index('ix_producto_tokens_producto_id', 'producto_id'),
+    )
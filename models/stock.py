@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, Integer, Float, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from config.database import Base
 
@@ -16,7 +16,9 @@ class Stock(Base):
     producto = relationship("Producto", back_populates="stocks")
     ubicacion = relationship("Ubicacion", back_populates="stocks")
     
-    # Asegurar que la combinación producto-ubicación sea única
+    # Asegurar que la combinación producto-ubicación sea única; el índice de
+    # la restricción ya sirve para filtrar por producto, no por ubicación
     __table_args__ = (
         UniqueConstraint('producto_id', 'ubicacion_id', name='uix_producto_ubicacion'),
+        Index('ix_stocks_ubicacion_id', 'ubicacion_id'),
     ) 
\ No newline at end of file
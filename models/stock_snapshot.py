@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, Index
+from config.database import Base
+
+class StockSnapshot(Base):
+    """Copia de la tabla stocks en un instante, para consultar existencias pasadas."""
+    __tablename__ = 'stock_snapshots'
+
+    id = Column(Integer, primary_key=True, index=True)
+    # Todas las filas de una misma copia comparten fecha
+    fecha = Column(DateTime, nullable=False)
+    cantidad = Column(Float(precision=2), nullable=False)
+    
+    # Claves foráneas
+    producto_id = Column(Integer, ForeignKey("productos.id"), nullable=False)
+    ubicacion_id = Column(Integer, ForeignKey("ubicaciones.id"), nullable=False)
+    
+    __table_args__ = (
+        Index('ix_stock_snapshots_fecha_ubicacion', 'fecha', 'ubicacion_id'),
+    )
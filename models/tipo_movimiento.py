@@ -9,7 +9,7 @@ class TipoMovimiento(Base):
     codigo = Column(String(20), unique=True, index=True)
     nombre = Column(String(100), unique=True)
     descripcion = Column(String(255), nullable=True)
-    afecta_stock = Column(String(10), nullable=False)  # "entrada", "salida", "ninguno"
+    afecta_stock = Column(String(20), nullable=False)  # "entrada", "salida", "transferencia", "ninguno"
     
     # Relación con movimientos de inventario
     movimientos = relationship("MovimientoInventario", back_populates="tipo_movimiento") 
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Integer, String, DateTime
 from sqlalchemy.orm import relationship
 from config.database import Base
 
@@ -20,4 +20,7 @@ class TokenBlacklist(Base):
     __tablename__ = 'token_blacklist'
 
     id = Column(Integer, primary_key=True, index=True)
-    token = Column(String(500), unique=True, index=True)
+    # SHA-256 (hex) del jti; los tokens emitidos sin jti se identifican por el token completo
+    token_hash = Column(String(64), unique=True, index=True, nullable=False)
+    # exp del token revocado: pasada esa fecha la fila ya no protege nada y se purga
+    expires_at = Column(DateTime, index=True, nullable=False)
@@ -1,48 +1,59 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List
 
-from config.database import get_db
+from config.database import get_async_db
 from models.categoria import Categoria as CategoriaModel
+from models.producto import Producto as ProductoModel
 from schemas.categoria import CategoriaCreate, CategoriaResponse, CategoriaUpdate
-from utils.auth import get_current_active_user
-from models.user import User as UserModel
+from utils.auth import Principal, get_current_active_user
+from utils.etag import etag_catalogo, registrar_cambio
+from utils.integridad import comprobar_dependencias, dependencia
+from utils.referencias import invalidar_referencia, obtener_referencia
 
 router = APIRouter(prefix="/categorias", tags=["categorias"])
 
+# Filas que impiden borrar la categoría (utils.integridad)
+DEPENDENCIAS = [
+    dependencia("productos", "No se puede eliminar la categoría porque tiene productos asociados", ProductoModel.categoria_id),
+]
+
 @router.post("/", response_model=CategoriaResponse)
 async def create_categoria(
     categoria: CategoriaCreate, 
-    current_user: UserModel = Depends(get_current_active_user), 
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_categoria = db.query(CategoriaModel).filter(CategoriaModel.nombre == categoria.nombre).first()
+    db_categoria = await db.scalar(select(CategoriaModel).where(CategoriaModel.nombre == categoria.nombre))
     if db_categoria:
         raise HTTPException(status_code=400, detail="Ya existe una categoría con ese nombre")
     
     db_categoria = CategoriaModel(**categoria.model_dump())
     db.add(db_categoria)
-    db.commit()
-    db.refresh(db_categoria)
+    await registrar_cambio(db, "categorias")
+    await db.commit()
+    await db.refresh(db_categoria)
     return db_categoria
 
-@router.get("/", response_model=List[CategoriaResponse])
+@router.get("/", response_model=List[CategoriaResponse], dependencies=[Depends(etag_catalogo("categorias"))])
 async def read_categorias(
     skip: int = 0, 
     limit: int = 100, 
-    current_user: UserModel = Depends(get_current_active_user), 
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
 ):
-    categorias = db.query(CategoriaModel).offset(skip).limit(limit).all()
-    return categorias
+    result = await db.scalars(select(CategoriaModel).offset(skip).limit(limit))
+    return result.all()
 
 @router.get("/{categoria_id}", response_model=CategoriaResponse)
 async def read_categoria(
     categoria_id: int, 
-    current_user: UserModel = Depends(get_current_active_user), 
-    db: Session = Depends(get_db)
+    version: Dict[str, int] = Depends(etag_catalogo("categorias")),
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_categoria = db.query(CategoriaModel).filter(CategoriaModel.id == categoria_id).first()
+    db_categoria = await obtener_referencia(db, CategoriaModel, categoria_id, version["categorias"])
     if db_categoria is None:
         raise HTTPException(status_code=404, detail="Categoría no encontrada")
     return db_categoria
@@ -51,16 +62,16 @@ async def read_categoria(
 async def update_categoria(
     categoria_id: int, 
     categoria: CategoriaUpdate, 
-    current_user: UserModel = Depends(get_current_active_user), 
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_categoria = db.query(CategoriaModel).filter(CategoriaModel.id == categoria_id).first()
+    db_categoria = await db.get(CategoriaModel, categoria_id)
     if db_categoria is None:
         raise HTTPException(status_code=404, detail="Categoría no encontrada")
     
     # Verificar que no exista otra categoría con el mismo nombre
     if categoria.nombre and categoria.nombre != db_categoria.nombre:
-        nombre_exists = db.query(CategoriaModel).filter(CategoriaModel.nombre == categoria.nombre).first()
+        nombre_exists = await db.scalar(select(CategoriaModel).where(CategoriaModel.nombre == categoria.nombre))
         if nombre_exists:
             raise HTTPException(status_code=400, detail="Ya existe una categoría con ese nombre")
     
@@ -69,27 +80,28 @@ async def update_categoria(
     for key, value in categoria_data.items():
         setattr(db_categoria, key, value)
     
-    db.commit()
-    db.refresh(db_categoria)
+    await registrar_cambio(db, "categorias")
+    await db.commit()
+    invalidar_referencia(CategoriaModel, categoria_id)
+    await db.refresh(db_categoria)
     return db_categoria
 
 @router.delete("/{categoria_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_categoria(
     categoria_id: int, 
-    current_user: UserModel = Depends(get_current_active_user), 
-    db: Session = Depends(get_db)
+    contar: bool = False,
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_categoria = db.query(CategoriaModel).filter(CategoriaModel.id == categoria_id).first()
+    db_categoria = await db.get(CategoriaModel, categoria_id)
     if db_categoria is None:
         raise HTTPException(status_code=404, detail="Categoría no encontrada")
     
     # Verificar si hay productos asociados antes de eliminar
-    if db_categoria.productos:
-        raise HTTPException(
-            status_code=400, 
-            detail="No se puede eliminar la categoría porque tiene productos asociados"
-        )
+    await comprobar_dependencias(db, DEPENDENCIAS, categoria_id, contar)
     
-    db.delete(db_categoria)
-    db.commit()
+    await db.delete(db_categoria)
+    await registrar_cambio(db, "categorias")
+    await db.commit()
+    invalidar_referencia(CategoriaModel, categoria_id)
     return None 
\ No newline at end of file
@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Depends
+
+from utils.auth import Principal, get_admin_user
+from utils import utils
+from utils.referencias import stats_referencias
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+@router.get("/password-pool")
+async def read_password_pool_metrics(current_user: Principal = Depends(get_admin_user)):
+    return utils.password_hash_pool.stats()
+
+@router.get("/reference-cache")
+async def read_reference_cache_metrics(current_user: Principal = Depends(get_admin_user)):
+    return stats_referencias()
@@ -1,79 +1,145 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased, joinedload
+from typing import List, Literal, Optional
+from datetime import date, datetime
 
-from config.database import get_db
+from config.database import get_async_db
+from models.movimiento_diario import MovimientoDiario as MovimientoDiarioModel
 from models.movimiento_inventario import MovimientoInventario as MovimientoModel
 from models.tipo_movimiento import TipoMovimiento as TipoMovimientoModel
 from models.producto import Producto as ProductoModel
 from models.ubicacion import Ubicacion as UbicacionModel
-from models.stock import Stock as StockModel
-from schemas.movimiento_inventario import MovimientoInventarioCreate, MovimientoInventarioResponse, MovimientoInventarioUpdate, MovimientoInventarioDetalleResponse
-from utils.auth import get_current_active_user
 from models.user import User as UserModel
+from schemas.movimiento_inventario import MovimientoInventarioCreate, MovimientoInventarioResponse, MovimientoInventarioUpdate, MovimientoInventarioDetalleResponse, MovimientoSerieResponse
+from schemas.producto import ProductoResponse
+from schemas.tipo_movimiento import TipoMovimientoResponse
+from schemas.ubicacion import UbicacionResponse
+from schemas.user import UserResponse
+from utils.auth import Principal, get_current_active_user
+from utils.pagination import decode_cursor, encode_cursor
+from utils.referencias import obtener_referencia, obtener_referencias
+from utils.serializacion import Proyeccion, exportar_filas, respuesta_json
+from utils.stock import ajustar_stock_total, descontar_stock, registrar_cambio_stock, stock_disponible, sumar_movimientos_diarios, sumar_stock, sumar_stock_lote, tramos_diarios
 
 router = APIRouter(prefix="/movimientos", tags=["movimientos"])
 
+# Relaciones que serializa MovimientoInventarioDetalleResponse. Todas son
+# many-to-one, así que un JOIN por relación las trae en la misma consulta que
+# la página (sin multiplicar filas) en lugar de una consulta por movimiento
+DETALLE_OPTIONS = [
+    joinedload(MovimientoModel.tipo_movimiento),
+    joinedload(MovimientoModel.producto),
+    joinedload(MovimientoModel.ubicacion_origen),
+    joinedload(MovimientoModel.ubicacion_destino),
+    joinedload(MovimientoModel.usuario),
+]
+
+# Las dos ubicaciones de un movimiento salen de la misma tabla
+ORIGEN = aliased(UbicacionModel)
+DESTINO = aliased(UbicacionModel)
+
+# El listado lee directamente las columnas de MovimientoInventarioDetalleResponse
+# y construye el JSON sin pasar por entidades ORM ni validar cada fila
+DETALLE_PROYECCION = Proyeccion(
+    MovimientoInventarioDetalleResponse, MovimientoModel,
+    tipo_movimiento=Proyeccion(TipoMovimientoResponse, TipoMovimientoModel),
+    producto=Proyeccion(ProductoResponse, ProductoModel),
+    ubicacion_origen=Proyeccion(UbicacionResponse, ORIGEN),
+    ubicacion_destino=Proyeccion(UbicacionResponse, DESTINO),
+    usuario=Proyeccion(UserResponse, UserModel),
+)
+
+def con_detalle(query):
+    """JOIN de las tablas que aparecen en el detalle de un movimiento."""
+    return (
+        query
+        .join(TipoMovimientoModel, TipoMovimientoModel.id == MovimientoModel.tipo_movimiento_id)
+        .join(ProductoModel, ProductoModel.id == MovimientoModel.producto_id)
+        .join(UserModel, UserModel.id == MovimientoModel.usuario_id)
+        .outerjoin(ORIGEN, ORIGEN.id == MovimientoModel.ubicacion_origen_id)
+        .outerjoin(DESTINO, DESTINO.id == MovimientoModel.ubicacion_destino_id)
+    )
+
+# Líneas máximas por lote; un albarán grande se envía en varios
+MAX_LOTE = 1000
+
+def validar_tipo_movimiento(afecta_stock: str, movimiento: MovimientoInventarioCreate) -> Optional[str]:
+    """Mensaje de error si el movimiento no trae las ubicaciones que exige su tipo."""
+    if afecta_stock == "entrada" and not movimiento.ubicacion_destino_id:
+        return "Para movimientos de entrada se requiere una ubicación de destino"
+    if afecta_stock == "salida" and not movimiento.ubicacion_origen_id:
+        return "Para movimientos de salida se requiere una ubicación de origen"
+    if afecta_stock == "transferencia":
+        if not movimiento.ubicacion_origen_id or not movimiento.ubicacion_destino_id:
+            return "Para transferencias se requieren una ubicación de origen y una de destino"
+        if movimiento.ubicacion_origen_id == movimiento.ubicacion_destino_id:
+            return "La ubicación de origen y la de destino deben ser distintas"
+    if afecta_stock not in ["entrada", "salida", "transferencia", "ninguno"]:
+        return "El tipo de movimiento debe afectar al stock como 'entrada', 'salida', 'transferencia' o 'ninguno'"
+    return None
+
 @router.post("/", response_model=MovimientoInventarioResponse)
 async def create_movimiento(
     movimiento: MovimientoInventarioCreate, 
-    current_user: UserModel = Depends(get_current_active_user), 
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Verificar que exista el producto
-    producto = db.query(ProductoModel).filter(ProductoModel.id == movimiento.producto_id).first()
+    producto = await db.get(ProductoModel, movimiento.producto_id)
     if not producto:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
     
-    # Verificar que exista el tipo de movimiento
-    tipo_movimiento = db.query(TipoMovimientoModel).filter(TipoMovimientoModel.id == movimiento.tipo_movimiento_id).first()
+    # Tipo y ubicaciones salen de la caché de referencias: casi nunca cambian
+    tipo_movimiento = await obtener_referencia(db, TipoMovimientoModel, movimiento.tipo_movimiento_id)
     if not tipo_movimiento:
         raise HTTPException(status_code=404, detail="Tipo de movimiento no encontrado")
     
     # Verificar ubicaciones según el tipo de movimiento
-    if tipo_movimiento.afecta_stock == "entrada" and not movimiento.ubicacion_destino_id:
-        raise HTTPException(
-            status_code=400, 
-            detail="Para movimientos de entrada se requiere una ubicación de destino"
-        )
+    error = validar_tipo_movimiento(tipo_movimiento.afecta_stock, movimiento)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
     
-    if tipo_movimiento.afecta_stock == "salida" and not movimiento.ubicacion_origen_id:
-        raise HTTPException(
-            status_code=400, 
-            detail="Para movimientos de salida se requiere una ubicación de origen"
-        )
+    # Verificar ubicaciones si se proporcionan
+    ubicaciones = await obtener_referencias(
+        db, UbicacionModel, [u for u in (movimiento.ubicacion_origen_id, movimiento.ubicacion_destino_id) if u]
+    )
+    if movimiento.ubicacion_origen_id and movimiento.ubicacion_origen_id not in ubicaciones:
+        raise HTTPException(status_code=404, detail="Ubicación de origen no encontrada")
     
-    if tipo_movimiento.afecta_stock not in ["entrada", "salida", "ninguno"]:
-        raise HTTPException(
-            status_code=400, 
-            detail="El tipo de movimiento debe afectar al stock como 'entrada', 'salida' o 'ninguno'"
-        )
+    if movimiento.ubicacion_destino_id and movimiento.ubicacion_destino_id not in ubicaciones:
+        raise HTTPException(status_code=404, detail="Ubicación de destino no encontrada")
     
-    # Verificar ubicaciones si se proporcionan
-    if movimiento.ubicacion_origen_id:
-        origen = db.query(UbicacionModel).filter(UbicacionModel.id == movimiento.ubicacion_origen_id).first()
-        if not origen:
-            raise HTTPException(status_code=404, detail="Ubicación de origen no encontrada")
-    
-    if movimiento.ubicacion_destino_id:
-        destino = db.query(UbicacionModel).filter(UbicacionModel.id == movimiento.ubicacion_destino_id).first()
-        if not destino:
-            raise HTTPException(status_code=404, detail="Ubicación de destino no encontrada")
-    
-    # Verificar stock suficiente para movimientos de salida
-    if tipo_movimiento.afecta_stock == "salida" and movimiento.ubicacion_origen_id:
-        stock = db.query(StockModel).filter(
-            StockModel.producto_id == movimiento.producto_id,
-            StockModel.ubicacion_id == movimiento.ubicacion_origen_id
-        ).first()
-        
-        if not stock or stock.cantidad < movimiento.cantidad:
+    # La fecha se toma antes de tocar el stock: una copia de stocks posterior
+    # a ella puede ya incluir el cambio, y /stocks/at solo aplica sobre la
+    # copia los movimientos de después
+    fecha = datetime.now()
+    
+    # Actualizar el stock según el tipo de movimiento. Cada cambio es una
+    # única sentencia condicional, así que dos peticiones simultáneas no
+    # pueden vender las mismas existencias ni crear el mismo registro de stock.
+    # Una transferencia descuenta del origen y suma al destino en la misma
+    # transacción y queda registrada como un único movimiento
+    if tipo_movimiento.afecta_stock in ("salida", "transferencia") and movimiento.ubicacion_origen_id:
+        if not await descontar_stock(db, movimiento.producto_id, movimiento.ubicacion_origen_id, movimiento.cantidad):
+            disponible = await stock_disponible(db, movimiento.producto_id, movimiento.ubicacion_origen_id)
+            await db.rollback()
             raise HTTPException(
                 status_code=400, 
-                detail=f"Stock insuficiente en la ubicación de origen. Disponible: {stock.cantidad if stock else 0}"
+                detail=f"Stock insuficiente en la ubicación de origen. Disponible: {disponible}"
             )
     
+    if tipo_movimiento.afecta_stock in ("entrada", "transferencia") and movimiento.ubicacion_destino_id:
+        await sumar_stock(db, movimiento.producto_id, movimiento.ubicacion_destino_id, movimiento.cantidad)
+    
+    # Una transferencia no cambia el total del producto
+    if tipo_movimiento.afecta_stock == "entrada":
+        await ajustar_stock_total(db, {movimiento.producto_id: movimiento.cantidad})
+    elif tipo_movimiento.afecta_stock == "salida":
+        await ajustar_stock_total(db, {movimiento.producto_id: -movimiento.cantidad})
+    
     # Crear el movimiento
     db_movimiento = MovimientoModel(
         cantidad=movimiento.cantidad,
@@ -84,81 +150,250 @@ async def create_movimiento(
         referencia=movimiento.referencia,
         observaciones=movimiento.observaciones,
         usuario_id=current_user.id,
-        fecha=datetime.now()
+        fecha=fecha
     )
     
     db.add(db_movimiento)
+    await sumar_movimientos_diarios(db, tramos_diarios(db_movimiento, tipo_movimiento.afecta_stock))
     
-    # Actualizar el stock según el tipo de movimiento
-    if tipo_movimiento.afecta_stock == "entrada" and movimiento.ubicacion_destino_id:
-        # Buscar o crear el registro de stock en la ubicación de destino
-        stock_destino = db.query(StockModel).filter(
-            StockModel.producto_id == movimiento.producto_id,
-            StockModel.ubicacion_id == movimiento.ubicacion_destino_id
-        ).first()
-        
-        if stock_destino:
-            stock_destino.cantidad += movimiento.cantidad
-        else:
-            nuevo_stock = StockModel(
-                producto_id=movimiento.producto_id,
-                ubicacion_id=movimiento.ubicacion_destino_id,
-                cantidad=movimiento.cantidad
-            )
-            db.add(nuevo_stock)
-    
-    elif tipo_movimiento.afecta_stock == "salida" and movimiento.ubicacion_origen_id:
-        # Actualizar el stock en la ubicación de origen
-        stock_origen = db.query(StockModel).filter(
-            StockModel.producto_id == movimiento.producto_id,
-            StockModel.ubicacion_id == movimiento.ubicacion_origen_id
-        ).first()
-        
-        stock_origen.cantidad -= movimiento.cantidad
-    
-    db.commit()
-    db.refresh(db_movimiento)
+    # Versión de las existencias, para el informe de valoración
+    if tipo_movimiento.afecta_stock != "ninguno":
+        await registrar_cambio_stock(db, [movimiento.producto_id])
+    await db.commit()
+    await db.refresh(db_movimiento)
     return db_movimiento
 
+@router.post("/batch", response_model=List[MovimientoInventarioResponse])
+async def create_movimientos_batch(
+    movimientos: List[MovimientoInventarioCreate],
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    if len(movimientos) > MAX_LOTE:
+        raise HTTPException(status_code=400, detail=f"El lote admite como máximo {MAX_LOTE} movimientos")
+    if not movimientos:
+        return []
+    
+    # Validar todas las referencias con una consulta por tabla (tipos y
+    # ubicaciones solo para los ids que no estén ya en la caché)
+    producto_ids = {m.producto_id for m in movimientos}
+    tipo_ids = {m.tipo_movimiento_id for m in movimientos}
+    ubicacion_ids = {u for m in movimientos for u in (m.ubicacion_origen_id, m.ubicacion_destino_id) if u}
+    
+    productos = set(await db.scalars(select(ProductoModel.id).where(ProductoModel.id.in_(producto_ids))))
+    tipos = {t.id: t.afecta_stock for t in (await obtener_referencias(db, TipoMovimientoModel, tipo_ids)).values()}
+    ubicaciones = set(await obtener_referencias(db, UbicacionModel, ubicacion_ids))
+    
+    errores = []
+    for indice, movimiento in enumerate(movimientos):
+        if movimiento.producto_id not in productos:
+            error = "Producto no encontrado"
+        elif movimiento.tipo_movimiento_id not in tipos:
+            error = "Tipo de movimiento no encontrado"
+        elif movimiento.ubicacion_origen_id and movimiento.ubicacion_origen_id not in ubicaciones:
+            error = "Ubicación de origen no encontrada"
+        elif movimiento.ubicacion_destino_id and movimiento.ubicacion_destino_id not in ubicaciones:
+            error = "Ubicación de destino no encontrada"
+        else:
+            error = validar_tipo_movimiento(tipos[movimiento.tipo_movimiento_id], movimiento)
+        if error:
+            errores.append({"indice": indice, "detail": error})
+    if errores:
+        raise HTTPException(status_code=400, detail=errores)
+    
+    # Variación neta por producto y ubicación: cada pareja se toca una sola
+    # vez y las salidas se comprueban contra el resultado de todo el lote
+    variaciones = {}
+    for movimiento in movimientos:
+        afecta_stock = tipos[movimiento.tipo_movimiento_id]
+        if afecta_stock in ("entrada", "transferencia"):
+            clave = (movimiento.producto_id, movimiento.ubicacion_destino_id)
+            variaciones[clave] = variaciones.get(clave, 0) + movimiento.cantidad
+        if afecta_stock in ("salida", "transferencia"):
+            clave = (movimiento.producto_id, movimiento.ubicacion_origen_id)
+            variaciones[clave] = variaciones.get(clave, 0) - movimiento.cantidad
+    
+    # Antes de tocar el stock, como en create_movimiento
+    fecha = datetime.now()
+    
+    # Siempre en el mismo orden, para que dos lotes simultáneos no se bloqueen
+    # mutuamente al tomar las filas de stock
+    variaciones = sorted(variaciones.items())
+    await sumar_stock_lote(db, [
+        {"producto_id": producto_id, "ubicacion_id": ubicacion_id, "cantidad": cantidad}
+        for (producto_id, ubicacion_id), cantidad in variaciones if cantidad > 0
+    ])
+    sin_stock = []
+    for (producto_id, ubicacion_id), cantidad in variaciones:
+        if cantidad < 0 and not await descontar_stock(db, producto_id, ubicacion_id, -cantidad):
+            sin_stock.append((producto_id, ubicacion_id))
+    if sin_stock:
+        await db.rollback()
+        for producto_id, ubicacion_id in sin_stock:
+            disponible = await stock_disponible(db, producto_id, ubicacion_id)
+            errores += [
+                {"indice": indice, "detail": f"Stock insuficiente en la ubicación de origen. Disponible: {disponible}"}
+                for indice, m in enumerate(movimientos)
+                if tipos[m.tipo_movimiento_id] in ("salida", "transferencia") and (m.producto_id, m.ubicacion_origen_id) == (producto_id, ubicacion_id)
+            ]
+        raise HTTPException(status_code=400, detail=sorted(errores, key=lambda e: e["indice"]))
+    
+    totales = {}
+    for (producto_id, ubicacion_id), cantidad in variaciones:
+        totales[producto_id] = totales.get(producto_id, 0) + cantidad
+    await ajustar_stock_total(db, totales)
+    
+    db_movimientos = [
+        MovimientoModel(**movimiento.model_dump(), usuario_id=current_user.id, fecha=fecha)
+        for movimiento in movimientos
+    ]
+    db.add_all(db_movimientos)
+    await sumar_movimientos_diarios(db, [
+        tramo for m in db_movimientos for tramo in tramos_diarios(m, tipos[m.tipo_movimiento_id])
+    ])
+    await registrar_cambio_stock(db, [producto_id for (producto_id, _), _ in variaciones])
+    await db.commit()
+    return db_movimientos
+
+def filtrar_movimientos(query, producto_id=None, tipo_movimiento_id=None, fecha_desde=None, fecha_hasta=None):
+    """Filtros comunes del listado y la exportación de movimientos."""
+    if producto_id:
+        query = query.where(MovimientoModel.producto_id == producto_id)
+    
+    if tipo_movimiento_id:
+        query = query.where(MovimientoModel.tipo_movimiento_id == tipo_movimiento_id)
+    
+    if fecha_desde:
+        query = query.where(MovimientoModel.fecha >= fecha_desde)
+    
+    if fecha_hasta:
+        query = query.where(MovimientoModel.fecha <= fecha_hasta)
+    return query
+
 @router.get("/", response_model=List[MovimientoInventarioDetalleResponse])
 async def read_movimientos(
+    response: Response,
     skip: int = 0, 
     limit: int = 100,
+    cursor: Optional[str] = None,
     producto_id: Optional[int] = None,
     tipo_movimiento_id: Optional[int] = None,
     fecha_desde: Optional[datetime] = None,
     fecha_hasta: Optional[datetime] = None,
-    current_user: UserModel = Depends(get_current_active_user), 
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
 ):
-    query = db.query(MovimientoModel)
+    query = filtrar_movimientos(
+        con_detalle(select(*DETALLE_PROYECCION.columnas)),
+        producto_id, tipo_movimiento_id, fecha_desde, fecha_hasta
+    )
     
-    # Aplicar filtros si se proporcionan
-    if producto_id:
-        query = query.filter(MovimientoModel.producto_id == producto_id)
+    # Ordenar por fecha descendente; el id desempata para que el orden sea estable
+    query = query.order_by(MovimientoModel.fecha.desc(), MovimientoModel.id.desc())
     
-    if tipo_movimiento_id:
-        query = query.filter(MovimientoModel.tipo_movimiento_id == tipo_movimiento_id)
+    if cursor:
+        # Paginación por clave: se continúa tras la última fila de la página
+        # anterior, así que el coste no crece con la profundidad y las filas
+        # nuevas no desplazan las páginas ya leídas
+        fecha, movimiento_id = decode_cursor(cursor)
+        # La cota fecha <= :fecha es la que permite entrar por el índice
+        # (fecha, id); el OR solo descarta las filas ya vistas de esa fecha
+        query = query.where(
+            MovimientoModel.fecha <= fecha,
+            or_(MovimientoModel.fecha < fecha, MovimientoModel.id < movimiento_id)
+        )
+    else:
+        query = query.offset(skip)
     
-    if fecha_desde:
-        query = query.filter(MovimientoModel.fecha >= fecha_desde)
+    movimientos = DETALLE_PROYECCION.lista(await db.execute(query.limit(limit)))
+    if movimientos and len(movimientos) == limit:
+        ultimo = movimientos[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(ultimo["fecha"], ultimo["id"])
+    return respuesta_json(movimientos, response)
+
+# Columnas de la exportación: planas, sin objetos ORM ni esquemas anidados
+EXPORT_COLUMNS = [
+    MovimientoModel.id,
+    MovimientoModel.fecha,
+    TipoMovimientoModel.codigo.label("tipo_movimiento"),
+    ProductoModel.codigo.label("producto_codigo"),
+    ProductoModel.nombre.label("producto_nombre"),
+    MovimientoModel.cantidad,
+    ORIGEN.nombre.label("ubicacion_origen"),
+    DESTINO.nombre.label("ubicacion_destino"),
+    UserModel.username.label("usuario"),
+    MovimientoModel.referencia,
+    MovimientoModel.observaciones,
+]
+@router.get("/export")
+async def export_movimientos(
+    formato: Literal["csv", "ndjson"] = Query("csv", alias="format"),
+    producto_id: Optional[int] = None,
+    tipo_movimiento_id: Optional[int] = None,
+    fecha_desde: Optional[datetime] = None,
+    fecha_hasta: Optional[datetime] = None,
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
+):
+    query = filtrar_movimientos(
+        con_detalle(select(*EXPORT_COLUMNS)),
+        producto_id, tipo_movimiento_id, fecha_desde, fecha_hasta
+    ).order_by(MovimientoModel.fecha, MovimientoModel.id)
     
+    if formato == "csv":
+        media_type = "text/csv; charset=utf-8"
+    else:
+        media_type = "application/x-ndjson"
+    return StreamingResponse(
+        exportar_filas(db.bind, query, formato),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="movimientos.{formato}"'}
+    )
+
+@router.get("/series", response_model=List[MovimientoSerieResponse])
+async def read_series(
+    producto_id: Optional[int] = None,
+    ubicacion_id: Optional[int] = None,
+    tipo_movimiento_id: Optional[int] = None,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Entradas y salidas por día, leídas solo de movimientos_diarios.
+
+    Solo aparecen los días con movimientos. Sin ``ubicacion_id`` una
+    transferencia cuenta a la vez como salida del origen y entrada al destino,
+    pero ``movimientos`` la cuenta una sola vez, en su destino: con
+    ``ubicacion_id`` del origen aparecen sus salidas y no el movimiento.
+    """
+    query = select(
+        MovimientoDiarioModel.fecha,
+        func.sum(MovimientoDiarioModel.entradas).label("entradas"),
+        func.sum(MovimientoDiarioModel.salidas).label("salidas"),
+        func.sum(MovimientoDiarioModel.movimientos).label("movimientos"),
+    )
+    if producto_id:
+        query = query.where(MovimientoDiarioModel.producto_id == producto_id)
+    if ubicacion_id:
+        query = query.where(MovimientoDiarioModel.ubicacion_id == ubicacion_id)
+    if tipo_movimiento_id:
+        query = query.where(MovimientoDiarioModel.tipo_movimiento_id == tipo_movimiento_id)
+    if fecha_desde:
+        query = query.where(MovimientoDiarioModel.fecha >= fecha_desde)
     if fecha_hasta:
-        query = query.filter(MovimientoModel.fecha <= fecha_hasta)
-    
-    # Ordenar por fecha descendente
-    query = query.order_by(MovimientoModel.fecha.desc())
+        query = query.where(MovimientoDiarioModel.fecha <= fecha_hasta)
+    query = query.group_by(MovimientoDiarioModel.fecha).order_by(MovimientoDiarioModel.fecha)
     
-    movimientos = query.offset(skip).limit(limit).all()
-    return movimientos
+    return (await db.execute(query)).mappings().all()
 
 @router.get("/{movimiento_id}", response_model=MovimientoInventarioDetalleResponse)
 async def read_movimiento(
     movimiento_id: int, 
-    current_user: UserModel = Depends(get_current_active_user), 
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_movimiento = db.query(MovimientoModel).filter(MovimientoModel.id == movimiento_id).first()
+    db_movimiento = await db.get(MovimientoModel, movimiento_id, options=DETALLE_OPTIONS)
     if db_movimiento is None:
         raise HTTPException(status_code=404, detail="Movimiento no encontrado")
     return db_movimiento
\ No newline at end of file
@@ -1,78 +1,326 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, File, Header, HTTPException, Query, Response, UploadFile, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BeforeValidator, ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from typing import Annotated, Dict, List, Literal, Optional, Set, Tuple, Union
+from datetime import date, datetime
+from sqlalchemy import select
+import csv
+import io
 
-from config.database import get_db
+from config.database import get_async_db
+from models.categoria import Categoria as CategoriaModel
+from models.movimiento_inventario import MovimientoInventario as MovimientoModel
 from models.producto import Producto as ProductoModel
+from models.proveedor import Proveedor as ProveedorModel
 from models.stock import Stock as StockModel
-from schemas.producto import ProductoCreate, ProductoResponse, ProductoUpdate, ProductoDetalleResponse
-from utils.auth import get_current_active_user
-from models.user import User as UserModel
+from schemas.producto import ProductoCreate, ProductoResponse, ProductoStockResponse, ProductoUpdate, ProductoDetalleResponse, ProductoImportResponse
+from utils.auth import Principal, get_current_active_user
+from utils.etag import comprobar_etag, enviar_etag, etag_versiones, registrar_cambio, versiones
+from utils.integridad import comprobar_dependencias, dependencia
+from utils.productos import consulta_busqueda, desindexar_productos, ids_existentes, indexar_productos, resolver_nombres, upsert_productos
+from utils.serializacion import Proyeccion, exportar_filas, respuesta_json
+from utils.stock import borrar_snapshots, consulta_kardex, version_stock
 
 router = APIRouter(prefix="/productos", tags=["productos"])
 
+# Filas que impiden borrar el producto (utils.integridad)
+DEPENDENCIAS = [
+    dependencia("stocks", "No se puede eliminar el producto porque tiene stock asociado", StockModel.producto_id),
+    dependencia("movimientos", "No se puede eliminar el producto porque tiene movimientos de inventario asociados",
+                MovimientoModel.producto_id),
+]
+
+# Columnas de las que depende el informe de valoración: al cambiar alguna se
+# registra también un cambio de "precios"
+CAMPOS_VALORACION = {"precio_compra", "categoria_id"}
+
 @router.post("/", response_model=ProductoResponse)
 async def create_producto(
     producto: ProductoCreate, 
-    current_user: UserModel = Depends(get_current_active_user), 
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Verificar que no exista otro producto con el mismo código
-    db_producto = db.query(ProductoModel).filter(ProductoModel.codigo == producto.codigo).first()
+    db_producto = await db.scalar(select(ProductoModel).where(ProductoModel.codigo == producto.codigo))
     if db_producto:
         raise HTTPException(status_code=400, detail="Ya existe un producto con ese código")
     
     db_producto = ProductoModel(**producto.model_dump())
     db.add(db_producto)
-    db.commit()
-    db.refresh(db_producto)
+    await db.flush()
+    await indexar_productos(db, [db_producto.id])
+    await registrar_cambio(db, "productos")
+    await db.commit()
+    await db.refresh(db_producto)
     return db_producto
 
-@router.get("/", response_model=List[ProductoResponse])
+# Filas del CSV que se validan y se envían a la base de cada vez
+IMPORT_CHUNK_ROWS = 1000
+NO_ENCONTRADO = {"categoria": "Categoría no encontrada", "proveedor": "Proveedor no encontrado"}
+
+class ReferenciasImportacion:
+    """Categorías y proveedores ya resueltos durante una importación.
+
+    Un catálogo repite muchas veces las mismas categorías y proveedores, así
+    que cada nombre o id se consulta una sola vez (en bloque) y se reutiliza en
+    los bloques siguientes.
+    """
+    def __init__(self):
+        self.nombres: Dict[Tuple[str, str], List[int]] = {}
+        self.ids: Dict[str, Set[int]] = {"categoria": set(), "proveedor": set()}
+        self.consultados: Dict[str, Set[int]] = {"categoria": set(), "proveedor": set()}
+    
+    async def cargar(self, db: AsyncSession, bloque: List[Tuple[int, dict]]):
+        for campo, modelo in (("categoria", CategoriaModel), ("proveedor", ProveedorModel)):
+            nombres, ids = set(), set()
+            for _, fila in bloque:
+                valor = fila.get(f"{campo}_id")
+                if valor and valor.isdigit():
+                    ids.add(int(valor))
+                elif fila.get(campo):
+                    nombres.add(fila[campo])
+            nombres -= {n for c, n in self.nombres if c == campo}
+            ids -= self.consultados[campo]
+            
+            for nombre, encontrados in (await resolver_nombres(db, modelo, nombres)).items():
+                self.nombres[(campo, nombre)] = encontrados
+                self.ids[campo].update(encontrados)
+            for nombre in nombres:
+                self.nombres.setdefault((campo, nombre), [])
+            self.ids[campo] |= await ids_existentes(db, modelo, ids)
+            self.consultados[campo] |= ids
+    
+    def resolver(self, campo: str, datos: dict, fila: dict):
+        """Pone en ``datos`` el id de ``campo`` si la fila lo trae por nombre; devuelve el error si lo hay."""
+        if f"{campo}_id" not in datos and fila.get(campo):
+            encontrados = self.nombres[(campo, fila[campo])]
+            if not encontrados:
+                return f"{NO_ENCONTRADO[campo]}: {fila[campo]}"
+            if len(encontrados) > 1:
+                return f"Hay varios registros de {campo} con el nombre {fila[campo]}; indique {campo}_id"
+            datos[f"{campo}_id"] = encontrados[0]
+
+async def importar_bloque(
+    db: AsyncSession,
+    bloque: List[Tuple[int, dict]],
+    actualizar: List[str],
+    referencias: ReferenciasImportacion,
+    codigos: Set[str],
+    errores: List[dict],
+) -> int:
+    await referencias.cargar(db, bloque)
+    
+    # Filas por columnas a actualizar: en un código existente, una celda vacía
+    # conserva el valor guardado en lugar del valor por defecto del esquema
+    grupos: Dict[Tuple[str, ...], List[dict]] = {}
+    for numero, fila in bloque:
+        datos = {c: v for c, v in fila.items() if c in ProductoCreate.model_fields and v}
+        error = referencias.resolver("categoria", datos, fila) or referencias.resolver("proveedor", datos, fila)
+        if not error:
+            try:
+                producto = ProductoCreate(**datos)
+            except ValidationError as e:
+                error = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+        if not error:
+            if producto.categoria_id not in referencias.ids["categoria"]:
+                error = NO_ENCONTRADO["categoria"]
+            elif producto.proveedor_id is not None and producto.proveedor_id not in referencias.ids["proveedor"]:
+                error = NO_ENCONTRADO["proveedor"]
+            elif producto.codigo in codigos:
+                error = "Código repetido en el archivo"
+        if error:
+            errores.append({"fila": numero, "detail": error})
+            continue
+        codigos.add(producto.codigo)
+        columnas = tuple(c for c in actualizar if fila.get(c) or fila.get(c.removesuffix("_id")))
+        grupos.setdefault(columnas, []).append(producto.model_dump())
+    
+    filas = [f for grupo in grupos.values() for f in grupo]
+    if not filas:
+        return 0
+    
+    # Hay cambio de precios solo si un producto existente cambia alguna columna
+    # de la valoración (uno nuevo aún no tiene existencias)
+    cambia_precios = False
+    if CAMPOS_VALORACION & {c for columnas in grupos for c in columnas}:
+        guardados = {
+            fila.codigo: fila._mapping for fila in await db.execute(
+                select(ProductoModel.codigo, *(getattr(ProductoModel, c) for c in CAMPOS_VALORACION))
+                .where(ProductoModel.codigo.in_([f["codigo"] for f in filas]))
+            )
+        }
+        cambia_precios = any(
+            f["codigo"] in guardados and f[c] != guardados[f["codigo"]][c]
+            for columnas, grupo in grupos.items() for f in grupo for c in CAMPOS_VALORACION & set(columnas)
+        )
+    
+    for columnas, grupo in grupos.items():
+        await upsert_productos(db, grupo, columnas)
+    await indexar_productos(db, await db.scalars(
+        select(ProductoModel.id).where(ProductoModel.codigo.in_([f["codigo"] for f in filas]))
+    ))
+    await registrar_cambio(db, "productos", *(["precios"] if cambia_precios else []))
+    await db.commit()
+    return len(filas)
+
+@router.post("/import", response_model=ProductoImportResponse)
+async def import_productos(
+    archivo: UploadFile = File(...),
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Alta o actualización del catálogo desde un CSV, identificando cada producto por su código.
+
+    ``categoria``/``proveedor`` pueden venir como id (``categoria_id``) o por
+    nombre. Una celda vacía no cambia el valor de un producto existente. Las
+    filas válidas se importan por bloques y las demás se devuelven en
+    ``errores`` con su número de línea.
+    """
+    # Se lee fila a fila del fichero temporal de la subida, sin cargarlo entero
+    reader = csv.DictReader(io.TextIOWrapper(archivo.file, encoding="utf-8-sig", newline=""))
+    try:
+        columnas = set(reader.fieldnames or [])
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="El archivo debe ser un CSV en UTF-8")
+    faltan = [c for c in ("codigo", "nombre") if c not in columnas]
+    if not columnas & {"categoria_id", "categoria"}:
+        faltan.append("categoria_id")
+    if faltan:
+        raise HTTPException(status_code=400, detail=f"Faltan columnas en el CSV: {', '.join(faltan)}")
+    
+    # En un código existente solo se actualizan las columnas que trae el CSV
+    # (y, en cada fila, las que no vienen vacías)
+    actualizar = [
+        c for c in ProductoCreate.model_fields
+        if c != "codigo" and (c in columnas or c.removesuffix("_id") in columnas)
+    ]
+    
+    referencias = ReferenciasImportacion()
+    codigos, errores = set(), []
+    filas = importados = 0
+    bloque = []
+    try:
+        for fila in reader:
+            filas += 1
+            bloque.append((reader.line_num, {c: v.strip() for c, v in fila.items() if c and isinstance(v, str)}))
+            if len(bloque) == IMPORT_CHUNK_ROWS:
+                importados += await importar_bloque(db, bloque, actualizar, referencias, codigos, errores)
+                bloque = []
+    except (UnicodeDecodeError, csv.Error) as e:
+        # Se importa lo leído hasta el error y se informa de la línea donde se paró
+        errores.append({"fila": reader.line_num, "detail": f"CSV no válido: {e}"})
+    if bloque:
+        importados += await importar_bloque(db, bloque, actualizar, referencias, codigos, errores)
+    
+    return {"filas": filas, "importados": importados, "errores": errores}
+
+# El listado construye el JSON directamente desde las columnas de la consulta
+PROYECCION = Proyeccion(ProductoResponse, ProductoModel)
+PROYECCION_STOCK = Proyeccion(ProductoStockResponse, ProductoModel)
+
+@router.get("/", response_model=List[ProductoStockResponse])
 async def read_productos(
+    response: Response,
     skip: int = 0, 
     limit: int = 100, 
-    current_user: UserModel = Depends(get_current_active_user), 
-    db: Session = Depends(get_db)
+    if_none_match: Optional[str] = Header(None),
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
 ):
-    productos = db.query(ProductoModel).offset(skip).limit(limit).all()
-    return productos
+    """Catálogo de productos con su stock_total.
+
+    La ETag lleva la versión de productos y la de las existencias
+    (utils.stock.version_stock), que cambia con cada movimiento sin pasar
+    por una fila común a todas las ventas.
+    """
+    await comprobar_etag(db, response, if_none_match, ["productos"], f"stocks.{await version_stock(db)}")
+    result = await db.execute(select(*PROYECCION_STOCK.columnas).offset(skip).limit(limit))
+    return respuesta_json(PROYECCION_STOCK.lista(result), response)
+
+# Declarada antes de /{producto_id} para que "search" no se interprete como un id
+@router.get("/search", response_model=List[ProductoResponse])
+async def search_productos(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Busca por palabras del código o el nombre; cada palabra de ``q`` puede ser un prefijo."""
+    query = consulta_busqueda(q, PROYECCION.columnas, limit)
+    if query is None:
+        return []
+    return ORJSONResponse(PROYECCION.lista(await db.execute(query)))
 
 @router.get("/{producto_id}", response_model=ProductoDetalleResponse)
 async def read_producto(
     producto_id: int, 
-    current_user: UserModel = Depends(get_current_active_user), 
-    db: Session = Depends(get_db)
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
 ):
-    # Obtener el producto con su stock total
-    db_producto = db.query(ProductoModel).filter(ProductoModel.id == producto_id).first()
+    # Las versiones se leen antes que la fila: si algo cambia entretanto, el
+    # cuerpo es más reciente que su ETag y la siguiente petición no da 304
+    version = await versiones(db, "productos", "categorias", "proveedores")
+    db_producto = await db.get(
+        ProductoModel, producto_id,
+        options=[joinedload(ProductoModel.categoria), joinedload(ProductoModel.proveedor)]
+    )
     if db_producto is None:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
+    # stock_total no tiene versión propia: entra en la ETag desde la misma fila
+    enviar_etag(response, if_none_match, etag_versiones(version, f"stock.{db_producto.stock_total!r}"))
+    return db_producto
+
+def _dia_entero(valor):
+    # "AAAA-MM-DD" sin hora es el día entero, como en /movimientos/series
+    if isinstance(valor, str) and len(valor) == 10:
+        return date.fromisoformat(valor)
+    return valor
+
+FechaHasta = Annotated[Union[datetime, date], BeforeValidator(_dia_entero)]
+
+@router.get("/{producto_id}/kardex")
+async def read_kardex(
+    producto_id: int,
+    formato: Literal["csv", "ndjson"] = Query("csv", alias="format"),
+    ubicacion_id: Optional[int] = None,
+    fecha_desde: Optional[datetime] = None,
+    fecha_hasta: Optional[FechaHasta] = None,
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Movimientos del producto por ubicación con el saldo tras cada uno, enviados por bloques."""
+    if await db.get(ProductoModel, producto_id) is None:
+        raise HTTPException(status_code=404, detail="Producto no encontrado")
     
-    # Calcular stock total sumando todas las ubicaciones
-    stock_total = db.query(func.sum(StockModel.cantidad)).filter(StockModel.producto_id == producto_id).scalar() or 0
-    
-    # Crear respuesta con el stock total
-    response = ProductoDetalleResponse.model_validate(db_producto)
-    response.stock_total = stock_total
-    
-    return response
+    query = consulta_kardex(producto_id, ubicacion_id, fecha_desde, fecha_hasta)
+    if formato == "csv":
+        media_type = "text/csv; charset=utf-8"
+    else:
+        media_type = "application/x-ndjson"
+    return StreamingResponse(
+        exportar_filas(db.bind, query, formato),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="kardex-{producto_id}.{formato}"'}
+    )
 
 @router.put("/{producto_id}", response_model=ProductoResponse)
 async def update_producto(
     producto_id: int, 
     producto: ProductoUpdate, 
-    current_user: UserModel = Depends(get_current_active_user), 
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_producto = db.query(ProductoModel).filter(ProductoModel.id == producto_id).first()
+    db_producto = await db.get(ProductoModel, producto_id)
     if db_producto is None:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
     
     # Verificar que no exista otro producto con el mismo código
     if producto.codigo and producto.codigo != db_producto.codigo:
-        codigo_exists = db.query(ProductoModel).filter(ProductoModel.codigo == producto.codigo).first()
+        codigo_exists = await db.scalar(select(ProductoModel).where(ProductoModel.codigo == producto.codigo))
         if codigo_exists:
             raise HTTPException(status_code=400, detail="Ya existe un producto con ese código")
     
@@ -81,33 +329,31 @@ async def update_producto(
     for key, value in producto_data.items():
         setattr(db_producto, key, value)
     
-    db.commit()
-    db.refresh(db_producto)
+    if {"codigo", "nombre"} & producto_data.keys():
+        await db.flush()
+        await indexar_productos(db, [producto_id])
+    await registrar_cambio(db, "productos", *(["precios"] if CAMPOS_VALORACION & producto_data.keys() else []))
+    await db.commit()
+    await db.refresh(db_producto)
     return db_producto
 
 @router.delete("/{producto_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_producto(
     producto_id: int, 
-    current_user: UserModel = Depends(get_current_active_user), 
-    db: Session = Depends(get_db)
+    contar: bool = False,
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_producto = db.query(ProductoModel).filter(ProductoModel.id == producto_id).first()
+    db_producto = await db.get(ProductoModel, producto_id)
     if db_producto is None:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
     
     # Verificar si hay stocks o movimientos asociados antes de eliminar
-    if db_producto.stocks:
-        raise HTTPException(
-            status_code=400, 
-            detail="No se puede eliminar el producto porque tiene stock asociado"
-        )
-    
-    if db_producto.movimientos:
-        raise HTTPException(
-            status_code=400, 
-            detail="No se puede eliminar el producto porque tiene movimientos de inventario asociados"
-        )
+    await comprobar_dependencias(db, DEPENDENCIAS, producto_id, contar)
     
-    db.delete(db_producto)
-    db.commit()
+    await desindexar_productos(db, [producto_id])
+    await borrar_snapshots(db, producto_id=producto_id)
+    await db.delete(db_producto)
+    await registrar_cambio(db, "productos")
+    await db.commit()
     return None 
\ No newline at end of file
@@ -1,32 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends
 
-from config.database import get_db
-from models.user import User as UserModel
-from utils.utils import decode_access_token, is_token_blacklisted
-from fastapi.security import OAuth2PasswordBearer
-
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
+from utils.auth import Principal, get_current_user
 
 router = APIRouter()
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    payload = decode_access_token(token)
-    if payload is None or is_token_blacklisted(token, db):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    user = db.query(UserModel).filter(UserModel.username == payload["sub"]).first()
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    return user
-
 @router.get("/profile")
-async def read_profile(current_user: UserModel = Depends(get_current_user)):
+async def read_profile(current_user: Principal = Depends(get_current_user)):
     return {"username": current_user.username, "role": current_user.role}
@@ -1,44 +1,53 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
-from config.database import get_db
+from config.database import get_async_db
+from models.producto import Producto as ProductoModel
 from models.proveedor import Proveedor as ProveedorModel
 from schemas.proveedor import ProveedorCreate, ProveedorResponse, ProveedorUpdate
-from utils.auth import get_current_active_user
-from models.user import User as UserModel
+from utils.auth import Principal, get_current_active_user
+from utils.etag import registrar_cambio
+from utils.integridad import comprobar_dependencias, dependencia
 
 router = APIRouter(prefix="/proveedores", tags=["proveedores"])
 
+# Filas que impiden borrar el proveedor (utils.integridad)
+DEPENDENCIAS = [
+    dependencia("productos", "No se puede eliminar el proveedor porque tiene productos asociados", ProductoModel.proveedor_id),
+]
+
 @router.post("/", response_model=ProveedorResponse)
 async def create_proveedor(
     proveedor: ProveedorCreate, 
-    current_user: UserModel = Depends(get_current_active_user), 
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
 ):
     db_proveedor = ProveedorModel(**proveedor.model_dump())
     db.add(db_proveedor)
-    db.commit()
-    db.refresh(db_proveedor)
+    await registrar_cambio(db, "proveedores")
+    await db.commit()
+    await db.refresh(db_proveedor)
     return db_proveedor
 
 @router.get("/", response_model=List[ProveedorResponse])
 async def read_proveedores(
     skip: int = 0, 
     limit: int = 100, 
-    current_user: UserModel = Depends(get_current_active_user), 
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
 ):
-    proveedores = db.query(ProveedorModel).offset(skip).limit(limit).all()
-    return proveedores
+    result = await db.scalars(select(ProveedorModel).offset(skip).limit(limit))
+    return result.all()
 
 @router.get("/{proveedor_id}", response_model=ProveedorResponse)
 async def read_proveedor(
     proveedor_id: int, 
-    current_user: UserModel = Depends(get_current_active_user), 
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_proveedor = db.query(ProveedorModel).filter(ProveedorModel.id == proveedor_id).first()
+    db_proveedor = await db.get(ProveedorModel, proveedor_id)
     if db_proveedor is None:
         raise HTTPException(status_code=404, detail="Proveedor no encontrado")
     return db_proveedor
@@ -47,10 +56,10 @@ async def read_proveedor(
 async def update_proveedor(
     proveedor_id: int, 
     proveedor: ProveedorUpdate, 
-    current_user: UserModel = Depends(get_current_active_user), 
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_proveedor = db.query(ProveedorModel).filter(ProveedorModel.id == proveedor_id).first()
+    db_proveedor = await db.get(ProveedorModel, proveedor_id)
     if db_proveedor is None:
         raise HTTPException(status_code=404, detail="Proveedor no encontrado")
     
@@ -59,27 +68,26 @@ async def update_proveedor(
     for key, value in proveedor_data.items():
         setattr(db_proveedor, key, value)
     
-    db.commit()
-    db.refresh(db_proveedor)
+    await registrar_cambio(db, "proveedores")
+    await db.commit()
+    await db.refresh(db_proveedor)
     return db_proveedor
 
 @router.delete("/{proveedor_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_proveedor(
     proveedor_id: int, 
-    current_user: UserModel = Depends(get_current_active_user), 
-    db: Session = Depends(get_db)
+    contar: bool = False,
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_proveedor = db.query(ProveedorModel).filter(ProveedorModel.id == proveedor_id).first()
+    db_proveedor = await db.get(ProveedorModel, proveedor_id)
     if db_proveedor is None:
         raise HTTPException(status_code=404, detail="Proveedor no encontrado")
     
     # Verificar si hay productos asociados antes de eliminar
-    if db_proveedor.productos:
-        raise HTTPException(
-            status_code=400, 
-            detail="No se puede eliminar el proveedor porque tiene productos asociados"
-        )
+    await comprobar_dependencias(db, DEPENDENCIAS, proveedor_id, contar)
     
-    db.delete(db_proveedor)
-    db.commit()
+    await db.delete(db_proveedor)
+    await registrar_cambio(db, "proveedores")
+    await db.commit()
     return None 
\ No newline at end of file
@@ -0,0 +1,112 @@
+import hashlib
+
+import orjson
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+
+from config.database import get_async_db
+from models.categoria import Categoria as CategoriaModel
+from models.producto import Producto as ProductoModel
+from models.stock import Stock as StockModel
+from models.ubicacion import Ubicacion as UbicacionModel
+from schemas.producto import ProductoStockResponse
+from schemas.reporte import ProductoBajoMinimoResponse, ValoracionResponse
+from utils.auth import Principal, get_current_active_user
+from utils.cache import TTLCache
+from utils.etag import etag_coincide, versiones
+from utils.serializacion import Proyeccion, respuesta_json
+from utils.stock import version_stock
+
+router = APIRouter(prefix="/reportes", tags=["reportes"])
+
+PRODUCTO_PROYECCION = Proyeccion(ProductoStockResponse, ProductoModel)
+
+# Informe de valoración por versión de sus datos: la clave incluye las
+# versiones de existencias, precios, categorías y ubicaciones, así que una
+# entrada nunca queda desfasada; el TTL solo libera las que ya no se van a pedir
+VALORACION_CACHE_TTL_SECONDS = 3600
+VALORACION_CACHE_SIZE = 256
+valoracion_cache = TTLCache(maxsize=VALORACION_CACHE_SIZE, ttl=VALORACION_CACHE_TTL_SECONDS)
+
+@router.get("/bajo-minimo", response_model=List[ProductoBajoMinimoResponse])
+async def read_bajo_minimo(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    categoria_id: Optional[int] = None,
+    proveedor_id: Optional[int] = None,
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # stock_total ya es la suma de los stocks del producto en todas las
+    # ubicaciones (utils.stock.ajustar_stock_total), así que el informe es un
+    # rango sobre ix_productos_stock_minimo en lugar de agrupar stocks
+    faltante = (ProductoModel.stock_minimo - ProductoModel.stock_total).label("faltante")
+    query = select(*PRODUCTO_PROYECCION.columnas, faltante).where(
+        ProductoModel.stock_minimo > 0,
+        ProductoModel.stock_total < ProductoModel.stock_minimo,
+    )
+    if categoria_id is not None:
+        query = query.where(ProductoModel.categoria_id == categoria_id)
+    if proveedor_id is not None:
+        query = query.where(ProductoModel.proveedor_id == proveedor_id)
+    query = query.order_by(faltante.desc(), ProductoModel.id).offset(skip).limit(limit)
+
+    productos = []
+    for fila in await db.execute(query):
+        producto, fin = PRODUCTO_PROYECCION.construir(fila)
+        producto["faltante"] = fila[fin]
+        productos.append(producto)
+    return respuesta_json(productos, response)
+
+@router.get("/valoracion", response_model=List[ValoracionResponse])
+async def read_valoracion(
+    response: Response,
+    categoria_id: Optional[int] = None,
+    ubicacion_id: Optional[int] = None,
+    if_none_match: Optional[str] = Header(None),
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Valor del inventario (cantidad por precio de compra) por categoría y ubicación.
+
+    La ETag es un resumen del informe guardado, así que coincide mientras se
+    sirva la misma entrada de la caché. Las versiones se leen antes que los
+    datos: si algo cambia entretanto, la entrada guardada es más reciente que
+    su clave y la siguiente petición la recalcula.
+    """
+    version = await versiones(db, "precios", "categorias", "ubicaciones")
+    clave = (categoria_id, ubicacion_id, tuple(version.values()), await version_stock(db))
+    entrada = valoracion_cache.get(clave)
+    if entrada is None:
+        query = (
+            select(
+                CategoriaModel.id, CategoriaModel.nombre, UbicacionModel.id, UbicacionModel.nombre,
+                func.sum(StockModel.cantidad),
+                func.sum(StockModel.cantidad * func.coalesce(ProductoModel.precio_compra, 0)),
+            )
+            .select_from(StockModel)
+            .join(ProductoModel, ProductoModel.id == StockModel.producto_id)
+            .join(CategoriaModel, CategoriaModel.id == ProductoModel.categoria_id)
+            .join(UbicacionModel, UbicacionModel.id == StockModel.ubicacion_id)
+            .group_by(CategoriaModel.id, CategoriaModel.nombre, UbicacionModel.id, UbicacionModel.nombre)
+            .order_by(CategoriaModel.nombre, CategoriaModel.id, UbicacionModel.nombre, UbicacionModel.id)
+        )
+        if categoria_id is not None:
+            query = query.where(ProductoModel.categoria_id == categoria_id)
+        if ubicacion_id is not None:
+            query = query.where(StockModel.ubicacion_id == ubicacion_id)
+        valoracion = [
+            {"categoria_id": fila[0], "categoria": fila[1], "ubicacion_id": fila[2], "ubicacion": fila[3],
+             "cantidad": fila[4] or 0, "valor": fila[5] or 0}
+            for fila in await db.execute(query)
+        ]
+        entrada = (valoracion, '"' + hashlib.sha256(orjson.dumps(valoracion)).hexdigest()[:32] + '"')
+        valoracion_cache.set(clave, entrada)
+    valoracion, etag = entrada
+    if etag_coincide(if_none_match, etag):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return respuesta_json(valoracion, response)
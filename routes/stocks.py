@@ -1,39 +1,57 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from typing import List, Optional
+from datetime import datetime
+from sqlalchemy import select
 
-from config.database import get_db
+from config.database import get_async_db
 from models.stock import Stock as StockModel
 from models.producto import Producto as ProductoModel
 from models.ubicacion import Ubicacion as UbicacionModel
-from schemas.stock import StockCreate, StockResponse, StockUpdate, StockDetalleResponse
-from utils.auth import get_current_active_user
-from models.user import User as UserModel
+from schemas.producto import ProductoResponse
+from schemas.stock import StockCreate, StockResponse, StockUpdate, StockDetalleResponse, StockEnFechaResponse
+from schemas.ubicacion import UbicacionResponse
+from utils.auth import Principal, get_current_active_user
+from utils.serializacion import Proyeccion, respuesta_json
+from utils.stock import ajustar_stock_total, registrar_cambio_stock, stock_en_fecha
 
 router = APIRouter(prefix="/stocks", tags=["stocks"])
 
+# Relaciones que serializa StockDetalleResponse, cargadas con JOIN en la misma consulta
+DETALLE_OPTIONS = [
+    joinedload(StockModel.producto),
+    joinedload(StockModel.ubicacion),
+]
+
+# El listado construye el JSON directamente desde las columnas de la consulta
+DETALLE_PROYECCION = Proyeccion(
+    StockDetalleResponse, StockModel,
+    producto=Proyeccion(ProductoResponse, ProductoModel),
+    ubicacion=Proyeccion(UbicacionResponse, UbicacionModel),
+)
+
 @router.post("/", response_model=StockResponse)
 async def create_stock(
     stock: StockCreate, 
-    current_user: UserModel = Depends(get_current_active_user), 
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Verificar que exista el producto
-    producto = db.query(ProductoModel).filter(ProductoModel.id == stock.producto_id).first()
+    producto = await db.get(ProductoModel, stock.producto_id)
     if not producto:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
     
     # Verificar que exista la ubicación
-    ubicacion = db.query(UbicacionModel).filter(UbicacionModel.id == stock.ubicacion_id).first()
+    ubicacion = await db.get(UbicacionModel, stock.ubicacion_id)
     if not ubicacion:
         raise HTTPException(status_code=404, detail="Ubicación no encontrada")
     
     # Verificar si ya existe un registro de stock para este producto y ubicación
-    existing_stock = db.query(StockModel).filter(
+    existing_stock = await db.scalar(select(StockModel).where(
         StockModel.producto_id == stock.producto_id,
         StockModel.ubicacion_id == stock.ubicacion_id
-    ).first()
+    ))
     
     if existing_stock:
         raise HTTPException(
@@ -43,39 +61,70 @@ async def create_stock(
     
     db_stock = StockModel(**stock.model_dump())
     db.add(db_stock)
-    db.commit()
-    db.refresh(db_stock)
+    await ajustar_stock_total(db, {stock.producto_id: stock.cantidad})
+    await registrar_cambio_stock(db, [stock.producto_id])
+    await db.commit()
+    await db.refresh(db_stock)
     return db_stock
 
 @router.get("/", response_model=List[StockDetalleResponse])
 async def read_stocks(
+    response: Response,
     skip: int = 0, 
     limit: int = 100, 
     producto_id: int = None,
     ubicacion_id: int = None,
-    current_user: UserModel = Depends(get_current_active_user), 
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
 ):
-    query = db.query(StockModel)
+    query = (
+        select(*DETALLE_PROYECCION.columnas)
+        .join(ProductoModel, ProductoModel.id == StockModel.producto_id)
+        .join(UbicacionModel, UbicacionModel.id == StockModel.ubicacion_id)
+    )
     
     # Filtrar por producto si se proporciona
     if producto_id:
-        query = query.filter(StockModel.producto_id == producto_id)
+        query = query.where(StockModel.producto_id == producto_id)
     
     # Filtrar por ubicación si se proporciona
     if ubicacion_id:
-        query = query.filter(StockModel.ubicacion_id == ubicacion_id)
+        query = query.where(StockModel.ubicacion_id == ubicacion_id)
     
-    stocks = query.offset(skip).limit(limit).all()
-    return stocks
+    stocks = DETALLE_PROYECCION.lista(await db.execute(query.offset(skip).limit(limit)))
+    return respuesta_json(stocks, response)
+
+# Declarada antes de /{stock_id} para que "at" no se interprete como un id
+@router.get("/at", response_model=List[StockEnFechaResponse])
+async def read_stocks_at(
+    response: Response,
+    fecha: datetime,
+    producto_id: Optional[int] = None,
+    ubicacion_id: Optional[int] = None,
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Existencias en ``fecha``: la última copia anterior más los movimientos posteriores.
+
+    Los ajustes directos de /stocks no son movimientos, así que solo cuentan
+    desde la primera copia tomada después de hacerlos.
+    """
+    snapshot, existencias = await stock_en_fecha(db, fecha, producto_id, ubicacion_id)
+    # Copia de la que se partió; sin cabecera, se reconstruyó todo el historial
+    if snapshot is not None:
+        response.headers["X-Stock-Snapshot"] = snapshot.isoformat()
+    return [
+        StockEnFechaResponse(producto_id=p, ubicacion_id=u, cantidad=cantidad)
+        for (p, u), cantidad in sorted(existencias.items())
+    ]
 
 @router.get("/{stock_id}", response_model=StockDetalleResponse)
 async def read_stock(
     stock_id: int, 
-    current_user: UserModel = Depends(get_current_active_user), 
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_stock = db.query(StockModel).filter(StockModel.id == stock_id).first()
+    db_stock = await db.get(StockModel, stock_id, options=DETALLE_OPTIONS)
     if db_stock is None:
         raise HTTPException(status_code=404, detail="Stock no encontrado")
     return db_stock
@@ -84,12 +133,14 @@ async def read_stock(
 async def update_stock(
     stock_id: int, 
     stock: StockUpdate, 
-    current_user: UserModel = Depends(get_current_active_user), 
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_stock = db.query(StockModel).filter(StockModel.id == stock_id).first()
+    # Bloquear la fila: la variación del total se calcula con la cantidad actual
+    db_stock = await db.get(StockModel, stock_id, with_for_update=True)
     if db_stock is None:
         raise HTTPException(status_code=404, detail="Stock no encontrado")
+    anterior = (db_stock.producto_id, db_stock.cantidad or 0)
     
     # Si se está cambiando producto_id o ubicacion_id, verificar que no exista otro registro con la misma combinación
     if (stock.producto_id and stock.producto_id != db_stock.producto_id) or \
@@ -98,11 +149,11 @@ async def update_stock(
         new_producto_id = stock.producto_id if stock.producto_id else db_stock.producto_id
         new_ubicacion_id = stock.ubicacion_id if stock.ubicacion_id else db_stock.ubicacion_id
         
-        existing_stock = db.query(StockModel).filter(
+        existing_stock = await db.scalar(select(StockModel).where(
             StockModel.producto_id == new_producto_id,
             StockModel.ubicacion_id == new_ubicacion_id,
             StockModel.id != stock_id
-        ).first()
+        ))
         
         if existing_stock:
             raise HTTPException(
@@ -115,20 +166,26 @@ async def update_stock(
     for key, value in stock_data.items():
         setattr(db_stock, key, value)
     
-    db.commit()
-    db.refresh(db_stock)
+    variaciones = {anterior[0]: -anterior[1]}
+    variaciones[db_stock.producto_id] = variaciones.get(db_stock.producto_id, 0) + (db_stock.cantidad or 0)
+    await ajustar_stock_total(db, variaciones)
+    await registrar_cambio_stock(db, variaciones)
+    await db.commit()
+    await db.refresh(db_stock)
     return db_stock
 
 @router.delete("/{stock_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_stock(
     stock_id: int, 
-    current_user: UserModel = Depends(get_current_active_user), 
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_stock = db.query(StockModel).filter(StockModel.id == stock_id).first()
+    db_stock = await db.get(StockModel, stock_id, with_for_update=True)
     if db_stock is None:
         raise HTTPException(status_code=404, detail="Stock no encontrado")
     
-    db.delete(db_stock)
-    db.commit()
+    await ajustar_stock_total(db, {db_stock.producto_id: -(db_stock.cantidad or 0)})
+    await db.delete(db_stock)
+    await registrar_cambio_stock(db, [db_stock.producto_id])
+    await db.commit()
     return None 
\ No newline at end of file
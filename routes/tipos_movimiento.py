@@ -1,53 +1,65 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List
 
-from config.database import get_db
+from config.database import get_async_db
+from models.movimiento_inventario import MovimientoInventario as MovimientoModel
 from models.tipo_movimiento import TipoMovimiento as TipoMovimientoModel
 from schemas.tipo_movimiento import TipoMovimientoCreate, TipoMovimientoResponse, TipoMovimientoUpdate
-from utils.auth import get_current_active_user
-from models.user import User as UserModel
+from utils.auth import Principal, get_current_active_user
+from utils.etag import etag_catalogo, registrar_cambio
+from utils.integridad import comprobar_dependencias, dependencia
+from utils.referencias import invalidar_referencia, obtener_referencia
 
 router = APIRouter(prefix="/tipos-movimiento", tags=["tipos-movimiento"])
 
+# Filas que impiden borrar el tipo de movimiento (utils.integridad)
+DEPENDENCIAS = [
+    dependencia("movimientos", "No se puede eliminar el tipo de movimiento porque tiene movimientos asociados",
+                MovimientoModel.tipo_movimiento_id),
+]
+
 @router.post("/", response_model=TipoMovimientoResponse)
 async def create_tipo_movimiento(
     tipo_movimiento: TipoMovimientoCreate, 
-    current_user: UserModel = Depends(get_current_active_user), 
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Verificar que no exista otro tipo con el mismo código o nombre
-    codigo_exists = db.query(TipoMovimientoModel).filter(TipoMovimientoModel.codigo == tipo_movimiento.codigo).first()
+    codigo_exists = await db.scalar(select(TipoMovimientoModel).where(TipoMovimientoModel.codigo == tipo_movimiento.codigo))
     if codigo_exists:
         raise HTTPException(status_code=400, detail="Ya existe un tipo de movimiento con ese código")
     
-    nombre_exists = db.query(TipoMovimientoModel).filter(TipoMovimientoModel.nombre == tipo_movimiento.nombre).first()
+    nombre_exists = await db.scalar(select(TipoMovimientoModel).where(TipoMovimientoModel.nombre == tipo_movimiento.nombre))
     if nombre_exists:
         raise HTTPException(status_code=400, detail="Ya existe un tipo de movimiento con ese nombre")
     
     db_tipo_movimiento = TipoMovimientoModel(**tipo_movimiento.model_dump())
     db.add(db_tipo_movimiento)
-    db.commit()
-    db.refresh(db_tipo_movimiento)
+    await registrar_cambio(db, "tipos_movimiento")
+    await db.commit()
+    await db.refresh(db_tipo_movimiento)
     return db_tipo_movimiento
 
-@router.get("/", response_model=List[TipoMovimientoResponse])
+@router.get("/", response_model=List[TipoMovimientoResponse], dependencies=[Depends(etag_catalogo("tipos_movimiento"))])
 async def read_tipos_movimiento(
     skip: int = 0, 
     limit: int = 100, 
-    current_user: UserModel = Depends(get_current_active_user), 
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
 ):
-    tipos_movimiento = db.query(TipoMovimientoModel).offset(skip).limit(limit).all()
-    return tipos_movimiento
+    result = await db.scalars(select(TipoMovimientoModel).offset(skip).limit(limit))
+    return result.all()
 
 @router.get("/{tipo_movimiento_id}", response_model=TipoMovimientoResponse)
 async def read_tipo_movimiento(
     tipo_movimiento_id: int, 
-    current_user: UserModel = Depends(get_current_active_user), 
-    db: Session = Depends(get_db)
+    version: Dict[str, int] = Depends(etag_catalogo("tipos_movimiento")),
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_tipo_movimiento = db.query(TipoMovimientoModel).filter(TipoMovimientoModel.id == tipo_movimiento_id).first()
+    db_tipo_movimiento = await obtener_referencia(db, TipoMovimientoModel, tipo_movimiento_id, version["tipos_movimiento"])
     if db_tipo_movimiento is None:
         raise HTTPException(status_code=404, detail="Tipo de movimiento no encontrado")
     return db_tipo_movimiento
@@ -56,25 +68,25 @@ async def read_tipo_movimiento(
 async def update_tipo_movimiento(
     tipo_movimiento_id: int, 
     tipo_movimiento: TipoMovimientoUpdate, 
-    current_user: UserModel = Depends(get_current_active_user), 
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_tipo_movimiento = db.query(TipoMovimientoModel).filter(TipoMovimientoModel.id == tipo_movimiento_id).first()
+    db_tipo_movimiento = await db.get(TipoMovimientoModel, tipo_movimiento_id)
     if db_tipo_movimiento is None:
         raise HTTPException(status_code=404, detail="Tipo de movimiento no encontrado")
     
     # Verificar que no exista otro tipo con el mismo código o nombre
     if tipo_movimiento.codigo and tipo_movimiento.codigo != db_tipo_movimiento.codigo:
-        codigo_exists = db.query(TipoMovimientoModel).filter(
+        codigo_exists = await db.scalar(select(TipoMovimientoModel).where(
             TipoMovimientoModel.codigo == tipo_movimiento.codigo
-        ).first()
+        ))
         if codigo_exists:
             raise HTTPException(status_code=400, detail="Ya existe un tipo de movimiento con ese código")
     
     if tipo_movimiento.nombre and tipo_movimiento.nombre != db_tipo_movimiento.nombre:
-        nombre_exists = db.query(TipoMovimientoModel).filter(
+        nombre_exists = await db.scalar(select(TipoMovimientoModel).where(
             TipoMovimientoModel.nombre == tipo_movimiento.nombre
-        ).first()
+        ))
         if nombre_exists:
             raise HTTPException(status_code=400, detail="Ya existe un tipo de movimiento con ese nombre")
     
@@ -83,27 +95,28 @@ async def update_tipo_movimiento(
     for key, value in tipo_movimiento_data.items():
         setattr(db_tipo_movimiento, key, value)
     
-    db.commit()
-    db.refresh(db_tipo_movimiento)
+    await registrar_cambio(db, "tipos_movimiento")
+    await db.commit()
+    invalidar_referencia(TipoMovimientoModel, tipo_movimiento_id)
+    await db.refresh(db_tipo_movimiento)
     return db_tipo_movimiento
 
 @router.delete("/{tipo_movimiento_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_tipo_movimiento(
     tipo_movimiento_id: int, 
-    current_user: UserModel = Depends(get_current_active_user), 
-    db: Session = Depends(get_db)
+    contar: bool = False,
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_tipo_movimiento = db.query(TipoMovimientoModel).filter(TipoMovimientoModel.id == tipo_movimiento_id).first()
+    db_tipo_movimiento = await db.get(TipoMovimientoModel, tipo_movimiento_id)
     if db_tipo_movimiento is None:
         raise HTTPException(status_code=404, detail="Tipo de movimiento no encontrado")
     
     # Verificar si hay movimientos asociados antes de eliminar
-    if db_tipo_movimiento.movimientos:
-        raise HTTPException(
-            status_code=400, 
-            detail="No se puede eliminar el tipo de movimiento porque tiene movimientos asociados"
-        )
+    await comprobar_dependencias(db, DEPENDENCIAS, tipo_movimiento_id, contar)
     
-    db.delete(db_tipo_movimiento)
-    db.commit()
+    await db.delete(db_tipo_movimiento)
+    await registrar_cambio(db, "tipos_movimiento")
+    await db.commit()
+    invalidar_referencia(TipoMovimientoModel, tipo_movimiento_id)
     return None 
\ No newline at end of file
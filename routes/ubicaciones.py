@@ -1,48 +1,63 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List
 
-from config.database import get_db
+from config.database import get_async_db
+from models.movimiento_inventario import MovimientoInventario as MovimientoModel
+from models.stock import Stock as StockModel
 from models.ubicacion import Ubicacion as UbicacionModel
 from schemas.ubicacion import UbicacionCreate, UbicacionResponse, UbicacionUpdate
-from utils.auth import get_current_active_user
-from models.user import User as UserModel
+from utils.auth import Principal, get_current_active_user
+from utils.etag import etag_catalogo, registrar_cambio
+from utils.integridad import comprobar_dependencias, dependencia
+from utils.referencias import invalidar_referencia, obtener_referencia
+from utils.stock import borrar_snapshots
 
 router = APIRouter(prefix="/ubicaciones", tags=["ubicaciones"])
 
+# Filas que impiden borrar la ubicación (utils.integridad)
+DEPENDENCIAS = [
+    dependencia("stocks", "No se puede eliminar la ubicación porque tiene stock asociado", StockModel.ubicacion_id),
+    dependencia("movimientos", "No se puede eliminar la ubicación porque tiene movimientos de inventario asociados",
+                MovimientoModel.ubicacion_origen_id, MovimientoModel.ubicacion_destino_id),
+]
+
 @router.post("/", response_model=UbicacionResponse)
 async def create_ubicacion(
     ubicacion: UbicacionCreate, 
-    current_user: UserModel = Depends(get_current_active_user), 
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_ubicacion = db.query(UbicacionModel).filter(UbicacionModel.nombre == ubicacion.nombre).first()
+    db_ubicacion = await db.scalar(select(UbicacionModel).where(UbicacionModel.nombre == ubicacion.nombre))
     if db_ubicacion:
         raise HTTPException(status_code=400, detail="Ya existe una ubicación con ese nombre")
     
     db_ubicacion = UbicacionModel(**ubicacion.model_dump())
     db.add(db_ubicacion)
-    db.commit()
-    db.refresh(db_ubicacion)
+    await registrar_cambio(db, "ubicaciones")
+    await db.commit()
+    await db.refresh(db_ubicacion)
     return db_ubicacion
 
-@router.get("/", response_model=List[UbicacionResponse])
+@router.get("/", response_model=List[UbicacionResponse], dependencies=[Depends(etag_catalogo("ubicaciones"))])
 async def read_ubicaciones(
     skip: int = 0, 
     limit: int = 100, 
-    current_user: UserModel = Depends(get_current_active_user), 
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
 ):
-    ubicaciones = db.query(UbicacionModel).offset(skip).limit(limit).all()
-    return ubicaciones
+    result = await db.scalars(select(UbicacionModel).offset(skip).limit(limit))
+    return result.all()
 
 @router.get("/{ubicacion_id}", response_model=UbicacionResponse)
 async def read_ubicacion(
     ubicacion_id: int, 
-    current_user: UserModel = Depends(get_current_active_user), 
-    db: Session = Depends(get_db)
+    version: Dict[str, int] = Depends(etag_catalogo("ubicaciones")),
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_ubicacion = db.query(UbicacionModel).filter(UbicacionModel.id == ubicacion_id).first()
+    db_ubicacion = await obtener_referencia(db, UbicacionModel, ubicacion_id, version["ubicaciones"])
     if db_ubicacion is None:
         raise HTTPException(status_code=404, detail="Ubicación no encontrada")
     return db_ubicacion
@@ -51,16 +66,16 @@ async def read_ubicacion(
 async def update_ubicacion(
     ubicacion_id: int, 
     ubicacion: UbicacionUpdate, 
-    current_user: UserModel = Depends(get_current_active_user), 
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_ubicacion = db.query(UbicacionModel).filter(UbicacionModel.id == ubicacion_id).first()
+    db_ubicacion = await db.get(UbicacionModel, ubicacion_id)
     if db_ubicacion is None:
         raise HTTPException(status_code=404, detail="Ubicación no encontrada")
     
     # Verificar que no exista otra ubicación con el mismo nombre
     if ubicacion.nombre and ubicacion.nombre != db_ubicacion.nombre:
-        nombre_exists = db.query(UbicacionModel).filter(UbicacionModel.nombre == ubicacion.nombre).first()
+        nombre_exists = await db.scalar(select(UbicacionModel).where(UbicacionModel.nombre == ubicacion.nombre))
         if nombre_exists:
             raise HTTPException(status_code=400, detail="Ya existe una ubicación con ese nombre")
     
@@ -69,33 +84,29 @@ async def update_ubicacion(
     for key, value in ubicacion_data.items():
         setattr(db_ubicacion, key, value)
     
-    db.commit()
-    db.refresh(db_ubicacion)
+    await registrar_cambio(db, "ubicaciones")
+    await db.commit()
+    invalidar_referencia(UbicacionModel, ubicacion_id)
+    await db.refresh(db_ubicacion)
     return db_ubicacion
 
 @router.delete("/{ubicacion_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_ubicacion(
     ubicacion_id: int, 
-    current_user: UserModel = Depends(get_current_active_user), 
-    db: Session = Depends(get_db)
+    contar: bool = False,
+    current_user: Principal = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_ubicacion = db.query(UbicacionModel).filter(UbicacionModel.id == ubicacion_id).first()
+    db_ubicacion = await db.get(UbicacionModel, ubicacion_id)
     if db_ubicacion is None:
         raise HTTPException(status_code=404, detail="Ubicación no encontrada")
     
     # Verificar si hay stocks o movimientos asociados antes de eliminar
-    if db_ubicacion.stocks:
-        raise HTTPException(
-            status_code=400, 
-            detail="No se puede eliminar la ubicación porque tiene stock asociado"
-        )
-    
-    if db_ubicacion.movimientos_origen or db_ubicacion.movimientos_destino:
-        raise HTTPException(
-            status_code=400, 
-            detail="No se puede eliminar la ubicación porque tiene movimientos de inventario asociados"
-        )
+    await comprobar_dependencias(db, DEPENDENCIAS, ubicacion_id, contar)
     
-    db.delete(db_ubicacion)
-    db.commit()
+    await borrar_snapshots(db, ubicacion_id=ubicacion_id)
+    await db.delete(db_ubicacion)
+    await registrar_cambio(db, "ubicaciones")
+    await db.commit()
+    invalidar_referencia(UbicacionModel, ubicacion_id)
     return None 
\ No newline at end of file
@@ -1,42 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
-from config.database import get_db
+from config.database import get_async_db
 from models.user import User as UserModel
 from schemas.user import UserResponse as UserSchema
-from utils.utils import decode_access_token, is_token_blacklisted
-from fastapi.security import OAuth2PasswordBearer
-
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
+from utils.auth import Principal, get_admin_user
 
 router = APIRouter()
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    payload = decode_access_token(token)
-    if payload is None or is_token_blacklisted(token, db):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    user = db.query(UserModel).filter(UserModel.username == payload["sub"]).first()
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    return user
-
-def get_current_active_user(current_user: UserModel = Depends(get_current_user)):
-    if current_user.role != "admin":
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="The user doesn't have enough privileges",
-        )
-    return current_user
-
 @router.get("/users", response_model=List[UserSchema])
-async def read_users(current_user: UserModel = Depends(get_current_active_user), db: Session = Depends(get_db)):
-    return db.query(UserModel).all()
+async def read_users(current_user: Principal = Depends(get_admin_user), db: AsyncSession = Depends(get_async_db)):
+    result = await db.scalars(select(UserModel))
+    return result.all()
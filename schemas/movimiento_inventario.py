@@ -1,6 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, Union
-from datetime import datetime
+from datetime import date, datetime
 
 class MovimientoInventarioBase(BaseModel):
     cantidad: float
@@ -15,10 +15,12 @@ class MovimientoInventarioBase(BaseModel):
         from_attributes = True
 
 class MovimientoInventarioCreate(MovimientoInventarioBase):
-    pass
+    # El sentido lo da el tipo de movimiento: una cantidad negativa invertiría
+    # la entrada o la salida sin pasar por la comprobación de stock
+    cantidad: float = Field(gt=0)
 
 class MovimientoInventarioUpdate(MovimientoInventarioBase):
-    cantidad: Optional[float] = None
+    cantidad: Optional[float] = Field(None, gt=0)
     tipo_movimiento_id: Optional[int] = None
     producto_id: Optional[int] = None
 
@@ -40,6 +42,12 @@ class MovimientoInventarioDetalleResponse(MovimientoInventarioResponse):
     class Config:
         from_attributes = True
 
+class MovimientoSerieResponse(BaseModel):
+    fecha: date
+    entradas: float
+    salidas: float
+    movimientos: int
+
 # Para evitar referencias circulares
 from schemas.tipo_movimiento import TipoMovimientoResponse
 from schemas.producto import ProductoResponse
@@ -30,14 +30,26 @@ class ProductoResponse(ProductoBase):
     class Config:
         from_attributes = True
 
-class ProductoDetalleResponse(ProductoResponse):
+class ProductoStockResponse(ProductoResponse):
+    # Cambia con cada movimiento: va aparte para que el catálogo no lo incluya
+    stock_total: float = 0
+
+class ProductoDetalleResponse(ProductoStockResponse):
     categoria: 'CategoriaResponse'
     proveedor: Optional['ProveedorResponse'] = None
-    stock_total: Optional[float] = 0
     
     class Config:
         from_attributes = True
 
+class ProductoImportError(BaseModel):
+    fila: int
+    detail: str
+
+class ProductoImportResponse(BaseModel):
+    filas: int
+    importados: int
+    errores: List[ProductoImportError] = []
+
 # Para evitar referencias circulares
 from schemas.categoria import CategoriaResponse
 from schemas.proveedor import ProveedorResponse 
\ No newline at end of file
@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+
+from schemas.producto import ProductoStockResponse
+
+class ProductoBajoMinimoResponse(ProductoStockResponse):
+    # stock_minimo - stock_total: lo que falta para llegar al mínimo
+    faltante: float
+
+class ValoracionResponse(BaseModel):
+    categoria_id: int
+    categoria: str
+    ubicacion_id: int
+    ubicacion: str
+    cantidad: float
+    # SUM(cantidad * precio_compra); los productos sin precio de compra valen 0
+    valor: float
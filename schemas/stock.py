@@ -23,6 +23,11 @@ class StockResponse(StockBase):
     class Config:
         from_attributes = True
 
+class StockEnFechaResponse(BaseModel):
+    producto_id: int
+    ubicacion_id: int
+    cantidad: float
+
 class StockDetalleResponse(StockResponse):
     producto: 'ProductoResponse'
     ubicacion: 'UbicacionResponse'
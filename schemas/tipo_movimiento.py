@@ -5,7 +5,7 @@ class TipoMovimientoBase(BaseModel):
     codigo: str
     nombre: str
     descripcion: Optional[str] = None
-    afecta_stock: Literal["entrada", "salida", "ninguno"]
+    afecta_stock: Literal["entrada", "salida", "transferencia", "ninguno"]
 
     class Config:
         from_attributes = True
@@ -16,7 +16,7 @@ class TipoMovimientoCreate(TipoMovimientoBase):
 class TipoMovimientoUpdate(TipoMovimientoBase):
     codigo: Optional[str] = None
     nombre: Optional[str] = None
-    afecta_stock: Optional[Literal["entrada", "salida", "ninguno"]] = None
+    afecta_stock: Optional[Literal["entrada", "salida", "transferencia", "ninguno"]] = None
 
 class TipoMovimientoResponse(TipoMovimientoBase):
     id: int
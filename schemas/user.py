@@ -1,5 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from typing import Optional
+from datetime import datetime
 
 class UserBase(BaseModel):
     username: str
@@ -24,7 +25,8 @@ class UserResponse(UserBase):
         from_attributes = True
 
 class TokenBlacklist(BaseModel):
-    token: str
+    token_hash: str
+    expires_at: datetime
 
     class Config:
         from_attributes = True
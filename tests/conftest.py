@@ -1,7 +1,8 @@
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool, StaticPool
 from fastapi.testclient import TestClient
 import jwt
 from datetime import datetime, timedelta
@@ -10,12 +11,16 @@ import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app import app
-from config.database import Base, get_db
+from config.database import Base, get_async_db
 from models import User, Categoria, Proveedor, Ubicacion, Producto, Stock, TipoMovimiento, MovimientoInventario
-from utils.utils import get_password_hash, create_access_token, SECRET_KEY, ALGORITHM
+from utils.utils import get_password_hash, create_access_token, decoded_token_cache, revocation_cache, SECRET_KEY, ALGORITHM
+from utils.auth import principal_cache
+from utils.referencias import limpiar_referencias
+from routes.reportes import valoracion_cache
 
 # Configuración de base de datos de prueba
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+ASYNC_SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
 
 @pytest.fixture(scope="session")
 def db_engine():
@@ -36,32 +41,59 @@ def db_engine():
         # Si no podemos eliminar el archivo, simplemente lo ignoramos
         pass
 
+@pytest.fixture(scope="session")
+def async_db_engine(db_engine):
+    # NullPool: TestClient abre un event loop por prueba y las conexiones
+    # de aiosqlite no pueden reutilizarse entre loops
+    engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, poolclass=NullPool)
+    yield engine
+    engine.sync_engine.dispose()
+
+@pytest.fixture(scope="function")
+def query_counter(async_db_engine):
+    """Lista con las sentencias SQL que ejecuta la aplicación durante la prueba"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(async_db_engine.sync_engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(async_db_engine.sync_engine, "before_cursor_execute", record)
+
 @pytest.fixture(scope="function")
 def db_session(db_engine):
     """Crea una sesión de prueba para cada prueba"""
-    connection = db_engine.connect()
-    transaction = connection.begin()
-    TestingSessionLocal = sessionmaker(bind=connection)
+    # La aplicación usa su propia conexión asíncrona, así que los datos de las
+    # fixtures se confirman de verdad y se limpian al terminar cada prueba
+    TestingSessionLocal = sessionmaker(bind=db_engine)
     session = TestingSessionLocal()
     
     try:
         yield session
     finally:
         session.close()
-        transaction.rollback()
-        connection.close()
+        with db_engine.begin() as connection:
+            for table in reversed(Base.metadata.sorted_tables):
+                connection.execute(table.delete())
 
 @pytest.fixture(scope="function")
-def client(db_session):
+def client(db_session, async_db_engine):
     """Cliente de prueba para FastAPI"""
-    def override_get_db():
-        try:
-            yield db_session
-        finally:
-            pass
+    TestingAsyncSessionLocal = async_sessionmaker(async_db_engine, autoflush=False, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with TestingAsyncSessionLocal() as session:
+            yield session
     
-    # Reemplazar la dependencia get_db
-    app.dependency_overrides[get_db] = override_get_db
+    # Reemplazar la dependencia get_async_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    # Las tablas se vacían entre pruebas; las cachés locales también
+    revocation_cache.clear()
+    decoded_token_cache.clear()
+    principal_cache.clear()
+    limpiar_referencias()
+    valoracion_cache.clear()
     
     with TestClient(app) as test_client:
         yield test_client
@@ -260,6 +292,8 @@ def test_stock(db_session, test_producto, test_ubicacion):
         cantidad=100.0
     )
     db_session.add(stock)
+    # Mantener el total del producto igual que lo harían las rutas
+    test_producto.stock_total += stock.cantidad
     db_session.commit()
     db_session.refresh(stock)
     return stock 
\ No newline at end of file
@@ -1,7 +1,19 @@
 import pytest
 from fastapi import status
 import json
+from datetime import datetime, timedelta
 from schemas.user import UserCreate
+import asyncio
+import hashlib
+import threading
+import time
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import TokenBlacklist
+from utils import utils
+from utils.auth import principal_cache
+from utils.password_pool import PasswordHashPool, PasswordPoolSaturated
+from utils.revocation import RevocationCache
+from utils.utils import create_access_token, decode_access_token, purge_expired_tokens, revocation_cache, token_revocation_hash
 
 # Test para signup
 def test_create_user(client):
@@ -110,4 +122,191 @@ def test_token_required_for_protected_routes(client):
     # La ruta /profile/me puede que devuelva 404, ya que no existe o requiere un parámetro adicional
     # Si devuelve 404, eso es aceptable siempre que no sea porque pudiste acceder sin token
     response = client.get("/profile/me")
-    assert response.status_code in [status.HTTP_401_UNAUTHORIZED, status.HTTP_404_NOT_FOUND] 
\ No newline at end of file
+    assert response.status_code in [status.HTTP_401_UNAUTHORIZED, status.HTTP_404_NOT_FOUND] 
+
+# Tests para el pool de hashing de contraseñas
+def test_password_pool_rejects_when_full():
+    pool = PasswordHashPool(max_workers=1, max_pending=2)
+    release = threading.Event()
+
+    async def scenario():
+        running = [asyncio.ensure_future(pool.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        assert pool.stats()["running"] == 1
+        assert pool.stats()["queued"] == 1
+        with pytest.raises(PasswordPoolSaturated):
+            await pool.run(release.wait)
+        release.set()
+        await asyncio.gather(*running)
+
+    asyncio.run(scenario())
+    stats = pool.stats()
+    assert stats["running"] == 0 and stats["queued"] == 0
+    assert stats["rejected"] == 1
+    pool.shutdown()
+
+def test_password_pool_counts_cancelled_jobs_until_they_finish():
+    pool = PasswordHashPool(max_workers=1, max_pending=1)
+    release = threading.Event()
+
+    async def scenario():
+        # La petición se cancela, pero el hilo sigue con el hash y ocupa su plaza
+        job = asyncio.ensure_future(pool.run(release.wait))
+        await asyncio.sleep(0.05)
+        job.cancel()
+        await asyncio.sleep(0)
+        assert pool.stats()["running"] == 1
+        with pytest.raises(PasswordPoolSaturated):
+            await pool.run(release.wait)
+        release.set()
+        await asyncio.sleep(0.05)
+        assert pool.stats()["running"] == 0
+        assert await pool.run(lambda: "ok") == "ok"
+
+    asyncio.run(scenario())
+    pool.shutdown()
+    # Tras shutdown (fin del lifespan) el pool vuelve a crear sus hilos al usarse
+    assert asyncio.run(pool.run(lambda: "ok")) == "ok"
+    pool.shutdown()
+
+def test_login_returns_503_when_password_pool_saturated(client, test_user, monkeypatch):
+    monkeypatch.setattr(utils, "password_hash_pool", PasswordHashPool(max_workers=1, max_pending=0))
+    response = client.post(
+        "/login",
+        data={"username": test_user.username, "password": "password123"},
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    )
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.headers["Retry-After"] == "1"
+
+def test_password_pool_metrics(client, admin_token, user_token):
+    response = client.get("/metrics/password-pool", headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert {"workers", "max_pending", "running", "queued", "rejected"} <= data.keys()
+
+    response = client.get("/metrics/password-pool", headers={"Authorization": f"Bearer {user_token}"})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+# Tests para la caché local de revocaciones
+def test_revocation_cache_answers_without_database():
+    cache = RevocationCache(capacity=1000, max_exact=10)
+    revoked = hashlib.sha256(b"revoked").hexdigest()
+    other = hashlib.sha256(b"other").hexdigest()
+    cache.add(revoked, time.time() + 1800)
+    assert cache.check(revoked) is True
+    assert cache.check(other) is False
+
+    # Un token que ya expiró no ocupa sitio en la caché
+    expired = hashlib.sha256(b"expired").hexdigest()
+    cache.add(expired, time.time() - 60)
+    assert cache.check(expired) is False
+
+def test_authenticated_request_skips_blacklist_query(authorized_client, monkeypatch):
+    async def fail(*args, **kwargs):
+        raise AssertionError("no debería consultarse token_blacklist")
+
+    monkeypatch.setattr(utils, "_is_token_blacklisted_db", fail)
+    response = authorized_client.get("/categorias/")
+    assert response.status_code == status.HTTP_200_OK
+
+def test_revocation_from_other_process_is_synced(authorized_client, db_session, token):
+    response = authorized_client.get("/categorias/")
+    assert response.status_code == status.HTTP_200_OK
+
+    # Otro worker revoca el token directamente en la base
+    payload = decode_access_token(token)
+    db_session.add(TokenBlacklist(
+        token_hash=token_revocation_hash(token, payload),
+        expires_at=datetime.utcfromtimestamp(payload["exp"])
+    ))
+    db_session.commit()
+    # Forzar la sincronización periódica en la siguiente petición
+    revocation_cache._last_sync = None
+
+    response = authorized_client.get("/categorias/")
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+# Tests para el almacenamiento compacto de revocaciones
+def test_access_token_has_unique_jti(test_user):
+    first = decode_access_token(create_access_token(data={"sub": test_user.username}))
+    second = decode_access_token(create_access_token(data={"sub": test_user.username}))
+    assert first["jti"] and first["jti"] != second["jti"]
+
+def test_logout_stores_digest_and_expiration(authorized_client, db_session, token):
+    response = authorized_client.post("/logout")
+    assert response.status_code == status.HTTP_200_OK
+    # Un segundo logout con el mismo token no falla
+    response = authorized_client.post("/logout")
+    assert response.status_code == status.HTTP_200_OK
+
+    rows = db_session.query(TokenBlacklist).all()
+    assert len(rows) == 1
+    assert len(rows[0].token_hash) == 64
+    assert token not in rows[0].token_hash
+    assert rows[0].expires_at > datetime.utcnow()
+
+def test_purge_expired_tokens(db_session, async_db_engine):
+    db_session.add_all([
+        TokenBlacklist(token_hash="a" * 64, expires_at=datetime.utcnow() - timedelta(minutes=1)),
+        TokenBlacklist(token_hash="b" * 64, expires_at=datetime.utcnow() + timedelta(minutes=30)),
+    ])
+    db_session.commit()
+
+    async def purge():
+        async with AsyncSession(async_db_engine) as db:
+            return await purge_expired_tokens(db)
+
+    assert asyncio.run(purge()) == 1
+    db_session.expire_all()
+    assert [row.token_hash for row in db_session.query(TokenBlacklist).all()] == ["b" * 64]
+
+# Tests para la caché de usuarios autenticados
+def test_principal_cache_skips_user_query(authorized_client, test_user):
+    response = authorized_client.get("/profile")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"username": test_user.username, "role": test_user.role}
+    hits = principal_cache.hits
+
+    response = authorized_client.get("/profile")
+    assert response.status_code == status.HTTP_200_OK
+    assert principal_cache.hits == hits + 1
+
+def test_principal_cache_invalidated_on_user_change(client, db_session, test_user, user_token):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    assert client.get("/admin/users", headers=headers).status_code == status.HTTP_401_UNAUTHORIZED
+
+    # Al cambiar el rol, la siguiente petición debe ver el nuevo valor
+    test_user.role = "admin"
+    db_session.commit()
+    assert client.get("/admin/users", headers=headers).status_code == status.HTTP_200_OK
+
+def test_principal_cache_invalidated_on_logout(authorized_client, test_user):
+    authorized_client.get("/profile")
+    assert principal_cache.get(test_user.username) is not None
+    authorized_client.post("/logout")
+    assert principal_cache.get(test_user.username) is None
+
+# Tests para la caché de tokens decodificados
+def test_decoded_token_cache_skips_signature_check(test_user, monkeypatch):
+    token = utils.create_access_token(data={"sub": test_user.username}, expires_delta=timedelta(minutes=30))
+    calls = []
+    original = utils.jwt.decode
+    monkeypatch.setattr(utils.jwt, "decode", lambda *a, **kw: calls.append(1) or original(*a, **kw))
+
+    first = utils.decode_access_token(token)
+    second = utils.decode_access_token(token)
+    assert first == second and first["sub"] == test_user.username
+    assert len(calls) == 1
+
+def test_decoded_token_cache_ignores_invalid_tokens():
+    token = utils.create_access_token(data={"sub": "x"}, expires_delta=timedelta(minutes=30))
+    assert utils.decode_access_token(token + "x") is None
+    expired = utils.create_access_token(data={"sub": "x"}, expires_delta=timedelta(minutes=-1))
+    assert utils.decode_access_token(expired) is None
+    assert utils.decode_access_token(expired) is None
+
+def test_logout_revokes_cached_token_immediately(authorized_client):
+    assert authorized_client.get("/profile").status_code == status.HTTP_200_OK
+    authorized_client.post("/logout")
+    assert authorized_client.get("/profile").status_code == status.HTTP_401_UNAUTHORIZED
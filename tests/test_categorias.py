@@ -1,5 +1,6 @@
 import pytest
 from fastapi import status
+from models import Categoria, CatalogoVersion
 
 # Test para crear una categoría
 def test_create_categoria(client, admin_token):
@@ -77,6 +78,17 @@ def test_update_categoria(client, test_categoria, admin_token):
     assert data["nombre"] == "Categoría Actualizada"
     assert data["descripcion"] == "Descripción actualizada"
 
+def test_categoria_cache_invalidated_on_update(client, test_categoria, admin_token):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    assert client.get(f"/categorias/{test_categoria.id}", headers=headers).json()["nombre"] == test_categoria.nombre
+
+    client.put(f"/categorias/{test_categoria.id}", json={"nombre": "Nombre nuevo"}, headers=headers)
+    assert client.get(f"/categorias/{test_categoria.id}", headers=headers).json()["nombre"] == "Nombre nuevo"
+
+    client.delete(f"/categorias/{test_categoria.id}", headers=headers)
+    response = client.get(f"/categorias/{test_categoria.id}", headers=headers)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
 # Test para eliminar una categoría
 def test_delete_categoria(client, admin_token):
     # Primero crear una categoría
@@ -112,4 +124,48 @@ def test_categoria_requires_auth(client):
     
     # Intentar leer sin autenticación
     response = client.get("/categorias/")
-    assert response.status_code == status.HTTP_401_UNAUTHORIZED 
\ No newline at end of file
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED 
+
+# Tests para las peticiones condicionales (ETag)
+def test_read_categorias_etag(client, admin_token, query_counter, test_categoria):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    response = client.get("/categorias/", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    etag = response.headers["ETag"]
+
+    query_counter.clear()
+    response = client.get("/categorias/", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+    # Solo se consulta la versión, no la tabla
+    assert not [q for q in query_counter if "FROM categorias" in q]
+
+    client.post("/categorias/", json={"nombre": "Otra categoría"}, headers=headers)
+    response = client.get("/categorias/", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["ETag"] != etag
+    assert len(response.json()) == 2
+
+def test_read_categoria_etag_after_edit_in_other_process(client, admin_token, db_session, query_counter, test_categoria):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    etag = client.get(f"/categorias/{test_categoria.id}", headers=headers).headers["ETag"]
+
+    # Con la versión sin cambios se sirve de la caché del proceso
+    query_counter.clear()
+    assert client.get(f"/categorias/{test_categoria.id}", headers=headers).json()["nombre"] == test_categoria.nombre
+    assert not [q for q in query_counter if "FROM categorias" in q]
+
+    # Otro proceso cambia la fila y la versión sin invalidar esta caché
+    db_session.query(Categoria).filter_by(id=test_categoria.id).update({"nombre": "Renombrada fuera"})
+    version = db_session.get(CatalogoVersion, "categorias")
+    if version is None:
+        db_session.add(CatalogoVersion(tabla="categorias", version=1))
+    else:
+        version.version += 1
+    db_session.commit()
+
+    response = client.get(f"/categorias/{test_categoria.id}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["ETag"] != etag
+    assert response.json()["nombre"] == "Renombrada fuera"
@@ -1,3 +1,4 @@
+import os
 import pytest
 from fastapi import status
 from datetime import datetime, timedelta
@@ -156,6 +157,22 @@ def test_create_movimiento_stock_insuficiente(authorized_client, test_producto,
     assert response.status_code == status.HTTP_400_BAD_REQUEST
     assert "stock insuficiente" in response.json()["detail"].lower()
 
+def test_create_movimiento_cantidad_no_positiva(authorized_client, db_session, test_producto, test_ubicacion, test_stock):
+    from models import MovimientoInventario, Stock
+
+    entrada_id = _tipo(db_session, "ENTN", "entrada")
+    inicial = test_stock.cantidad
+    for cantidad in (-5.0, 0):
+        linea = {"cantidad": cantidad, "tipo_movimiento_id": entrada_id, "producto_id": test_producto.id,
+                 "ubicacion_destino_id": test_ubicacion.id}
+        assert authorized_client.post("/movimientos/", json=linea).status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        response = authorized_client.post("/movimientos/batch", json=[{**linea, "cantidad": 1.0}, linea])
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    db_session.expire_all()
+    assert db_session.get(Stock, test_stock.id).cantidad == inicial
+    assert db_session.query(MovimientoInventario).count() == 0
+
 # Test para obtener movimientos
 def test_read_movimientos(authorized_client, test_producto, test_ubicacion, test_tipo_movimiento, test_user):
     # Crear un movimiento para asegurarnos de que hay datos
@@ -249,4 +266,527 @@ def test_movimiento_requires_auth(client):
             "tipo_movimiento_id": 1
         }
     )
-    assert response.status_code == status.HTTP_401_UNAUTHORIZED 
\ No newline at end of file
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED 
+# Tests para el número de consultas de los listados
+def _crear_movimientos(db_session, test_producto, test_tipo_movimiento, test_user, cantidad, inicio=0):
+    from models import MovimientoInventario, Ubicacion
+
+    for i in range(inicio, inicio + cantidad):
+        # Ubicaciones distintas para que cada fila tenga relaciones propias
+        origen = Ubicacion(nombre=f"Origen {i}", tipo="almacén")
+        destino = Ubicacion(nombre=f"Destino {i}", tipo="tienda")
+        db_session.add_all([origen, destino])
+        db_session.flush()
+        db_session.add(MovimientoInventario(
+            cantidad=1.0,
+            tipo_movimiento_id=test_tipo_movimiento.id,
+            producto_id=test_producto.id,
+            ubicacion_origen_id=origen.id,
+            ubicacion_destino_id=destino.id,
+            usuario_id=test_user.id
+        ))
+    db_session.commit()
+
+def _consultas_de_datos(statements):
+    # Las consultas de autenticación (revocaciones, usuario) no dependen del listado
+    return [s for s in statements if "token_blacklist" not in s and "users.username = " not in s]
+
+def test_read_movimientos_query_count_is_constant(authorized_client, db_session, query_counter,
+                                                 test_producto, test_tipo_movimiento, test_user):
+    _crear_movimientos(db_session, test_producto, test_tipo_movimiento, test_user, 2)
+    query_counter.clear()
+    response = authorized_client.get("/movimientos/")
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()) == 2
+    pocas = len(_consultas_de_datos(query_counter))
+
+    _crear_movimientos(db_session, test_producto, test_tipo_movimiento, test_user, 20, inicio=2)
+    query_counter.clear()
+    response = authorized_client.get("/movimientos/")
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert len(data) == 22
+    assert all(mov["ubicacion_origen"] and mov["ubicacion_destino"] and mov["usuario"] for mov in data)
+    # Página y relaciones en una sola consulta, sin importar cuántas filas haya
+    assert len(_consultas_de_datos(query_counter)) == pocas == 1
+
+# Tests para la paginación por cursor
+def test_read_movimientos_cursor_pagination(authorized_client, db_session, test_producto, test_tipo_movimiento, test_user):
+    from models import MovimientoInventario
+
+    fecha = datetime(2024, 1, 1, 12, 0, 0)
+    # Varias filas comparten fecha: el id tiene que desempatar
+    for i in range(7):
+        db_session.add(MovimientoInventario(
+            cantidad=1.0,
+            fecha=fecha - timedelta(hours=i // 2),
+            tipo_movimiento_id=test_tipo_movimiento.id,
+            producto_id=test_producto.id,
+            usuario_id=test_user.id
+        ))
+    db_session.commit()
+
+    response = authorized_client.get(f"/movimientos/?limit=3&producto_id={test_producto.id}")
+    assert response.status_code == status.HTTP_200_OK
+    vistos = [mov["id"] for mov in response.json()]
+    cursor = response.headers["X-Next-Cursor"]
+
+    # Un movimiento nuevo no desplaza las páginas siguientes
+    db_session.add(MovimientoInventario(
+        cantidad=1.0, fecha=fecha + timedelta(days=1), tipo_movimiento_id=test_tipo_movimiento.id,
+        producto_id=test_producto.id, usuario_id=test_user.id
+    ))
+    db_session.commit()
+
+    while cursor:
+        response = authorized_client.get(f"/movimientos/?limit=3&producto_id={test_producto.id}&cursor={cursor}")
+        assert response.status_code == status.HTTP_200_OK
+        vistos += [mov["id"] for mov in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+
+    esperados = [
+        mov.id for mov in db_session.query(MovimientoInventario)
+        .filter(MovimientoInventario.fecha <= fecha)
+        .order_by(MovimientoInventario.fecha.desc(), MovimientoInventario.id.desc())
+    ]
+    assert vistos == esperados
+
+def test_read_movimientos_invalid_cursor(authorized_client):
+    response = authorized_client.get("/movimientos/?cursor=no-es-un-cursor")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "cursor" in response.json()["detail"].lower()
+
+# Tests de concurrencia sobre el stock
+def _tipo(db_session, codigo, afecta_stock):
+    from models import TipoMovimiento
+
+    tipo = TipoMovimiento(codigo=codigo, nombre=f"Tipo {codigo}", afecta_stock=afecta_stock)
+    db_session.add(tipo)
+    db_session.commit()
+    return tipo.id
+
+def _en_paralelo(authorized_client, cuerpos, hilos=8):
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        return list(pool.map(lambda cuerpo: authorized_client.post("/movimientos/", json=cuerpo), cuerpos))
+
+def test_concurrent_salidas_never_oversell(authorized_client, db_session, test_producto, test_ubicacion, test_stock):
+    from models import Stock
+
+    tipo_id = _tipo(db_session, "SALC", "salida")
+    inicial = int(test_stock.cantidad)
+    # Más peticiones que existencias: solo deben aceptarse tantas como unidades haya
+    respuestas = _en_paralelo(authorized_client, [{
+        "cantidad": 1.0,
+        "tipo_movimiento_id": tipo_id,
+        "producto_id": test_producto.id,
+        "ubicacion_origen_id": test_ubicacion.id
+    }] * (inicial + 30))
+
+    codigos = [r.status_code for r in respuestas]
+    assert codigos.count(status.HTTP_200_OK) == inicial
+    assert codigos.count(status.HTTP_400_BAD_REQUEST) == 30
+    db_session.expire_all()
+    assert db_session.get(Stock, test_stock.id).cantidad == 0
+
+def test_concurrent_entradas_create_single_stock_row(authorized_client, db_session, test_producto):
+    from models import Stock, Ubicacion
+
+    tipo_id = _tipo(db_session, "ENTC", "entrada")
+    ubicacion = Ubicacion(nombre="Ubicación nueva", tipo="almacén")
+    db_session.add(ubicacion)
+    db_session.commit()
+
+    # Ninguna fila de stock previa: todas las peticiones compiten por crearla
+    respuestas = _en_paralelo(authorized_client, [{
+        "cantidad": 2.0,
+        "tipo_movimiento_id": tipo_id,
+        "producto_id": test_producto.id,
+        "ubicacion_destino_id": ubicacion.id
+    }] * 40)
+
+    assert all(r.status_code == status.HTTP_200_OK for r in respuestas)
+    stocks = db_session.query(Stock).filter(Stock.ubicacion_id == ubicacion.id).all()
+    assert len(stocks) == 1
+    assert stocks[0].cantidad == 80.0
+
+# Tests para el alta de movimientos por lotes
+def test_create_movimientos_batch(authorized_client, db_session, query_counter, test_producto, test_ubicacion, test_stock):
+    from models import MovimientoInventario, Stock
+
+    entrada_id = _tipo(db_session, "ENTL", "entrada")
+    salida_id = _tipo(db_session, "SALL", "salida")
+    inicial = test_stock.cantidad
+    lineas = [
+        {"cantidad": 1.0, "tipo_movimiento_id": entrada_id, "producto_id": test_producto.id,
+         "ubicacion_destino_id": test_ubicacion.id, "referencia": f"ALB-1/{i}"}
+        for i in range(50)
+    ] + [
+        {"cantidad": 30.0, "tipo_movimiento_id": salida_id, "producto_id": test_producto.id,
+         "ubicacion_origen_id": test_ubicacion.id}
+    ]
+
+    authorized_client.get("/profile")
+    query_counter.clear()
+    response = authorized_client.post("/movimientos/batch", json=lineas)
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert len(data) == 51
+    assert [mov["referencia"] for mov in data[:2]] == ["ALB-1/0", "ALB-1/1"]
+    assert all(mov["id"] for mov in data)
+    # Validación y stock no dependen del número de líneas: una consulta por
+    # tabla referenciada, una sentencia por pareja producto-ubicación (la
+    # entrada y la salida se compensan en un único upsert), una por producto
+    # para su stock_total, una para el resumen diario y una para la versión de
+    # existencias de los productos del lote
+    consultas = [q for q in query_counter if not q.startswith("INSERT INTO movimientos_inventario")]
+    assert len(consultas) == 7
+    assert len([q for q in consultas if "catalogo_versiones" in q]) == 1
+
+    db_session.expire_all()
+    assert db_session.get(Stock, test_stock.id).cantidad == inicial + 50 - 30
+    assert db_session.query(MovimientoInventario).count() == 51
+
+def test_create_movimientos_batch_is_all_or_nothing(authorized_client, db_session, test_producto, test_ubicacion, test_stock):
+    from models import MovimientoInventario, Stock
+
+    entrada_id = _tipo(db_session, "ENTL", "entrada")
+    salida_id = _tipo(db_session, "SALL", "salida")
+    inicial = test_stock.cantidad
+    lineas = [
+        {"cantidad": 5.0, "tipo_movimiento_id": entrada_id, "producto_id": test_producto.id,
+         "ubicacion_destino_id": test_ubicacion.id},
+        {"cantidad": 5.0, "tipo_movimiento_id": entrada_id, "producto_id": 9999,
+         "ubicacion_destino_id": test_ubicacion.id},
+        {"cantidad": 5.0, "tipo_movimiento_id": salida_id, "producto_id": test_producto.id},
+    ]
+    response = authorized_client.post("/movimientos/batch", json=lineas)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["detail"] == [
+        {"indice": 1, "detail": "Producto no encontrado"},
+        {"indice": 2, "detail": "Para movimientos de salida se requiere una ubicación de origen"},
+    ]
+
+    # Stock insuficiente en una línea: no se aplica ninguna, tampoco la entrada
+    lineas = [
+        {"cantidad": 5.0, "tipo_movimiento_id": entrada_id, "producto_id": test_producto.id,
+         "ubicacion_destino_id": test_ubicacion.id},
+        {"cantidad": inicial, "tipo_movimiento_id": salida_id, "producto_id": test_producto.id,
+         "ubicacion_origen_id": test_ubicacion.id},
+        {"cantidad": 10.0, "tipo_movimiento_id": salida_id, "producto_id": test_producto.id,
+         "ubicacion_origen_id": test_ubicacion.id},
+    ]
+    response = authorized_client.post("/movimientos/batch", json=lineas)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    errores = response.json()["detail"]
+    assert [error["indice"] for error in errores] == [1, 2]
+    assert "stock insuficiente" in errores[0]["detail"].lower()
+
+    db_session.expire_all()
+    assert db_session.get(Stock, test_stock.id).cantidad == inicial
+    assert db_session.query(MovimientoInventario).count() == 0
+
+# Tests para las transferencias entre ubicaciones
+def test_create_movimiento_transferencia(authorized_client, db_session, test_producto, test_ubicacion, test_stock):
+    from models import MovimientoInventario, Stock, Ubicacion
+
+    tipo_id = _tipo(db_session, "TRF", "transferencia")
+    destino = Ubicacion(nombre="Tienda", tipo="tienda")
+    db_session.add(destino)
+    db_session.commit()
+    inicial = test_stock.cantidad
+
+    response = authorized_client.post("/movimientos/", json={
+        "cantidad": 40.0,
+        "tipo_movimiento_id": tipo_id,
+        "producto_id": test_producto.id,
+        "ubicacion_origen_id": test_ubicacion.id,
+        "ubicacion_destino_id": destino.id
+    })
+    assert response.status_code == status.HTTP_200_OK
+
+    db_session.expire_all()
+    assert db_session.get(Stock, test_stock.id).cantidad == inicial - 40
+    stock_destino = db_session.query(Stock).filter(Stock.ubicacion_id == destino.id).one()
+    assert stock_destino.cantidad == 40
+    # Un único movimiento con las dos ubicaciones
+    movimientos = db_session.query(MovimientoInventario).all()
+    assert len(movimientos) == 1
+    assert (movimientos[0].ubicacion_origen_id, movimientos[0].ubicacion_destino_id) == (test_ubicacion.id, destino.id)
+
+def test_create_movimiento_transferencia_stock_insuficiente(authorized_client, db_session, test_producto, test_ubicacion, test_stock):
+    from models import MovimientoInventario, Stock, Ubicacion
+
+    tipo_id = _tipo(db_session, "TRF", "transferencia")
+    destino = Ubicacion(nombre="Tienda", tipo="tienda")
+    db_session.add(destino)
+    db_session.commit()
+    inicial = test_stock.cantidad
+
+    cuerpo = {
+        "cantidad": inicial + 1,
+        "tipo_movimiento_id": tipo_id,
+        "producto_id": test_producto.id,
+        "ubicacion_origen_id": test_ubicacion.id,
+        "ubicacion_destino_id": destino.id
+    }
+    response = authorized_client.post("/movimientos/", json=cuerpo)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "stock insuficiente" in response.json()["detail"].lower()
+
+    # Nada se mueve a medias
+    db_session.expire_all()
+    assert db_session.get(Stock, test_stock.id).cantidad == inicial
+    assert db_session.query(Stock).filter(Stock.ubicacion_id == destino.id).count() == 0
+    assert db_session.query(MovimientoInventario).count() == 0
+
+    response = authorized_client.post("/movimientos/", json={**cuerpo, "cantidad": 1.0, "ubicacion_destino_id": test_ubicacion.id})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "distintas" in response.json()["detail"]
+
+    response = authorized_client.post("/movimientos/", json={**cuerpo, "cantidad": 1.0, "ubicacion_destino_id": None})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+def test_create_tipo_movimiento_transferencia(authorized_client):
+    response = authorized_client.post("/tipos-movimiento/", json={
+        "codigo": "TRF",
+        "nombre": "Transferencia",
+        "afecta_stock": "transferencia"
+    })
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["afecta_stock"] == "transferencia"
+
+# Tests para la exportación de movimientos
+def test_export_movimientos_csv_and_ndjson(authorized_client, db_session, test_producto, test_ubicacion, test_tipo_movimiento, test_user):
+    import csv
+    import io
+    import json
+    from models import MovimientoInventario
+
+    for i in range(3):
+        db_session.add(MovimientoInventario(
+            fecha=datetime(2024, 2, 1 + i), cantidad=1.5 + i, referencia=f"EXP-{i}", observaciones="con, coma",
+            tipo_movimiento_id=test_tipo_movimiento.id, producto_id=test_producto.id,
+            ubicacion_destino_id=test_ubicacion.id, usuario_id=test_user.id
+        ))
+    db_session.commit()
+
+    response = authorized_client.get("/movimientos/export", params={"format": "csv", "fecha_desde": "2024-02-02T00:00:00"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/csv")
+    filas = list(csv.DictReader(io.StringIO(response.text)))
+    assert [f["referencia"] for f in filas] == ["EXP-1", "EXP-2"]
+    assert filas[0]["producto_codigo"] == test_producto.codigo
+    assert filas[0]["ubicacion_destino"] == test_ubicacion.nombre
+    assert filas[0]["ubicacion_origen"] == ""
+    assert filas[0]["observaciones"] == "con, coma"
+
+    response = authorized_client.get("/movimientos/export", params={"format": "ndjson"})
+    assert response.status_code == status.HTTP_200_OK
+    filas = [json.loads(linea) for linea in response.text.splitlines()]
+    assert [f["cantidad"] for f in filas] == [1.5, 2.5, 3.5]
+    assert filas[0]["usuario"] == test_user.username
+    # Las fechas salen como en las respuestas JSON de la API (ISO 8601)
+    fechas = {m["referencia"]: m["fecha"] for m in authorized_client.get("/movimientos/").json()}
+    assert {f["referencia"]: f["fecha"] for f in filas} == fechas
+
+    assert authorized_client.get("/movimientos/export", params={"format": "xml"}).status_code == 422
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/statm"), reason="mide la RSS con /proc")
+def test_export_movimientos_memory_stays_flat(client, db_session, token, test_producto, test_tipo_movimiento, test_user):
+    import asyncio
+    import gc
+    from app import app
+    from models import MovimientoInventario
+
+    filas = 100_000
+    with db_session.bind.begin() as conn:
+        for inicio in range(0, filas, 20_000):
+            conn.execute(MovimientoInventario.__table__.insert(), [
+                {"fecha": datetime(2024, 1, 1) + timedelta(seconds=i), "cantidad": 1.0, "referencia": f"REF-{i:08d}",
+                 "observaciones": "x" * 200,
+                 "tipo_movimiento_id": test_tipo_movimiento.id, "producto_id": test_producto.id,
+                 "usuario_id": test_user.id}
+                for i in range(inicio, inicio + 20_000)
+            ])
+
+    def rss_mb():
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+    # Llamada ASGI directa: TestClient acumularía todo el cuerpo en memoria
+    medida = {"bytes": 0, "pico": 0.0, "status": None}
+    mensajes = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        # Tras la petición el cliente queda a la espera hasta que acaba la respuesta
+        while not mensajes:
+            await asyncio.sleep(0.01)
+        return mensajes.pop(0)
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            medida["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            medida["bytes"] += len(message.get("body", b""))
+            medida["pico"] = max(medida["pico"], rss_mb())
+            if not message.get("more_body", False):
+                mensajes.append({"type": "http.disconnect"})
+
+    scope = {
+        "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http", "path": "/movimientos/export",
+        "raw_path": b"/movimientos/export", "query_string": b"format=csv", "root_path": "",
+        "headers": [(b"authorization", f"Bearer {token}".encode()), (b"host", b"test")],
+        "client": ("test", 1), "server": ("test", 80),
+    }
+    gc.collect()
+    inicial = rss_mb()
+    asyncio.run(app(scope, receive, send))
+
+    assert medida["status"] == 200
+    exportado_mb = medida["bytes"] / 2 ** 20
+    assert exportado_mb > 20
+    # La memoria no crece con el tamaño de la exportación
+    assert medida["pico"] - inicial < exportado_mb / 4, (inicial, medida["pico"], exportado_mb)
+
+# Tests para la caché de tipos de movimiento y ubicaciones
+def test_create_movimiento_uses_reference_cache(authorized_client, client, admin_token, query_counter, test_producto, test_ubicacion, test_tipo_movimiento):
+    cuerpo = {"cantidad": 1.0, "tipo_movimiento_id": test_tipo_movimiento.id, "producto_id": test_producto.id,
+              "ubicacion_destino_id": test_ubicacion.id}
+    assert authorized_client.post("/movimientos/", json=cuerpo).status_code == status.HTTP_200_OK
+
+    query_counter.clear()
+    assert authorized_client.post("/movimientos/", json=cuerpo).status_code == status.HTTP_200_OK
+    assert not [q for q in query_counter if "FROM tipos_movimiento" in q or "FROM ubicaciones" in q]
+
+    response = client.get("/metrics/reference-cache", headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert (data["tipos_movimiento"]["misses"], data["tipos_movimiento"]["hits"]) == (1, 1)
+    assert (data["ubicaciones"]["misses"], data["ubicaciones"]["hits"]) == (1, 1)
+
+def test_create_movimiento_sees_updated_tipo(authorized_client, test_producto, test_ubicacion, test_stock, test_tipo_movimiento):
+    cuerpo = {"cantidad": 1.0, "tipo_movimiento_id": test_tipo_movimiento.id, "producto_id": test_producto.id,
+              "ubicacion_destino_id": test_ubicacion.id}
+    assert authorized_client.post("/movimientos/", json=cuerpo).status_code == status.HTTP_200_OK
+
+    # Tras cambiar el tipo a salida, el siguiente movimiento exige origen
+    response = authorized_client.put(f"/tipos-movimiento/{test_tipo_movimiento.id}", json={"afecta_stock": "salida"})
+    assert response.status_code == status.HTTP_200_OK
+    response = authorized_client.post("/movimientos/", json=cuerpo)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+def test_read_movimientos_matches_detail_schema(authorized_client, db_session, test_producto, test_tipo_movimiento, test_user):
+    from models import MovimientoInventario
+
+    _crear_movimientos(db_session, test_producto, test_tipo_movimiento, test_user, 2)
+    # Sin ubicación de origen: el anidado opcional debe salir como null
+    db_session.add(MovimientoInventario(cantidad=2.5, referencia="SIN-ORIGEN", tipo_movimiento_id=test_tipo_movimiento.id,
+                                        producto_id=test_producto.id, usuario_id=test_user.id))
+    db_session.commit()
+
+    response = authorized_client.get("/movimientos/")
+    assert response.status_code == status.HTTP_200_OK
+    listado = response.json()
+    assert len(listado) == 3
+    # El listado se construye sin Pydantic: debe coincidir con el detalle validado
+    for movimiento in listado:
+        assert movimiento == authorized_client.get(f"/movimientos/{movimiento['id']}").json()
+    assert next(m for m in listado if m["referencia"] == "SIN-ORIGEN")["ubicacion_origen"] is None
+
+# Tests para el resumen diario y las series
+def test_read_series(authorized_client, db_session, async_db_engine, query_counter, test_producto, test_ubicacion, test_stock, test_user):
+    import asyncio
+    from datetime import date, datetime
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from models import MovimientoDiario, MovimientoInventario, Ubicacion
+    from utils.stock import reconstruir_movimientos_diarios
+
+    entrada = _tipo(db_session, "ENT", "entrada")
+    salida = _tipo(db_session, "SAL", "salida")
+    transferencia = _tipo(db_session, "TRF", "transferencia")
+    ninguno = _tipo(db_session, "NOT", "ninguno")
+    tienda = Ubicacion(nombre="Tienda", tipo="tienda")
+    db_session.add(tienda)
+    db_session.commit()
+    a, b = test_ubicacion.id, tienda.id
+
+    # Hoy, por la API (uno suelto y un lote)
+    response = authorized_client.post("/movimientos/", json={
+        "cantidad": 10.0, "tipo_movimiento_id": entrada, "producto_id": test_producto.id, "ubicacion_destino_id": a
+    })
+    assert response.status_code == status.HTTP_200_OK
+    response = authorized_client.post("/movimientos/batch", json=[
+        {"cantidad": 4.0, "tipo_movimiento_id": salida, "producto_id": test_producto.id, "ubicacion_origen_id": a},
+        {"cantidad": 1.0, "tipo_movimiento_id": salida, "producto_id": test_producto.id, "ubicacion_origen_id": a},
+        {"cantidad": 3.0, "tipo_movimiento_id": transferencia, "producto_id": test_producto.id,
+         "ubicacion_origen_id": a, "ubicacion_destino_id": b},
+        {"cantidad": 7.0, "tipo_movimiento_id": ninguno, "producto_id": test_producto.id},
+    ])
+    assert response.status_code == status.HTTP_200_OK
+    hoy = str(date.today())
+
+    def resumen():
+        db_session.expire_all()
+        return sorted(
+            (str(f.fecha), f.ubicacion_id, f.tipo_movimiento_id, f.entradas, f.salidas, f.movimientos)
+            for f in db_session.query(MovimientoDiario)
+        )
+
+    # Las dos salidas del lote en la misma fila; la transferencia en las dos
+    # ubicaciones, pero contada como movimiento solo en el destino
+    mantenido = resumen()
+    assert mantenido == sorted([
+        (hoy, a, entrada, 10.0, 0.0, 1), (hoy, a, salida, 0.0, 5.0, 2),
+        (hoy, a, transferencia, 0.0, 3.0, 0), (hoy, b, transferencia, 3.0, 0.0, 1),
+    ])
+
+    # Historial anterior al resumen, cargado directamente y rellenado con la reconstrucción
+    for dia, tipo, cantidad, origen, destino in ((1, entrada, 20.0, None, a), (1, entrada, 5.0, None, b), (3, salida, 2.0, a, None)):
+        db_session.add(MovimientoInventario(
+            fecha=datetime(2024, 1, dia, 12), cantidad=cantidad, tipo_movimiento_id=tipo, producto_id=test_producto.id,
+            ubicacion_origen_id=origen, ubicacion_destino_id=destino, usuario_id=test_user.id
+        ))
+    db_session.commit()
+
+    async def reconstruir():
+        async with AsyncSession(async_db_engine) as db:
+            await reconstruir_movimientos_diarios(db, date(2024, 1, 1), date.today())
+            await db.commit()
+
+    asyncio.run(reconstruir())
+    reconstruido = resumen()
+    # Lo mantenido al crear movimientos coincide con lo que se recalcula
+    assert [fila for fila in reconstruido if fila[0] == hoy] == mantenido
+    assert len(reconstruido) == len(mantenido) + 3
+
+    def series(**filtros):
+        query_counter.clear()
+        response = authorized_client.get("/movimientos/series", params=filtros)
+        assert response.status_code == status.HTTP_200_OK
+        # Solo se lee el resumen, nunca movimientos_inventario
+        assert not [q for q in query_counter if "movimientos_inventario" in q]
+        return [(s["fecha"], s["entradas"], s["salidas"], s["movimientos"]) for s in response.json()]
+
+    assert series(producto_id=test_producto.id) == [
+        ("2024-01-01", 25.0, 0.0, 2), ("2024-01-03", 0.0, 2.0, 1), (hoy, 13.0, 8.0, 4),
+    ]
+    assert series(ubicacion_id=a, fecha_desde=hoy) == [(hoy, 10.0, 8.0, 3)]
+    assert series(ubicacion_id=b) == [("2024-01-01", 5.0, 0.0, 1), (hoy, 3.0, 0.0, 1)]
+    assert series(tipo_movimiento_id=salida, fecha_desde="2024-01-02", fecha_hasta="2024-01-31") == [("2024-01-03", 0.0, 2.0, 1)]
+
+def test_delete_ubicacion_con_movimientos_de_destino(authorized_client, db_session, test_producto, test_ubicacion,
+                                                     test_tipo_movimiento, test_user):
+    from models import MovimientoInventario
+
+    db_session.add(MovimientoInventario(cantidad=1.0, tipo_movimiento_id=test_tipo_movimiento.id, producto_id=test_producto.id,
+                                        ubicacion_destino_id=test_ubicacion.id, usuario_id=test_user.id))
+    db_session.commit()
+
+    response = authorized_client.delete(f"/ubicaciones/{test_ubicacion.id}")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["detail"] == "No se puede eliminar la ubicación porque tiene movimientos de inventario asociados"
+
+    response = authorized_client.delete(f"/ubicaciones/{test_ubicacion.id}", params={"contar": True})
+    assert response.json()["detail"]["dependencias"] == {"stocks": 0, "movimientos": 1}
@@ -49,6 +49,13 @@ def test_read_productos(authorized_client, test_producto):
     assert len(data) > 0
     assert any(prod["codigo"] == test_producto.codigo for prod in data)
 
+def test_read_productos_matches_schema(authorized_client, test_producto):
+    from schemas.producto import ProductoStockResponse
+
+    response = authorized_client.get("/productos/")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == [ProductoStockResponse.model_validate(test_producto).model_dump(mode="json")]
+
 def test_read_producto_by_id(authorized_client, test_producto):
     response = authorized_client.get(f"/productos/{test_producto.id}")
     assert response.status_code == status.HTTP_200_OK
@@ -139,4 +146,376 @@ def test_producto_requires_auth(client):
             "categoria_id": 1
         }
     )
-    assert response.status_code == status.HTTP_401_UNAUTHORIZED 
\ No newline at end of file
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED 
+# Tests para el stock total mantenido
+def test_read_productos_includes_stock_total(authorized_client, query_counter, test_producto, test_stock):
+    authorized_client.get("/profile")
+    query_counter.clear()
+    response = authorized_client.get("/productos/")
+    assert response.status_code == status.HTTP_200_OK
+    assert "ETag" in response.headers
+    producto = next(p for p in response.json() if p["id"] == test_producto.id)
+    assert producto["stock_total"] == test_stock.cantidad
+    # Sin agregados por producto: las versiones y la consulta del listado
+    assert len([q for q in query_counter if "FROM productos" in q]) == 1
+    assert not [q for q in query_counter if "FROM stocks" in q]
+
+def test_stock_total_matches_sum_after_changes(authorized_client, db_session, async_db_engine, test_producto, test_ubicacion, test_stock):
+    import asyncio
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from models import TipoMovimiento, Ubicacion
+    from utils.stock import diferencias_stock_total
+
+    tipos = {}
+    for afecta_stock in ("entrada", "salida", "transferencia"):
+        tipo = TipoMovimiento(codigo=afecta_stock[:3].upper(), nombre=afecta_stock, afecta_stock=afecta_stock)
+        db_session.add(tipo)
+        db_session.commit()
+        tipos[afecta_stock] = tipo.id
+    otra = Ubicacion(nombre="Otra ubicación", tipo="tienda")
+    db_session.add(otra)
+    db_session.commit()
+
+    def movimiento(afecta_stock, cantidad, origen=None, destino=None):
+        return {"cantidad": cantidad, "tipo_movimiento_id": tipos[afecta_stock], "producto_id": test_producto.id,
+                "ubicacion_origen_id": origen, "ubicacion_destino_id": destino}
+
+    peticiones = [
+        ("post", "/movimientos/", movimiento("entrada", 15.0, destino=test_ubicacion.id)),
+        ("post", "/movimientos/", movimiento("salida", 7.5, origen=test_ubicacion.id)),
+        ("post", "/movimientos/", movimiento("transferencia", 20.0, origen=test_ubicacion.id, destino=otra.id)),
+        ("post", "/movimientos/", movimiento("salida", 1000.0, origen=test_ubicacion.id)),  # rechazada
+        ("post", "/movimientos/batch", [movimiento("entrada", 3.0, destino=otra.id), movimiento("salida", 1.0, origen=otra.id)]),
+        ("put", f"/stocks/{test_stock.id}", {"cantidad": 42.0}),
+    ]
+    for metodo, url, cuerpo in peticiones:
+        getattr(authorized_client, metodo)(url, json=cuerpo)
+
+    async def diferencias():
+        async with AsyncSession(async_db_engine) as db:
+            return await diferencias_stock_total(db)
+
+    assert asyncio.run(diferencias()) == []
+    response = authorized_client.get(f"/productos/{test_producto.id}")
+    assert response.json()["stock_total"] == 42.0 + 20.0 + 3.0 - 1.0
+
+    assert authorized_client.delete(f"/stocks/{test_stock.id}").status_code == status.HTTP_204_NO_CONTENT
+    assert asyncio.run(diferencias()) == []
+
+def test_diferencias_stock_total_detects_drift(db_session, async_db_engine, test_producto, test_stock):
+    import asyncio
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from utils.stock import diferencias_stock_total
+
+    # Un cambio hecho por fuera de las rutas descuadra el total
+    test_stock.cantidad += 5
+    db_session.commit()
+
+    async def diferencias():
+        async with AsyncSession(async_db_engine) as db:
+            return await diferencias_stock_total(db)
+
+    assert asyncio.run(diferencias()) == [{"producto_id": test_producto.id, "stock_total": 100.0, "suma": 105.0}]
+
+# Tests para la importación de productos desde CSV
+def test_import_productos_csv(authorized_client, db_session, query_counter, test_producto, test_categoria, test_proveedor):
+    from models import Producto
+
+    lineas = ["codigo,nombre,precio_venta,categoria,proveedor_id"]
+    lineas += [f"IMP{i:04d},Importado {i},{i}.5,{test_categoria.nombre},{test_proveedor.id}" for i in range(2500)]
+    lineas += [
+        f"{test_producto.codigo},Nombre nuevo,99,{test_categoria.nombre},",  # actualiza el existente
+        "IMP0001,Repetido,1,Categoría de Prueba,",
+        "SINCAT,Sin categoría,1,No existe,",
+        "MALPRECIO,Precio,abc,Categoría de Prueba,",
+        f"MALPROV,Proveedor,1,Categoría de Prueba,9999",
+    ]
+    response = authorized_client.post(
+        "/productos/import",
+        files={"archivo": ("catalogo.csv", "\n".join(lineas).encode(), "text/csv")}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["filas"] == 2505
+    assert data["importados"] == 2501
+    assert data["errores"] == [
+        {"fila": 2503, "detail": "Código repetido en el archivo"},
+        {"fila": 2504, "detail": "Categoría no encontrada: No existe"},
+        {"fila": 2505, "detail": "precio_venta: Input should be a valid number, unable to parse string as a number"},
+        {"fila": 2506, "detail": "Proveedor no encontrado"},
+    ]
+
+    db_session.expire_all()
+    assert db_session.query(Producto).filter(Producto.codigo.like("IMP%")).count() == 2500
+    importado = db_session.query(Producto).filter(Producto.codigo == "IMP0007").one()
+    assert (importado.precio_venta, importado.categoria_id, importado.activo, importado.stock_minimo) == (7.5, test_categoria.id, True, 0)
+    # Las columnas que no vienen en el CSV, o vienen vacías, se conservan
+    existente = db_session.query(Producto).filter(Producto.codigo == test_producto.codigo).one()
+    assert (existente.nombre, existente.precio_venta, existente.proveedor_id) == ("Nombre nuevo", 99.0, test_proveedor.id)
+    assert existente.descripcion == test_producto.descripcion
+
+    # Una sentencia por bloque y por búsqueda, no por fila (también al indexar
+    # los tokens); el último bloque tiene además filas sin proveedor_id
+    escrituras = [s for s in query_counter if s.startswith("INSERT INTO productos")]
+    assert len(escrituras) == 4
+    assert len([s for s in query_counter if s.startswith("INSERT INTO producto_tokens")]) == 3
+    assert len(query_counter) < 30
+
+def test_import_productos_empty_cells_keep_values(authorized_client, db_session, test_producto, test_categoria):
+    from models import Producto
+
+    test_producto.activo = False
+    db_session.commit()
+    lineas = [
+        "codigo,nombre,categoria_id,precio_compra,stock_minimo,activo",
+        f"{test_producto.codigo},Nuevo,{test_categoria.id},,,",
+        f"NUEVO,Nuevo,{test_categoria.id},,,",
+    ]
+    response = authorized_client.post(
+        "/productos/import",
+        files={"archivo": ("catalogo.csv", "\n".join(lineas).encode(), "text/csv")}
+    )
+    assert response.json() == {"filas": 2, "importados": 2, "errores": []}
+
+    db_session.expire_all()
+    existente = db_session.query(Producto).filter(Producto.codigo == test_producto.codigo).one()
+    assert (existente.nombre, existente.precio_compra, existente.stock_minimo, existente.activo) == ("Nuevo", 10.0, 5, False)
+    # Un código nuevo sí toma los valores por defecto
+    nuevo = db_session.query(Producto).filter(Producto.codigo == "NUEVO").one()
+    assert (nuevo.precio_compra, nuevo.stock_minimo, nuevo.activo) == (None, 0, True)
+
+def test_import_productos_without_valid_rows_keeps_versions(authorized_client, db_session, test_producto, test_categoria):
+    from models import CatalogoVersion
+
+    def version():
+        db_session.expire_all()
+        return {v.tabla: v.version for v in db_session.query(CatalogoVersion)}
+
+    antes = version()
+    etag = authorized_client.get("/productos/").headers["ETag"]
+    # Ninguna fila válida: no cambia ninguna versión
+    response = authorized_client.post(
+        "/productos/import",
+        files={"archivo": ("catalogo.csv", b"codigo,nombre,categoria_id,precio_compra\nX,Sin categoria,9999,1\n", "text/csv")}
+    )
+    assert response.json()["importados"] == 0
+    assert version() == antes
+    assert authorized_client.get("/productos/", headers={"If-None-Match": etag}).status_code == status.HTTP_304_NOT_MODIFIED
+
+    # Reescribir la misma categoría, dejar vacío el precio o dar de alta un
+    # código nuevo no cuenta como cambio de precios; cambiar el precio, sí
+    def importar(*lineas):
+        csv_texto = "\n".join(["codigo,nombre,categoria_id,precio_compra", *lineas])
+        response = authorized_client.post("/productos/import", files={"archivo": ("catalogo.csv", csv_texto.encode(), "text/csv")})
+        assert response.json()["errores"] == []
+        return version()
+
+    despues = importar(f"{test_producto.codigo},Otro,{test_categoria.id},", f"NUEVO,Nuevo,{test_categoria.id},5")
+    assert despues["productos"] == antes.get("productos", 0) + 1
+    assert despues.get("precios", 0) == antes.get("precios", 0)
+    assert importar(f"{test_producto.codigo},Otro,{test_categoria.id},10").get("precios", 0) == antes.get("precios", 0)
+    assert importar(f"{test_producto.codigo},Otro,{test_categoria.id},12").get("precios", 0) == antes.get("precios", 0) + 1
+
+def test_import_productos_missing_columns(authorized_client):
+    response = authorized_client.post(
+        "/productos/import",
+        files={"archivo": ("catalogo.csv", b"codigo,precio_venta\nX,1\n", "text/csv")}
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["detail"] == "Faltan columnas en el CSV: nombre, categoria_id"
+
+def test_read_productos_etag_follows_stock(authorized_client, query_counter, test_producto, test_ubicacion, test_tipo_movimiento):
+    etag = authorized_client.get("/productos/").headers["ETag"]
+    assert authorized_client.get("/productos/", headers={"If-None-Match": etag}).status_code == status.HTTP_304_NOT_MODIFIED
+    detalle = authorized_client.get(f"/productos/{test_producto.id}").headers["ETag"]
+
+    # Un movimiento no cambia la versión de productos, pero sí la de las
+    # existencias, así que el listado se vuelve a enviar con el stock nuevo
+    query_counter.clear()
+    authorized_client.post("/movimientos/", json={
+        "cantidad": 5.0, "tipo_movimiento_id": test_tipo_movimiento.id, "producto_id": test_producto.id,
+        "ubicacion_destino_id": test_ubicacion.id
+    })
+    assert not [q for q in query_counter if "catalogo_versiones" in q and "'productos'" in q]
+    response = authorized_client.get("/productos/", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()[0]["stock_total"] == test_producto.stock_total + 5.0
+    assert response.headers["ETag"].startswith(etag.split("-")[0] + "-")
+
+    # El detalle incluye stock_total, así que su ETag sí cambia
+    response = authorized_client.get(f"/productos/{test_producto.id}", headers={"If-None-Match": detalle})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["stock_total"] == test_producto.stock_total + 5.0
+    assert authorized_client.get(f"/productos/{test_producto.id}", headers={"If-None-Match": response.headers["ETag"]}).status_code \
+        == status.HTTP_304_NOT_MODIFIED
+
+    # El detalle incluye la categoría: cambiarla invalida su ETag
+    etag = authorized_client.get(f"/productos/{test_producto.id}").headers["ETag"]
+    authorized_client.put(f"/categorias/{test_producto.categoria_id}", json={"nombre": "Renombrada"})
+    response = authorized_client.get(f"/productos/{test_producto.id}", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["categoria"]["nombre"] == "Renombrada"
+
+    # Un producto que no existe no tiene ETag, ni siquiera con If-None-Match: *
+    response = authorized_client.get("/productos/999999", headers={"If-None-Match": "*"})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert "ETag" not in response.headers
+
+# Tests para la búsqueda de productos
+def test_search_productos(authorized_client, test_categoria):
+    for codigo, nombre in [
+        ("TOR-38", "Tornillo 3/8 acero"),
+        ("TOR-12", "Tornillo 1/2 acero"),
+        ("TUE-38", "Tuerca 3/8"),
+        ("TORNO", "Torno de banco"),
+        ("CAN-01", "Canción de ejemplo"),
+    ]:
+        response = authorized_client.post("/productos/", json={"codigo": codigo, "nombre": nombre, "categoria_id": test_categoria.id})
+        assert response.status_code == status.HTTP_200_OK
+
+    def buscar(q, **params):
+        response = authorized_client.get("/productos/search", params={"q": q, **params})
+        assert response.status_code == status.HTTP_200_OK
+        return [p["codigo"] for p in response.json()]
+
+    assert buscar("tornillo 3/8") == ["TOR-38"]
+    assert buscar("3/8") == ["TOR-38", "TUE-38"]
+    # Prefijos, sin distinguir mayúsculas ni acentos
+    assert buscar("TORN") == ["TOR-12", "TOR-38", "TORNO"]
+    assert buscar("torno") == ["TORNO"]
+    assert buscar("cancion") == ["CAN-01"]
+    assert buscar("tor", limit=2) == ["TOR-12", "TOR-38"]
+    # El código exacto va primero
+    assert buscar("TOR-38")[0] == "TOR-38"
+    assert buscar("--") == []
+    assert buscar("perno") == []
+
+def test_search_productos_follows_changes(authorized_client, test_categoria):
+    producto_id = authorized_client.post(
+        "/productos/", json={"codigo": "ARA-01", "nombre": "Arandela", "categoria_id": test_categoria.id}
+    ).json()["id"]
+
+    authorized_client.put(f"/productos/{producto_id}", json={"nombre": "Abrazadera"})
+    assert authorized_client.get("/productos/search", params={"q": "arandela"}).json() == []
+    assert [p["id"] for p in authorized_client.get("/productos/search", params={"q": "abraz"}).json()] == [producto_id]
+
+    authorized_client.post("/productos/import", files={"archivo": ("c.csv", f"codigo,nombre,categoria_id\nARA-01,Brida,{test_categoria.id}\n".encode())})
+    assert [p["id"] for p in authorized_client.get("/productos/search", params={"q": "brida"}).json()] == [producto_id]
+
+    assert authorized_client.delete(f"/productos/{producto_id}").status_code == status.HTTP_204_NO_CONTENT
+    assert authorized_client.get("/productos/search", params={"q": "brida"}).json() == []
+
+# Tests para el kardex
+def test_read_kardex(authorized_client, db_session, test_producto, test_ubicacion, test_user):
+    import csv
+    import io
+    import json
+    from datetime import datetime
+    from models import MovimientoInventario, TipoMovimiento, Ubicacion
+
+    tipos = {}
+    for afecta_stock in ("entrada", "salida", "transferencia", "ninguno"):
+        tipo = TipoMovimiento(codigo=afecta_stock[:3].upper(), nombre=afecta_stock, afecta_stock=afecta_stock)
+        db_session.add(tipo)
+        db_session.flush()
+        tipos[afecta_stock] = tipo.id
+    tienda = Ubicacion(nombre="Tienda", tipo="tienda")
+    db_session.add(tienda)
+    db_session.flush()
+    a, b = test_ubicacion.id, tienda.id
+
+    for fecha, afecta_stock, cantidad, origen, destino, referencia in (
+        (datetime(2024, 1, 1), "entrada", 10.0, None, a, "DOC-1"),
+        (datetime(2024, 1, 2), "salida", 3.0, a, None, "DOC-2"),
+        (datetime(2024, 1, 3), "transferencia", 2.0, a, b, "DOC-3"),
+        (datetime(2024, 1, 4), "ninguno", 1.0, a, None, "DOC-4"),
+        (datetime(2024, 1, 5), "entrada", 5.0, None, b, "DOC-5"),
+        (datetime(2024, 1, 5, 14, 30), "ninguno", 4.0, a, b, "NOT-5"),
+    ):
+        db_session.add(MovimientoInventario(
+            fecha=fecha, cantidad=cantidad, tipo_movimiento_id=tipos[afecta_stock],
+            producto_id=test_producto.id, ubicacion_origen_id=origen, ubicacion_destino_id=destino,
+            usuario_id=test_user.id, referencia=referencia
+        ))
+    db_session.commit()
+
+    def kardex(**params):
+        response = authorized_client.get(f"/productos/{test_producto.id}/kardex", params={"format": "ndjson", **params})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        filas = [json.loads(linea) for linea in response.text.splitlines()]
+        return [(f["ubicacion_id"], f["referencia"], f["entrada"], f["salida"], f["saldo"]) for f in filas]
+
+    # Un saldo por ubicación; la transferencia sale de una y entra en la otra
+    # y un movimiento que no mueve stock aparece una vez (en su destino si tiene)
+    assert kardex() == [
+        (a, "DOC-1", 10.0, 0, 10.0), (a, "DOC-2", 0, 3.0, 7.0), (a, "DOC-3", 0, 2.0, 5.0), (a, "DOC-4", 0, 0, 5.0),
+        (b, "DOC-3", 2.0, 0, 2.0), (b, "DOC-5", 5.0, 0, 7.0), (b, "NOT-5", 0, 0, 7.0),
+    ]
+    # Desde una fecha, el saldo sigue partiendo de todo el historial
+    assert kardex(fecha_desde="2024-01-03T00:00:00", ubicacion_id=a) == [(a, "DOC-3", 0, 2.0, 5.0), (a, "DOC-4", 0, 0, 5.0)]
+    assert kardex(fecha_hasta="2024-01-04T00:00:00", ubicacion_id=b) == [(b, "DOC-3", 2.0, 0, 2.0)]
+    # Una fecha sin hora incluye todo ese día; con hora, hasta ese instante
+    assert kardex(fecha_hasta="2024-01-05", ubicacion_id=b) == [
+        (b, "DOC-3", 2.0, 0, 2.0), (b, "DOC-5", 5.0, 0, 7.0), (b, "NOT-5", 0, 0, 7.0),
+    ]
+    assert kardex(fecha_hasta="2024-01-05T00:00:00", ubicacion_id=b) == [(b, "DOC-3", 2.0, 0, 2.0), (b, "DOC-5", 5.0, 0, 7.0)]
+    assert authorized_client.get(
+        f"/productos/{test_producto.id}/kardex", params={"fecha_hasta": "2024-13-01"}
+    ).status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    response = authorized_client.get(f"/productos/{test_producto.id}/kardex", params={"ubicacion_id": b})
+    assert response.headers["content-type"].startswith("text/csv")
+    filas = list(csv.DictReader(io.StringIO(response.text)))
+    assert [(f["ubicacion"], f["tipo_movimiento"], float(f["saldo"])) for f in filas] == [
+        ("Tienda", "TRA", 2.0), ("Tienda", "ENT", 7.0), ("Tienda", "NIN", 7.0),
+    ]
+
+    assert authorized_client.get("/productos/999999/kardex").status_code == status.HTTP_404_NOT_FOUND
+
+def test_delete_producto_con_stock_cuenta_dependencias(authorized_client, test_producto, test_stock):
+    response = authorized_client.delete(f"/productos/{test_producto.id}", params={"contar": True})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["detail"] == {
+        "mensaje": "No se puede eliminar el producto porque tiene stock asociado",
+        "dependencias": {"stocks": 1, "movimientos": 0},
+    }
+
+def test_delete_producto_con_historial_no_carga_movimientos(authorized_client, db_session, query_counter,
+                                                           test_producto, test_tipo_movimiento, test_user):
+    import time
+    import tracemalloc
+    from datetime import datetime, timedelta
+    from models import MovimientoInventario
+
+    filas = 100_000
+    with db_session.bind.begin() as conn:
+        for inicio in range(0, filas, 20_000):
+            conn.execute(MovimientoInventario.__table__.insert(), [
+                {"fecha": datetime(2024, 1, 1) + timedelta(seconds=i), "cantidad": 1.0,
+                 "tipo_movimiento_id": test_tipo_movimiento.id, "producto_id": test_producto.id,
+                 "usuario_id": test_user.id}
+                for i in range(inicio, inicio + 20_000)
+            ])
+
+    query_counter.clear()
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        response = authorized_client.delete(f"/productos/{test_producto.id}")
+        elapsed = time.perf_counter() - start
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["detail"] == "No se puede eliminar el producto porque tiene movimientos de inventario asociados"
+    # Un EXISTS por dependencia y ninguna carga de la colección
+    assert not [q for q in query_counter if q.startswith("SELECT movimientos_inventario.")]
+    assert len([q for q in query_counter if "EXISTS" in q]) == 1
+    # Cargar 100.000 movimientos como objetos ORM pasaba de 100 MB y varios segundos
+    assert pico < 5 * 2 ** 20, pico
+    assert elapsed < 1.0, elapsed
+
+    response = authorized_client.delete(f"/productos/{test_producto.id}", params={"contar": True})
+    assert response.json()["detail"]["dependencias"] == {"stocks": 0, "movimientos": filas}
@@ -0,0 +1,57 @@
+import pytest
+
+# Tests para los índices de las consultas de listado
+def _plan_de_consulta(client, db_engine, async_db_engine, url, tabla):
+    """Ejecuta la petición y devuelve el EXPLAIN QUERY PLAN de su consulta sobre ``tabla``."""
+    from sqlalchemy import event
+
+    capturadas = []
+
+    def capturar(conn, cursor, statement, parameters, context, executemany):
+        if f"FROM {tabla} " in statement:
+            capturadas.append((statement, parameters))
+
+    event.listen(async_db_engine.sync_engine, "before_cursor_execute", capturar)
+    try:
+        assert client.get(url).status_code == 200
+    finally:
+        event.remove(async_db_engine.sync_engine, "before_cursor_execute", capturar)
+
+    statement, parameters = capturadas[-1]
+    with db_engine.connect() as conn:
+        filas = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    return " | ".join(fila[-1] for fila in filas)
+
+@pytest.mark.parametrize("filtro, indice", [
+    ("producto_id=1", "ix_movimientos_inventario_producto_fecha"),
+    ("tipo_movimiento_id=1", "ix_movimientos_inventario_tipo_fecha"),
+    ("", "ix_movimientos_inventario_fecha_id"),
+])
+def test_read_movimientos_uses_index(authorized_client, db_engine, async_db_engine, filtro, indice):
+    plan = _plan_de_consulta(
+        authorized_client, db_engine, async_db_engine, f"/movimientos/?{filtro}", "movimientos_inventario"
+    )
+    assert indice in plan
+    # El orden sale del índice, sin ordenar en memoria
+    assert "TEMP B-TREE" not in plan
+
+def test_read_stocks_by_ubicacion_uses_index(authorized_client, db_engine, async_db_engine):
+    plan = _plan_de_consulta(authorized_client, db_engine, async_db_engine, "/stocks/?ubicacion_id=1", "stocks")
+    assert "ix_stocks_ubicacion_id" in plan
+
+def test_search_productos_uses_token_range(authorized_client, db_engine, async_db_engine):
+    plan = _plan_de_consulta(authorized_client, db_engine, async_db_engine, "/productos/search?q=torn", "producto_tokens")
+    # Un rango sobre la clave primaria (token, producto_id), no un recorrido completo
+    assert "INDEX sqlite_autoindex_producto_tokens_1 (token>? AND token<?)" in plan
+
+def test_read_bajo_minimo_uses_index(authorized_client, db_engine, async_db_engine):
+    plan = _plan_de_consulta(authorized_client, db_engine, async_db_engine, "/reportes/bajo-minimo", "productos")
+    # Rango sobre stock_minimo > 0 sin recorrer todo el catálogo
+    assert "ix_productos_stock_minimo (stock_minimo>?)" in plan
+
+def test_kardex_uses_producto_index(authorized_client, db_session, db_engine, async_db_engine, test_producto):
+    plan = _plan_de_consulta(
+        authorized_client, db_engine, async_db_engine, f"/productos/{test_producto.id}/kardex", "movimientos_inventario"
+    )
+    # Los dos tramos (origen y destino) entran por el índice del producto
+    assert plan.count("ix_movimientos_inventario_producto_fecha") == 2
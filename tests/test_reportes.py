@@ -0,0 +1,111 @@
+import pytest
+from fastapi import status
+
+# Tests para el informe de productos bajo mínimo
+def test_read_bajo_minimo(authorized_client, db_session, query_counter, test_producto, test_categoria, test_ubicacion):
+    from models import Categoria, Producto
+
+    otra = Categoria(nombre="Otra categoría")
+    db_session.add(otra)
+    db_session.flush()
+    productos = {}
+    for codigo, minimo, categoria_id in (("SUF", 3, test_categoria.id), ("SINMIN", 0, test_categoria.id), ("OTRA", 8, otra.id)):
+        productos[codigo] = Producto(codigo=codigo, nombre=codigo, stock_minimo=minimo, categoria_id=categoria_id)
+        db_session.add(productos[codigo])
+    db_session.commit()
+
+    # Las existencias se dan de alta por la API para que stock_total se mantenga
+    for codigo, cantidad in (("SUF", 10.0), ("OTRA", 2.0), ("PROD001", 1.0)):
+        producto_id = test_producto.id if codigo == "PROD001" else productos[codigo].id
+        response = authorized_client.post("/stocks/", json={
+            "producto_id": producto_id, "ubicacion_id": test_ubicacion.id, "cantidad": cantidad
+        })
+        assert response.status_code == status.HTTP_200_OK
+
+    query_counter.clear()
+    response = authorized_client.get("/reportes/bajo-minimo")
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    # Primero el que más se aleja del mínimo
+    assert [(p["codigo"], p["stock_total"], p["faltante"]) for p in data] == [("OTRA", 2.0, 6.0), ("PROD001", 1.0, 4.0)]
+    assert len([s for s in query_counter if "token_blacklist" not in s and "users.username = " not in s]) == 1
+
+    response = authorized_client.get(f"/reportes/bajo-minimo?categoria_id={test_categoria.id}")
+    assert [p["codigo"] for p in response.json()] == ["PROD001"]
+    response = authorized_client.get(f"/reportes/bajo-minimo?proveedor_id={test_producto.proveedor_id}")
+    assert [p["codigo"] for p in response.json()] == ["PROD001"]
+
+# Tests para el informe de valoración
+def test_read_valoracion(authorized_client, db_session, query_counter, test_producto, test_categoria, test_ubicacion,
+                         test_tipo_movimiento):
+    from models import CatalogoVersion, Producto, Ubicacion
+    from utils.stock import STOCK_VERSION_SHARDS
+
+    def versiones_stock():
+        db_session.expire_all()
+        return {v.tabla: v.version for v in db_session.query(CatalogoVersion) if v.tabla.startswith("stocks.")}
+
+    tienda = Ubicacion(nombre="Tienda", tipo="tienda")
+    sin_precio = Producto(codigo="SINPRECIO", nombre="Sin precio", categoria_id=test_categoria.id)
+    db_session.add_all([tienda, sin_precio])
+    db_session.commit()
+    for producto_id, ubicacion_id, cantidad in (
+        (test_producto.id, test_ubicacion.id, 4.0), (test_producto.id, tienda.id, 1.0), (sin_precio.id, tienda.id, 3.0)
+    ):
+        response = authorized_client.post("/stocks/", json={
+            "producto_id": producto_id, "ubicacion_id": ubicacion_id, "cantidad": cantidad
+        })
+        assert response.status_code == status.HTTP_200_OK
+
+    def valoracion():
+        query_counter.clear()
+        response = authorized_client.get("/reportes/valoracion")
+        assert response.status_code == status.HTTP_200_OK
+        agregadas = [s for s in query_counter if "sum(" in s and "FROM stocks" in s]
+        return [(v["ubicacion"], v["cantidad"], v["valor"]) for v in response.json()], len(agregadas), response.headers["ETag"]
+
+    # precio_compra de test_producto: 10
+    filas, agregadas, etag = valoracion()
+    assert filas == [("Tienda", 4.0, 10.0), (test_ubicacion.nombre, 4.0, 40.0)]
+    assert agregadas == 1
+
+    # Sin cambios se sirve de la caché, o con 304 si el cliente ya la tiene
+    assert valoracion()[1:] == (0, etag)
+    response = authorized_client.get("/reportes/valoracion", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    # Un cambio de nombre no afecta a la valoración
+    response = authorized_client.put(f"/productos/{test_producto.id}", json={"nombre": "Otro nombre"})
+    assert response.status_code == status.HTTP_200_OK
+    assert valoracion()[1:] == (0, etag)
+
+    # Un cambio de precio, sí
+    response = authorized_client.put(f"/productos/{test_producto.id}", json={"precio_compra": 20.0})
+    assert response.status_code == status.HTTP_200_OK
+    filas, agregadas, nueva = valoracion()
+    assert filas == [("Tienda", 4.0, 20.0), (test_ubicacion.nombre, 4.0, 80.0)]
+    assert agregadas == 1
+    assert nueva != etag
+
+    # Y un cambio de existencias, que solo incrementa la versión de su producto
+    antes = versiones_stock()
+    response = authorized_client.post("/stocks/", json={
+        "producto_id": sin_precio.id, "ubicacion_id": test_ubicacion.id, "cantidad": 2.0
+    })
+    assert response.status_code == status.HTTP_200_OK
+    fila = f"stocks.{sin_precio.id % STOCK_VERSION_SHARDS}"
+    assert versiones_stock() == {**antes, fila: antes.get(fila, 0) + 1}
+    filas, agregadas, _ = valoracion()
+    assert filas == [("Tienda", 4.0, 20.0), (test_ubicacion.nombre, 6.0, 80.0)]
+    assert agregadas == 1
+
+    # Lo mismo con un movimiento
+    response = authorized_client.post("/movimientos/", json={
+        "cantidad": 1.0, "tipo_movimiento_id": test_tipo_movimiento.id, "producto_id": test_producto.id,
+        "ubicacion_destino_id": tienda.id
+    })
+    assert response.status_code == status.HTTP_200_OK
+    filas, agregadas, _ = valoracion()
+    assert filas == [("Tienda", 5.0, 40.0), (test_ubicacion.nombre, 6.0, 80.0)]
+    assert agregadas == 1
+    assert valoracion()[1] == 0
@@ -0,0 +1,187 @@
+import pytest
+from fastapi import status
+
+# Tests para el número de consultas del listado de stocks
+def test_read_stocks_query_count_is_constant(authorized_client, db_session, query_counter, test_producto, test_stock):
+    from models import Stock, Ubicacion
+
+    query_counter.clear()
+    response = authorized_client.get("/stocks/")
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()) == 1
+    pocas = len([s for s in query_counter if "token_blacklist" not in s and "users.username = " not in s])
+
+    for i in range(20):
+        ubicacion = Ubicacion(nombre=f"Ubicación {i}", tipo="almacén")
+        db_session.add(ubicacion)
+        db_session.flush()
+        db_session.add(Stock(producto_id=test_producto.id, ubicacion_id=ubicacion.id, cantidad=i))
+    db_session.commit()
+
+    query_counter.clear()
+    response = authorized_client.get("/stocks/")
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert len(data) == 21
+    assert all(stock["producto"] and stock["ubicacion"] for stock in data)
+    assert len([s for s in query_counter if "token_blacklist" not in s and "users.username = " not in s]) == pocas == 1
+
+# Tests para las existencias en una fecha pasada
+def test_read_stocks_at(authorized_client, db_session, async_db_engine, test_producto, test_ubicacion, test_user):
+    import asyncio
+    from datetime import datetime
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from models import MovimientoInventario, Stock, TipoMovimiento, Ubicacion
+    from utils.stock import tomar_snapshot
+
+    tipos = {}
+    for afecta_stock in ("entrada", "salida", "transferencia"):
+        tipo = TipoMovimiento(codigo=afecta_stock[:3].upper(), nombre=afecta_stock, afecta_stock=afecta_stock)
+        db_session.add(tipo)
+        db_session.flush()
+        tipos[afecta_stock] = tipo.id
+    tienda = Ubicacion(nombre="Tienda", tipo="tienda")
+    db_session.add(tienda)
+    db_session.flush()
+    a, b = test_ubicacion.id, tienda.id
+
+    def movimiento(dia, afecta_stock, cantidad, origen=None, destino=None):
+        db_session.add(MovimientoInventario(
+            fecha=datetime(2024, 1, dia), cantidad=cantidad, tipo_movimiento_id=tipos[afecta_stock],
+            producto_id=test_producto.id, ubicacion_origen_id=origen, ubicacion_destino_id=destino,
+            usuario_id=test_user.id
+        ))
+
+    movimiento(1, "entrada", 10.0, destino=a)
+    movimiento(5, "salida", 3.0, origen=a)
+    movimiento(12, "transferencia", 2.0, origen=a, destino=b)
+    movimiento(20, "entrada", 5.0, destino=b)
+    # La copia refleja un ajuste manual (100 en lugar de 7): si la respuesta
+    # parte de ella, los movimientos anteriores no se vuelven a sumar
+    db_session.add(Stock(producto_id=test_producto.id, ubicacion_id=a, cantidad=100.0))
+    db_session.commit()
+
+    async def copiar():
+        async with AsyncSession(async_db_engine) as db:
+            await tomar_snapshot(db, datetime(2024, 1, 10))
+            await db.commit()
+
+    asyncio.run(copiar())
+
+    def existencias(fecha, **filtros):
+        response = authorized_client.get("/stocks/at", params={"fecha": fecha, **filtros})
+        assert response.status_code == status.HTTP_200_OK
+        return response.headers.get("X-Stock-Snapshot"), {s["ubicacion_id"]: s["cantidad"] for s in response.json()}
+
+    # Antes de la primera copia se reconstruye desde el primer movimiento
+    assert existencias("2024-01-03T00:00:00") == (None, {a: 10.0})
+    assert existencias("2024-01-15T00:00:00") == ("2024-01-10T00:00:00", {a: 98.0, b: 2.0})
+    assert existencias("2024-01-25T00:00:00") == ("2024-01-10T00:00:00", {a: 98.0, b: 7.0})
+    assert existencias("2024-01-25T00:00:00", ubicacion_id=b)[1] == {b: 7.0}
+
+def test_read_stocks_at_ignores_direct_edits_until_next_snapshot(authorized_client, async_db_engine, test_producto, test_ubicacion):
+    import asyncio
+    from datetime import datetime, timedelta
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from utils.stock import tomar_snapshot
+
+    response = authorized_client.post("/stocks/", json={
+        "producto_id": test_producto.id, "ubicacion_id": test_ubicacion.id, "cantidad": 5.0
+    })
+    stock_id = response.json()["id"]
+
+    async def copiar(fecha):
+        async with AsyncSession(async_db_engine) as db:
+            await tomar_snapshot(db, fecha)
+            await db.commit()
+
+    inicio = datetime.now()
+    asyncio.run(copiar(inicio))
+    assert authorized_client.put(f"/stocks/{stock_id}", json={"cantidad": 8.0}).status_code == status.HTTP_200_OK
+
+    def existencias(fecha):
+        response = authorized_client.get("/stocks/at", params={"fecha": fecha.isoformat()})
+        return {s["ubicacion_id"]: s["cantidad"] for s in response.json()}
+
+    # El ajuste directo no es un movimiento: no se ve hasta la siguiente copia
+    assert existencias(inicio + timedelta(minutes=1)) == {test_ubicacion.id: 5.0}
+    asyncio.run(copiar(inicio + timedelta(minutes=2)))
+    assert existencias(inicio + timedelta(minutes=3)) == {test_ubicacion.id: 8.0}
+
+def test_delete_producto_y_ubicacion_con_snapshots(authorized_client, db_session, async_db_engine, test_producto, test_ubicacion):
+    import asyncio
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from models import Producto, StockSnapshot, Ubicacion
+    from utils.stock import tomar_snapshot
+
+    otra = Ubicacion(nombre="Otra", tipo="tienda")
+    otro = Producto(codigo="OTRO", nombre="Otro", categoria_id=test_producto.categoria_id)
+    db_session.add_all([otra, otro])
+    db_session.commit()
+
+    # Existencias dadas de alta y de baja por /stocks, con una copia entre medias
+    stocks = []
+    for producto_id, ubicacion_id in ((test_producto.id, otra.id), (otro.id, test_ubicacion.id)):
+        response = authorized_client.post("/stocks/", json={
+            "producto_id": producto_id, "ubicacion_id": ubicacion_id, "cantidad": 5.0
+        })
+        assert response.status_code == status.HTTP_200_OK
+        stocks.append(response.json()["id"])
+
+    async def copiar():
+        async with AsyncSession(async_db_engine) as db:
+            await tomar_snapshot(db)
+            await db.commit()
+
+    asyncio.run(copiar())
+    for stock_id in stocks:
+        assert authorized_client.delete(f"/stocks/{stock_id}").status_code == status.HTTP_204_NO_CONTENT
+
+    def copias():
+        db_session.expire_all()
+        return [(c.producto_id, c.ubicacion_id) for c in db_session.query(StockSnapshot)]
+
+    # Las copias no impiden el borrado ni quedan apuntando a filas que no existen
+    assert authorized_client.delete(f"/productos/{test_producto.id}").status_code == status.HTTP_204_NO_CONTENT
+    assert copias() == [(otro.id, test_ubicacion.id)]
+    assert authorized_client.delete(f"/ubicaciones/{test_ubicacion.id}").status_code == status.HTTP_204_NO_CONTENT
+    assert copias() == []
+
+def test_stock_snapshot_job_takes_overdue_copy_at_startup(db_session, async_db_engine, monkeypatch, test_stock):
+    import asyncio
+    from datetime import datetime, timedelta
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    from jobs import stock_snapshot
+    from models import StockSnapshot
+
+    monkeypatch.setattr(stock_snapshot, "AsyncSessionLocal", async_sessionmaker(async_db_engine, expire_on_commit=False))
+
+    def copias_tras_arrancar(ultima):
+        db_session.query(StockSnapshot).delete()
+        db_session.add(StockSnapshot(fecha=ultima, producto_id=test_stock.producto_id,
+                                     ubicacion_id=test_stock.ubicacion_id, cantidad=1.0))
+        db_session.commit()
+
+        async def arrancar():
+            tarea = asyncio.create_task(stock_snapshot.run_periodically(startup_delay=0))
+            await asyncio.sleep(0.3)
+            tarea.cancel()
+
+        asyncio.run(arrancar())
+        db_session.expire_all()
+        return db_session.query(StockSnapshot).count()
+
+    # La última copia ya tiene más de un intervalo: se toma otra sin esperarlo
+    assert copias_tras_arrancar(datetime.now() - timedelta(days=2)) == 2
+    # Si es reciente, el arranque no adelanta la siguiente
+    assert copias_tras_arrancar(datetime.now() - timedelta(hours=1)) == 1
+
+def test_read_stocks_at_requires_fecha(authorized_client, test_stock):
+    assert authorized_client.get("/stocks/at").status_code == 422
+    # /stocks/{id} sigue funcionando
+    assert authorized_client.get(f"/stocks/{test_stock.id}").status_code == status.HTTP_200_OK
+
+def test_read_stocks_matches_detail_schema(authorized_client, test_stock):
+    response = authorized_client.get("/stocks/")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == [authorized_client.get(f"/stocks/{test_stock.id}").json()]
@@ -1,38 +1,74 @@
+from dataclasses import dataclass
+
 from fastapi import Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 from fastapi.security import OAuth2PasswordBearer
 
-from config.database import get_db
+from config.database import get_async_db
 from models.user import User as UserModel
+from utils.cache import TTLCache
 from utils.utils import decode_access_token, is_token_blacklisted
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+# Un cambio de rol hecho en otro proceso tarda como mucho esto en verse aquí
+PRINCIPAL_CACHE_TTL_SECONDS = 30
+PRINCIPAL_CACHE_SIZE = 10_000
+
+@dataclass(frozen=True)
+class Principal:
+    """Usuario autenticado: solo lo que necesitan los handlers, sin sesión ORM."""
+    id: int
+    username: str
+    role: str
+
+principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL_SECONDS)
+
+def invalidate_principal(username: Optional[str]):
+    principal_cache.pop(username)
+
+@event.listens_for(UserModel, "after_update")
+@event.listens_for(UserModel, "after_delete")
+def _invalidate_changed_user(mapper, connection, target):
+    # Cubre cualquier ruta que modifique usuarios a través del ORM
+    invalidate_principal(target.username)
+    history = inspect(target).attrs.username.history
+    for old_username in history.deleted or ():
+        invalidate_principal(old_username)
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> Principal:
     payload = decode_access_token(token)
-    if payload is None or is_token_blacklisted(token, db):
+    if payload is None or await is_token_blacklisted(token, db, payload):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    user = db.query(UserModel).filter(UserModel.username == payload["sub"]).first()
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
+    principal = principal_cache.get(payload["sub"])
+    if principal is None:
+        result = await db.execute(
+            select(UserModel.id, UserModel.username, UserModel.role).where(UserModel.username == payload["sub"])
         )
-    return user
+        row = result.first()
+        if row is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid authentication credentials",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        principal = Principal(id=row.id, username=row.username, role=row.role)
+        principal_cache.set(principal.username, principal)
+    return principal
 
-def get_current_active_user(current_user: UserModel = Depends(get_current_user)):
+def get_current_active_user(current_user: Principal = Depends(get_current_user)):
     return current_user
 
-def get_admin_user(current_user: UserModel = Depends(get_current_user)):
+def get_admin_user(current_user: Principal = Depends(get_current_user)):
     if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="The user doesn't have enough privileges",
         )
-    return current_user 
\ No newline at end of file
+    return current_user
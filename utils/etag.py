@@ -0,0 +1,83 @@
+from typing import Dict, Optional, Sequence
+
+from fastapi import Depends, Header, HTTPException, Response, status
+from sqlalchemy import select
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config.database import get_async_db
+from models.catalogo_version import CatalogoVersion as CatalogoVersionModel
+from utils.auth import Principal, get_current_active_user
+
+async def registrar_cambio(db: AsyncSession, *tablas: str):
+    """Incrementa la versión de ``tablas`` dentro de la transacción en curso.
+
+    Conviene llamarla al final de la transacción: la fila de versión es la
+    misma para todas las escrituras de la tabla y queda bloqueada hasta el
+    commit. Al confirmarse junto con el cambio, nadie ve la versión nueva con
+    los datos viejos.
+    """
+    filas = [{"tabla": tabla, "version": 1} for tabla in sorted(set(tablas))]
+    if db.bind.dialect.name == "mysql":
+        stmt = mysql.insert(CatalogoVersionModel).values(filas)
+        stmt = stmt.on_duplicate_key_update(version=CatalogoVersionModel.version + 1)
+    else:
+        stmt = sqlite.insert(CatalogoVersionModel).values(filas)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CatalogoVersionModel.tabla],
+            set_={"version": CatalogoVersionModel.version + 1},
+        )
+    await db.execute(stmt)
+
+async def versiones(db: AsyncSession, *tablas: str) -> Dict[str, int]:
+    result = await db.execute(
+        select(CatalogoVersionModel.tabla, CatalogoVersionModel.version).where(CatalogoVersionModel.tabla.in_(tablas))
+    )
+    encontradas = dict(result.all())
+    return {tabla: encontradas.get(tabla, 0) for tabla in tablas}
+
+def etag_coincide(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match se compara en modo débil: W/"x" coincide con "x"
+    return etag in (valor.strip().removeprefix("W/") for valor in if_none_match.split(","))
+
+def etag_versiones(actuales: Dict[str, int], extra: str = "") -> str:
+    """ETag fuerte a partir de versiones ya leídas (y de ``extra``, si lo hay)."""
+    return '"' + "-".join([f"{tabla}.{version}" for tabla, version in actuales.items()] + ([extra] if extra else [])) + '"'
+
+def enviar_etag(response: Response, if_none_match: Optional[str], etag: str):
+    """Responde 304 si If-None-Match coincide con ``etag``; si no, la pone en la respuesta."""
+    if etag_coincide(if_none_match, etag):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+
+async def comprobar_etag(
+    db: AsyncSession, response: Response, if_none_match: Optional[str], tablas: Sequence[str], extra: str = ""
+) -> Dict[str, int]:
+    """ETag fuerte a partir de la versión de ``tablas``; 304 si If-None-Match coincide.
+
+    ``extra`` se añade a la ETag para los datos de la respuesta que no tienen
+    versión propia. Devuelve las versiones leídas.
+    """
+    actuales = await versiones(db, *tablas)
+    enviar_etag(response, if_none_match, etag_versiones(actuales, extra))
+    return actuales
+
+def etag_catalogo(*tablas: str):
+    """Dependencia para los GET del catálogo: ETag fuerte a partir de la versión de ``tablas``.
+
+    Si el cliente envía un If-None-Match que coincide se responde 304 sin
+    ejecutar el handler, con una sola consulta por clave primaria. Devuelve
+    las versiones leídas, por si el handler las necesita como clave de caché.
+    """
+    async def dependency(
+        response: Response,
+        if_none_match: Optional[str] = Header(None),
+        current_user: Principal = Depends(get_current_active_user),
+        db: AsyncSession = Depends(get_async_db),
+    ):
+        return await comprobar_etag(db, response, if_none_match, tablas)
+    return dependency
@@ -0,0 +1,55 @@
+from typing import Dict, NamedTuple, Sequence, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
+
+class Dependencia(NamedTuple):
+    """Filas que impiden borrar una referencia: las de ``columnas`` que la apuntan.
+
+    Con varias columnas (origen y destino de un movimiento) basta con que
+    cualquiera la apunte.
+    """
+    nombre: str
+    mensaje: str
+    columnas: Tuple[InstrumentedAttribute, ...]
+
+def dependencia(nombre: str, mensaje: str, *columnas: InstrumentedAttribute) -> Dependencia:
+    return Dependencia(nombre, mensaje, columnas)
+
+def _existe(dep: Dependencia, ref_id: int):
+    # Un EXISTS por columna y no uno con OR: así cada sondeo usa el índice de
+    # su clave foránea y se detiene en la primera fila
+    return or_(*(select(columna).where(columna == ref_id).exists() for columna in dep.columnas))
+
+def _contar(dep: Dependencia, ref_id: int):
+    tabla = dep.columnas[0].class_
+    return (
+        select(func.count()).select_from(tabla)
+        .where(or_(*(columna == ref_id for columna in dep.columnas)))
+        .scalar_subquery()
+    )
+
+async def contar_dependencias(db: AsyncSession, dependencias: Sequence[Dependencia], ref_id: int) -> Dict[str, int]:
+    result = await db.execute(select(*(_contar(dep, ref_id).label(dep.nombre) for dep in dependencias)))
+    return dict(result.one()._mapping)
+
+async def comprobar_dependencias(
+    db: AsyncSession, dependencias: Sequence[Dependencia], ref_id: int, contar: bool = False
+):
+    """Responde 400 si alguna fila de ``dependencias`` apunta a ``ref_id``.
+
+    Todas las comprobaciones van en una sola consulta de EXISTS, que se
+    detienen en la primera fila: nunca se cargan las colecciones de la
+    relación. Con ``contar`` y solo si hay conflicto, el detalle lleva además
+    cuántas filas hay de cada dependencia, lo que sí recorre el índice entero.
+    """
+    result = await db.execute(select(*(_existe(dep, ref_id).label(dep.nombre) for dep in dependencias)))
+    bloqueo = next((dep for dep, existe in zip(dependencias, result.one()) if existe), None)
+    if bloqueo is None:
+        return
+    detail = bloqueo.mensaje
+    if contar:
+        detail = {"mensaje": bloqueo.mensaje, "dependencias": await contar_dependencias(db, dependencias, ref_id)}
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
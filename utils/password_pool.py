@@ -0,0 +1,57 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# bcrypt libera el GIL mientras calcula el hash, así que un pool de hilos
+# basta para sacar ese trabajo del event loop sin el coste de procesos
+PASSWORD_POOL_WORKERS = 4
+# Trabajos admitidos a la vez (en ejecución + en cola); el resto recibe un 503
+PASSWORD_POOL_MAX_PENDING = 64
+
+class PasswordPoolSaturated(Exception):
+    """El pool de hashing tiene la cola llena."""
+
+class PasswordHashPool:
+    def __init__(self, max_workers: int = PASSWORD_POOL_WORKERS, max_pending: int = PASSWORD_POOL_MAX_PENDING):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        # Se crea al primer uso y de nuevo tras shutdown(), que llama el lifespan
+        self._executor = None
+        # _pending baja desde el hilo que termina el trabajo, no desde el event loop
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._rejected = 0
+
+    def _terminado(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise PasswordPoolSaturated()
+            self._pending += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password-hash")
+            executor = self._executor
+        # Si se cancela la petición el hilo sigue con el hash: el trabajo solo
+        # deja de contar cuando termina (o cuando se cancela antes de empezar)
+        future = executor.submit(fn, *args)
+        future.add_done_callback(self._terminado)
+        return await asyncio.wrap_future(future)
+
+    def stats(self):
+        return {
+            "workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "running": min(self._pending, self.max_workers),
+            "queued": max(self._pending - self.max_workers, 0),
+            "rejected": self._rejected,
+        }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
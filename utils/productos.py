@@ -0,0 +1,137 @@
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import case, delete, func, insert, literal, select, union_all
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.producto import Producto as ProductoModel
+from models.producto_token import ProductoToken as ProductoTokenModel
+
+# Longitud de producto_tokens.token; una palabra más larga se indexa truncada
+TOKEN_MAX_LENGTH = 50
+
+async def resolver_nombres(db: AsyncSession, modelo, nombres: Iterable[str]) -> Dict[str, List[int]]:
+    """Ids de cada nombre de ``modelo`` con una única consulta IN."""
+    encontrados: Dict[str, List[int]] = {}
+    nombres = list(nombres)
+    if nombres:
+        result = await db.execute(select(modelo.id, modelo.nombre).where(modelo.nombre.in_(nombres)).order_by(modelo.id))
+        for row in result:
+            encontrados.setdefault(row.nombre, []).append(row.id)
+    return encontrados
+
+async def ids_existentes(db: AsyncSession, modelo, ids: Iterable[int]) -> Set[int]:
+    """Cuáles de ``ids`` existen en ``modelo``, con una única consulta IN."""
+    ids = list(ids)
+    if not ids:
+        return set()
+    return set(await db.scalars(select(modelo.id).where(modelo.id.in_(ids))))
+
+async def upsert_productos(db: AsyncSession, filas: List[dict], actualizar: Iterable[str]):
+    """Inserta ``filas`` o, si el código ya existe, actualiza las columnas ``actualizar``.
+
+    Todas las filas deben traer las mismas claves: se envían como un único
+    executemany con la sentencia de upsert del dialecto. Se usa la tabla y no
+    la entidad porque el insert masivo del ORM agrupa las filas según qué
+    columnas traen a None y lanza una sentencia por grupo.
+    """
+    if not filas:
+        return
+    tabla = ProductoModel.__table__
+    if db.bind.dialect.name == "mysql":
+        stmt = mysql.insert(tabla)
+        stmt = stmt.on_duplicate_key_update({c: stmt.inserted[c] for c in actualizar})
+    else:
+        stmt = sqlite.insert(tabla)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[tabla.c.codigo],
+            set_={c: stmt.excluded[c] for c in actualizar},
+        )
+    await db.execute(stmt, filas)
+
+def tokens_busqueda(*textos: Optional[str]) -> List[str]:
+    """Palabras de ``textos`` en la forma en que se indexan: minúsculas, sin acentos, solo letras y dígitos."""
+    tokens = []
+    for texto in textos:
+        texto = unicodedata.normalize("NFKD", texto or "").encode("ascii", "ignore").decode().lower()
+        tokens += [token[:TOKEN_MAX_LENGTH] for token in re.findall(r"[a-z0-9]+", texto)]
+    return list(dict.fromkeys(tokens))
+
+def fin_de_prefijo(prefijo: str) -> Optional[str]:
+    """Menor cadena posterior a todas las que empiezan por ``prefijo``, o None si no hay cota.
+
+    Los tokens solo tienen [0-9a-z] y los dígitos van antes que las letras
+    en cualquier colación, así que ``token >= prefijo AND token < fin`` es un
+    rango sobre el índice tanto en SQLite como en MySQL (LIKE 'x%' no lo es
+    en SQLite, donde LIKE no distingue mayúsculas y la columna es BINARY).
+    """
+    while prefijo:
+        ultimo = prefijo[-1]
+        if ultimo != "z":
+            return prefijo[:-1] + ("a" if ultimo == "9" else chr(ord(ultimo) + 1))
+        prefijo = prefijo[:-1]
+    return None
+
+async def desindexar_productos(db: AsyncSession, producto_ids: Iterable[int]):
+    ids = list(producto_ids)
+    if ids:
+        await db.execute(delete(ProductoTokenModel).where(ProductoTokenModel.producto_id.in_(ids)))
+
+async def indexar_productos(db: AsyncSession, producto_ids: Iterable[int]):
+    """Vuelve a generar los tokens de búsqueda de ``producto_ids`` (sin confirmar)."""
+    ids = list(producto_ids)
+    await desindexar_productos(db, ids)
+    if not ids:
+        return
+    result = await db.execute(
+        select(ProductoModel.id, ProductoModel.codigo, ProductoModel.nombre).where(ProductoModel.id.in_(ids))
+    )
+    filas = [{"token": token, "producto_id": row.id} for row in result for token in tokens_busqueda(row.codigo, row.nombre)]
+    if filas:
+        await db.execute(insert(ProductoTokenModel.__table__), filas)
+
+def consulta_busqueda(q: str, columnas, limit: int):
+    """Productos cuyo código o nombre tiene, para cada palabra de ``q``, una palabra que empieza por ella.
+
+    Cada palabra de la búsqueda es un rango sobre producto_tokens; el producto
+    debe aparecer en todos. Primero el código exacto, luego los que más
+    palabras completas coinciden y después por nombre. None si ``q`` no tiene
+    ninguna palabra.
+    """
+    terminos = tokens_busqueda(q)
+    if not terminos:
+        return None
+
+    coincidencias = []
+    for indice, termino in enumerate(terminos):
+        condiciones = [ProductoTokenModel.token >= termino]
+        fin = fin_de_prefijo(termino)
+        if fin is not None:
+            condiciones.append(ProductoTokenModel.token < fin)
+        coincidencias.append(
+            select(
+                ProductoTokenModel.producto_id,
+                literal(indice).label("termino"),
+                case((ProductoTokenModel.token == termino, 1), else_=0).label("exacto"),
+            ).where(*condiciones)
+        )
+    coincidencias = union_all(*coincidencias).subquery()
+    ranking = (
+        select(coincidencias.c.producto_id, func.sum(coincidencias.c.exacto).label("exactos"))
+        .group_by(coincidencias.c.producto_id)
+        .having(func.count(func.distinct(coincidencias.c.termino)) == len(terminos))
+        .subquery()
+    )
+    return (
+        select(*columnas)
+        .join(ranking, ranking.c.producto_id == ProductoModel.id)
+        .order_by(
+            case((ProductoModel.codigo == q.strip(), 0), else_=1),
+            ranking.c.exactos.desc(),
+            ProductoModel.nombre,
+            ProductoModel.id,
+        )
+        .limit(limit)
+    )
@@ -0,0 +1,67 @@
+from typing import Dict, Iterable, Optional
+
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.categoria import Categoria as CategoriaModel
+from models.tipo_movimiento import TipoMovimiento as TipoMovimientoModel
+from models.ubicacion import Ubicacion as UbicacionModel
+from schemas.categoria import CategoriaResponse
+from schemas.tipo_movimiento import TipoMovimientoResponse
+from schemas.ubicacion import UbicacionResponse
+from utils.cache import TTLCache
+
+# Tablas de referencia que casi nunca cambian. Cada ruta que las modifica
+# invalida la entrada en este proceso; en los demás el cambio tarda como
+# mucho esto en verse
+REFERENCIAS_CACHE_TTL_SECONDS = 60
+REFERENCIAS_CACHE_SIZE = 10_000
+
+# Por tabla, la caché (id -> (versión, esquema de respuesta)) y el esquema con que se
+# copia la fila: se guarda una copia sin sesión ORM, como en principal_cache
+referencias_cache = {
+    TipoMovimientoModel: (TTLCache(maxsize=REFERENCIAS_CACHE_SIZE, ttl=REFERENCIAS_CACHE_TTL_SECONDS), TipoMovimientoResponse),
+    UbicacionModel: (TTLCache(maxsize=REFERENCIAS_CACHE_SIZE, ttl=REFERENCIAS_CACHE_TTL_SECONDS), UbicacionResponse),
+    CategoriaModel: (TTLCache(maxsize=REFERENCIAS_CACHE_SIZE, ttl=REFERENCIAS_CACHE_TTL_SECONDS), CategoriaResponse),
+}
+
+async def obtener_referencias(
+    db: AsyncSession, modelo, ids: Iterable[int], version: Optional[int] = None
+) -> Dict[int, BaseModel]:
+    """Filas de ``modelo`` por id: de la caché y, las que falten, con una única consulta IN.
+
+    Los ids que no existen no aparecen en el resultado (y no se guardan, para
+    que una fila creada desde otro proceso se vea en la siguiente consulta).
+    Con ``version`` (la de catalogo_versiones leída antes) solo valen las
+    entradas guardadas con esa misma versión: un GET con ETag no devuelve una
+    fila que otro proceso ya ha modificado.
+    """
+    cache, schema = referencias_cache[modelo]
+    encontradas, faltan = {}, set()
+    for ref_id in set(ids):
+        entrada = cache.get(ref_id)
+        if entrada is None or (version is not None and entrada[0] != version):
+            faltan.add(ref_id)
+        else:
+            encontradas[ref_id] = entrada[1]
+
+    if faltan:
+        for fila in await db.scalars(select(modelo).where(modelo.id.in_(faltan))):
+            ref = schema.model_validate(fila)
+            cache.set(ref.id, (version, ref))
+            encontradas[ref.id] = ref
+    return encontradas
+
+async def obtener_referencia(db: AsyncSession, modelo, ref_id: int, version: Optional[int] = None) -> Optional[BaseModel]:
+    return (await obtener_referencias(db, modelo, [ref_id], version)).get(ref_id)
+
+def invalidar_referencia(modelo, ref_id: int):
+    referencias_cache[modelo][0].pop(ref_id)
+
+def limpiar_referencias():
+    for cache, _ in referencias_cache.values():
+        cache.clear()
+
+def stats_referencias():
+    return {modelo.__tablename__: cache.stats() for modelo, (cache, _) in referencias_cache.items()}
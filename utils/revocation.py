@@ -0,0 +1,100 @@
+import math
+import time
+from collections import OrderedDict
+from typing import Optional
+
+# Cada cuánto se traen de la base las revocaciones hechas por otros procesos.
+# Es el retraso máximo con el que un logout en otro worker llega a este.
+REVOCATION_SYNC_SECONDS = 2
+# Un token revocado debe seguir en el filtro hasta que expire; como cada
+# generación convive con la anterior, basta con que dure más que un token
+REVOCATION_GENERATION_SECONDS = 60 * 60
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, digest: bytes):
+        # Doble hashing sobre el SHA-256 que ya identifica al token
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:16], "big") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, digest: bytes):
+        for position in self._positions(digest):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, digest: bytes):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(digest))
+
+class RevocationCache:
+    """Filtro local de tokens revocados.
+
+    El filtro de Bloom responde "seguro que no está revocado" sin ir a la base;
+    el conjunto exacto (con caducidad) confirma las revocaciones recientes. Solo
+    los positivos del Bloom que no están en el conjunto exacto se consultan.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 100_000,
+        error_rate: float = 0.001,
+        max_exact: int = 10_000,
+        generation_seconds: float = REVOCATION_GENERATION_SECONDS,
+        sync_seconds: float = REVOCATION_SYNC_SECONDS,
+    ):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.max_exact = max_exact
+        self.generation_seconds = generation_seconds
+        self.sync_seconds = sync_seconds
+        self.clear()
+
+    def clear(self):
+        self._current = BloomFilter(self.capacity, self.error_rate)
+        self._previous = BloomFilter(self.capacity, self.error_rate)
+        self._generation_started = time.monotonic()
+        self._exact = OrderedDict()
+        self.watermark = 0
+        self._last_sync = None
+
+    def _rotate_if_needed(self):
+        now = time.monotonic()
+        if now - self._generation_started >= self.generation_seconds:
+            self._previous = self._current
+            self._current = BloomFilter(self.capacity, self.error_rate)
+            self._generation_started = now
+
+    def add(self, token_hash: str, expires_at: Optional[float] = None):
+        """Registra una revocación; ``token_hash`` es el digest hex guardado en token_blacklist."""
+        if expires_at is not None and expires_at <= time.time():
+            return
+        self._rotate_if_needed()
+        digest = bytes.fromhex(token_hash)
+        self._current.add(digest)
+        self._exact[digest] = expires_at
+        self._exact.move_to_end(digest)
+        while len(self._exact) > self.max_exact:
+            self._exact.popitem(last=False)
+
+    def check(self, token_hash: str) -> Optional[bool]:
+        """True si está revocado, False si seguro que no, None si hay que preguntar a la base."""
+        self._rotate_if_needed()
+        digest = bytes.fromhex(token_hash)
+        if digest not in self._current and digest not in self._previous:
+            return False
+        if digest in self._exact:
+            expires_at = self._exact[digest]
+            if expires_at is None or expires_at > time.time():
+                return True
+            del self._exact[digest]
+        return None
+
+    def needs_sync(self) -> bool:
+        return self._last_sync is None or time.monotonic() - self._last_sync >= self.sync_seconds
+
+    def mark_synced(self, watermark: int):
+        self.watermark = max(self.watermark, watermark)
+        self._last_sync = time.monotonic()
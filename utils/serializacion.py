@@ -0,0 +1,88 @@
+import csv
+import io
+from decimal import Decimal
+from typing import List, Optional, Sequence, Tuple
+
+import orjson
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# Filas que se piden al cursor y se envían al cliente de cada vez
+EXPORT_CHUNK_ROWS = 1000
+
+class Proyeccion:
+    """Columnas de un esquema de respuesta y construcción directa de su JSON.
+
+    Para los listados grandes: en lugar de cargar entidades ORM y validarlas
+    una a una con ``response_model``, se seleccionan solo las columnas de
+    ``schema`` (y de sus esquemas anidados, con su propia ``Proyeccion``) y
+    cada fila se convierte en un dict con la misma forma que produciría
+    Pydantic. Los anidados opcionales (outer join) valen None si no hay fila.
+    """
+
+    def __init__(self, schema: type[BaseModel], entidad, **anidados: "Proyeccion"):
+        self.schema = schema
+        self.entidad = entidad
+        self.anidados = anidados
+        self.campos = [campo for campo in schema.model_fields if campo not in anidados]
+        self.columnas = [getattr(entidad, campo) for campo in self.campos]
+        for proyeccion in anidados.values():
+            self.columnas += proyeccion.columnas
+
+    def construir(self, fila: Sequence, inicio: int = 0) -> Tuple[Optional[dict], int]:
+        fin = inicio + len(self.campos)
+        valores = dict(zip(self.campos, fila[inicio:fin]))
+        for campo, proyeccion in self.anidados.items():
+            valores[campo], fin = proyeccion.construir(fila, fin)
+        if "id" in valores and valores["id"] is None:
+            return None, fin
+        return {campo: valores[campo] for campo in self.schema.model_fields}, fin
+
+    def lista(self, filas) -> List[dict]:
+        return [self.construir(fila)[0] for fila in filas]
+
+def respuesta_json(contenido, response: Response) -> ORJSONResponse:
+    """Respuesta codificada con orjson, conservando las cabeceras ya puestas en ``response``.
+
+    Al devolver una Response propia FastAPI ignora la de las dependencias
+    (ETag, cursores...), así que se copian aquí.
+    """
+    respuesta = ORJSONResponse(contenido)
+    for clave, valor in response.headers.items():
+        if clave != "content-length":
+            respuesta.headers[clave] = valor
+    return respuesta
+
+def _json_default(valor):
+    # Las sumas pueden llegar como Decimal según el driver
+    if isinstance(valor, Decimal):
+        return float(valor)
+    raise TypeError
+
+async def exportar_filas(engine: AsyncEngine, query, formato: str):
+    """Cuerpo de una StreamingResponse con las filas de ``query`` en CSV (con cabecera) o NDJSON."""
+    # Conexión propia: la sesión de la petición se cierra antes de que
+    # empiece a enviarse el cuerpo. stream() usa un cursor del lado del
+    # servidor, así que solo hay un bloque de filas en memoria a la vez
+    async with engine.connect() as conn:
+        result = await conn.stream(query)
+        if formato == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(result.keys())
+            async for filas in result.partitions(EXPORT_CHUNK_ROWS):
+                writer.writerows(filas)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        else:
+            # Con orjson, como las respuestas JSON de la API: fechas en ISO 8601.
+            # orjson solo admite claves str exactas y algunas etiquetas son quoted_name
+            keys = [str(key) for key in result.keys()]
+            async for filas in result.partitions(EXPORT_CHUNK_ROWS):
+                yield b"".join(
+                    orjson.dumps(dict(zip(keys, fila)), default=_json_default, option=orjson.OPT_APPEND_NEWLINE)
+                    for fila in filas
+                )
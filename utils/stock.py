@@ -0,0 +1,349 @@
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple, Union
+
+from sqlalchemy import DateTime, and_, case, delete, func, insert, literal, or_, select, union_all, update
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.catalogo_version import CatalogoVersion as CatalogoVersionModel
+from models.movimiento_diario import MovimientoDiario as MovimientoDiarioModel
+from models.movimiento_inventario import MovimientoInventario as MovimientoModel
+from models.producto import Producto as ProductoModel
+from models.stock import Stock as StockModel
+from models.stock_snapshot import StockSnapshot as StockSnapshotModel
+from models.tipo_movimiento import TipoMovimiento as TipoMovimientoModel
+from models.ubicacion import Ubicacion as UbicacionModel
+from utils.etag import registrar_cambio
+
+# Las dos operaciones son una sola sentencia: la base serializa las
+# escrituras sobre la fila y no hay ventana entre la lectura y la escritura
+# en la que otro movimiento pueda colarse.
+
+async def descontar_stock(db: AsyncSession, producto_id: int, ubicacion_id: int, cantidad: float) -> bool:
+    """Resta ``cantidad`` solo si hay existencias suficientes; False si no las hay."""
+    result = await db.execute(
+        update(StockModel)
+        .where(
+            StockModel.producto_id == producto_id,
+            StockModel.ubicacion_id == ubicacion_id,
+            StockModel.cantidad >= cantidad,
+        )
+        .values(cantidad=StockModel.cantidad - cantidad)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+async def sumar_stock(db: AsyncSession, producto_id: int, ubicacion_id: int, cantidad: float):
+    """Suma ``cantidad``, creando el registro de stock si aún no existe."""
+    await sumar_stock_lote(db, [{"producto_id": producto_id, "ubicacion_id": ubicacion_id, "cantidad": cantidad}])
+
+async def sumar_stock_lote(db: AsyncSession, filas: List[dict]):
+    """Como ``sumar_stock`` para varias parejas producto-ubicación en una sola sentencia."""
+    if not filas:
+        return
+    if db.bind.dialect.name == "mysql":
+        stmt = mysql.insert(StockModel).values(filas)
+        stmt = stmt.on_duplicate_key_update(cantidad=StockModel.cantidad + stmt.inserted.cantidad)
+    else:
+        stmt = sqlite.insert(StockModel).values(filas)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[StockModel.producto_id, StockModel.ubicacion_id],
+            set_={"cantidad": StockModel.cantidad + stmt.excluded.cantidad},
+        )
+    await db.execute(stmt)
+
+async def stock_disponible(db: AsyncSession, producto_id: int, ubicacion_id: int) -> float:
+    cantidad = await db.scalar(select(StockModel.cantidad).where(
+        StockModel.producto_id == producto_id,
+        StockModel.ubicacion_id == ubicacion_id
+    ))
+    return cantidad or 0
+
+async def ajustar_stock_total(db: AsyncSession, variaciones: Dict[int, float]):
+    """Aplica a productos.stock_total la variación neta de cada producto.
+
+    Debe llamarse en la misma transacción que el cambio en stocks, así el
+    total nunca se ve desfasado respecto a las ubicaciones. No registra cambio
+    de versión: solo bloquea la fila de cada producto y no una común a todas
+    las escrituras de stock.
+    """
+    # En orden de id, para que dos transacciones no se bloqueen mutuamente
+    cambios = sorted((p, c) for p, c in variaciones.items() if p is not None and c)
+    for producto_id, cantidad in cambios:
+        await db.execute(
+            update(ProductoModel)
+            .where(ProductoModel.id == producto_id)
+            .values(stock_total=ProductoModel.stock_total + cantidad)
+            .execution_options(synchronize_session=False)
+        )
+
+# La versión de las existencias se reparte en filas de catalogo_versiones
+# ("stocks.0", "stocks.1", ...) según el producto. Cada escritura de stock
+# incrementa la fila de sus productos, que comparte con pocos más: no hay una
+# fila común a todas las ventas, y la versión es la suma de todas.
+STOCK_VERSION_SHARDS = 64
+
+async def registrar_cambio_stock(db: AsyncSession, producto_ids):
+    """Incrementa la versión de las existencias de ``producto_ids`` (al final de la transacción, como registrar_cambio)."""
+    tablas = {f"stocks.{producto_id % STOCK_VERSION_SHARDS}" for producto_id in producto_ids if producto_id is not None}
+    if tablas:
+        await registrar_cambio(db, *tablas)
+
+async def version_stock(db: AsyncSession) -> int:
+    """Versión de las existencias: cambia con cada escritura en stocks o en stock_total."""
+    return await db.scalar(
+        select(func.coalesce(func.sum(CatalogoVersionModel.version), 0))
+        .where(CatalogoVersionModel.tabla.like("stocks.%"))
+    )
+
+async def diferencias_stock_total(db: AsyncSession, tolerancia: float = 1e-6) -> List[dict]:
+    """Productos cuyo stock_total no coincide con la suma de sus stocks."""
+    suma = (
+        select(StockModel.producto_id, func.sum(StockModel.cantidad).label("suma"))
+        .group_by(StockModel.producto_id)
+        .subquery()
+    )
+    real = func.coalesce(suma.c.suma, 0)
+    result = await db.execute(
+        select(ProductoModel.id, ProductoModel.stock_total, real.label("suma"))
+        .outerjoin(suma, suma.c.producto_id == ProductoModel.id)
+        .where(func.abs(ProductoModel.stock_total - real) > tolerancia)
+        .order_by(ProductoModel.id)
+    )
+    return [{"producto_id": row.id, "stock_total": row.stock_total, "suma": row.suma} for row in result]
+
+async def tomar_snapshot(db: AsyncSession, fecha: Optional[datetime] = None) -> int:
+    """Copia la tabla stocks en stock_snapshots con una única sentencia (sin confirmar)."""
+    fecha = fecha or datetime.now()
+    result = await db.execute(
+        insert(StockSnapshotModel).from_select(
+            ["fecha", "producto_id", "ubicacion_id", "cantidad"],
+            select(literal(fecha, DateTime), StockModel.producto_id, StockModel.ubicacion_id, StockModel.cantidad)
+            .where(StockModel.producto_id.is_not(None), StockModel.ubicacion_id.is_not(None))
+        )
+    )
+    return result.rowcount
+
+async def borrar_snapshots(db: AsyncSession, producto_id: Optional[int] = None, ubicacion_id: Optional[int] = None):
+    """Borra las copias de un producto o de una ubicación que se va a eliminar.
+
+    Las rutas solo borran cuando no hay stock ni movimientos, así que estas
+    filas vienen de existencias dadas de alta y de baja directamente en
+    /stocks; sin ellas la clave foránea impediría el borrado.
+    """
+    query = delete(StockSnapshotModel)
+    if producto_id is not None:
+        query = query.where(StockSnapshotModel.producto_id == producto_id)
+    if ubicacion_id is not None:
+        query = query.where(StockSnapshotModel.ubicacion_id == ubicacion_id)
+    await db.execute(query)
+
+async def stock_en_fecha(
+    db: AsyncSession,
+    fecha: datetime,
+    producto_id: Optional[int] = None,
+    ubicacion_id: Optional[int] = None,
+) -> Tuple[Optional[datetime], Dict[Tuple[int, int], float]]:
+    """Existencias por (producto, ubicación) en ``fecha``.
+
+    Parte de la última copia anterior o igual a ``fecha`` y le aplica los
+    movimientos posteriores, así que el coste depende del intervalo entre
+    copias y no de todo el historial. Sin copia previa se reconstruye desde el
+    primer movimiento. Devuelve también la fecha de la copia usada.
+
+    Los cambios hechos directamente en /stocks (alta, edición o baja) no son
+    movimientos: solo se ven a partir de la siguiente copia, y entre la
+    anterior y esa fecha la respuesta no los incluye.
+    """
+    desde = await db.scalar(select(func.max(StockSnapshotModel.fecha)).where(StockSnapshotModel.fecha <= fecha))
+    
+    existencias = {}
+    if desde is not None:
+        query = select(StockSnapshotModel.producto_id, StockSnapshotModel.ubicacion_id, StockSnapshotModel.cantidad) \
+            .where(StockSnapshotModel.fecha == desde)
+        if producto_id:
+            query = query.where(StockSnapshotModel.producto_id == producto_id)
+        if ubicacion_id:
+            query = query.where(StockSnapshotModel.ubicacion_id == ubicacion_id)
+        for row in await db.execute(query):
+            existencias[(row.producto_id, row.ubicacion_id)] = row.cantidad
+    
+    # Cada movimiento suma en su destino y resta en su origen según su tipo
+    tramos = [
+        (MovimientoModel.ubicacion_destino_id, ("entrada", "transferencia"), 1),
+        (MovimientoModel.ubicacion_origen_id, ("salida", "transferencia"), -1),
+    ]
+    for columna, tipos, signo in tramos:
+        query = (
+            select(MovimientoModel.producto_id, columna.label("ubicacion_id"), func.sum(MovimientoModel.cantidad).label("cantidad"))
+            .join(TipoMovimientoModel, TipoMovimientoModel.id == MovimientoModel.tipo_movimiento_id)
+            .where(TipoMovimientoModel.afecta_stock.in_(tipos), MovimientoModel.fecha <= fecha, columna.is_not(None))
+            .group_by(MovimientoModel.producto_id, columna)
+        )
+        if desde is not None:
+            query = query.where(MovimientoModel.fecha > desde)
+        if producto_id:
+            query = query.where(MovimientoModel.producto_id == producto_id)
+        if ubicacion_id:
+            query = query.where(columna == ubicacion_id)
+        for row in await db.execute(query):
+            clave = (row.producto_id, row.ubicacion_id)
+            existencias[clave] = existencias.get(clave, 0) + signo * row.cantidad
+    
+    return desde, existencias
+
+def tramos_diarios(movimiento, afecta_stock: str) -> List[dict]:
+    """Filas de movimientos_diarios de un movimiento: entrada en su destino y salida en su origen según el tipo.
+
+    El movimiento se cuenta una sola vez, en el primer tramo: una transferencia
+    cuenta en su destino y su salida del origen lleva ``movimientos`` 0.
+    """
+    base = {"fecha": movimiento.fecha.date(), "producto_id": movimiento.producto_id,
+            "tipo_movimiento_id": movimiento.tipo_movimiento_id}
+    tramos = []
+    if afecta_stock in ("entrada", "transferencia") and movimiento.ubicacion_destino_id:
+        tramos.append({**base, "ubicacion_id": movimiento.ubicacion_destino_id, "entradas": movimiento.cantidad, "salidas": 0,
+                       "movimientos": 1})
+    if afecta_stock in ("salida", "transferencia") and movimiento.ubicacion_origen_id:
+        tramos.append({**base, "ubicacion_id": movimiento.ubicacion_origen_id, "entradas": 0, "salidas": movimiento.cantidad,
+                       "movimientos": 0 if tramos else 1})
+    return tramos
+
+async def sumar_movimientos_diarios(db: AsyncSession, tramos: List[dict]):
+    """Acumula ``tramos`` en movimientos_diarios con una sola sentencia (sin confirmar)."""
+    filas = {}
+    for tramo in tramos:
+        clave = (tramo["fecha"], tramo["producto_id"], tramo["ubicacion_id"], tramo["tipo_movimiento_id"])
+        if clave in filas:
+            for columna in ("entradas", "salidas", "movimientos"):
+                filas[clave][columna] += tramo[columna]
+        else:
+            filas[clave] = dict(tramo)
+    if not filas:
+        return
+    # En orden de clave, como sumar_stock_lote, para no bloquearse con otro lote
+    filas = [filas[clave] for clave in sorted(filas)]
+    if db.bind.dialect.name == "mysql":
+        stmt = mysql.insert(MovimientoDiarioModel).values(filas)
+        stmt = stmt.on_duplicate_key_update({
+            c: getattr(MovimientoDiarioModel, c) + stmt.inserted[c] for c in ("entradas", "salidas", "movimientos")
+        })
+    else:
+        stmt = sqlite.insert(MovimientoDiarioModel).values(filas)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[MovimientoDiarioModel.fecha, MovimientoDiarioModel.producto_id,
+                            MovimientoDiarioModel.ubicacion_id, MovimientoDiarioModel.tipo_movimiento_id],
+            set_={c: getattr(MovimientoDiarioModel, c) + stmt.excluded[c] for c in ("entradas", "salidas", "movimientos")},
+        )
+    await db.execute(stmt)
+
+async def reconstruir_movimientos_diarios(db: AsyncSession, desde: date, hasta: date) -> int:
+    """Recalcula movimientos_diarios entre ``desde`` y ``hasta`` (incluidos) desde movimientos_inventario (sin confirmar).
+
+    Borra los días del intervalo y los vuelve a llenar con un INSERT ... SELECT
+    agrupado, sin traer los movimientos a Python.
+    """
+    await db.execute(delete(MovimientoDiarioModel).where(
+        MovimientoDiarioModel.fecha >= desde, MovimientoDiarioModel.fecha <= hasta
+    ))
+    # Mismos tramos que tramos_diarios: el destino como entrada y el origen
+    # como salida; el origen de una transferencia con destino no se cuenta
+    dia = func.date(MovimientoModel.fecha)
+    con_destino = and_(TipoMovimientoModel.afecta_stock == "transferencia", MovimientoModel.ubicacion_destino_id.is_not(None))
+    tramos = [
+        (MovimientoModel.ubicacion_destino_id, ("entrada", "transferencia"), MovimientoModel.cantidad, literal(0.0), literal(1)),
+        (MovimientoModel.ubicacion_origen_id, ("salida", "transferencia"), literal(0.0), MovimientoModel.cantidad,
+         case((con_destino, 0), else_=1)),
+    ]
+    tramos = union_all(*[
+        select(
+            dia.label("fecha"), MovimientoModel.producto_id, columna.label("ubicacion_id"),
+            MovimientoModel.tipo_movimiento_id, entradas.label("entradas"), salidas.label("salidas"),
+            movimientos.label("movimientos"),
+        )
+        .join(TipoMovimientoModel, TipoMovimientoModel.id == MovimientoModel.tipo_movimiento_id)
+        .where(
+            TipoMovimientoModel.afecta_stock.in_(tipos), columna.is_not(None),
+            # Rango sobre la columna y no sobre date(fecha), para usar el índice
+            MovimientoModel.fecha >= datetime.combine(desde, datetime.min.time()),
+            MovimientoModel.fecha < datetime.combine(hasta, datetime.min.time()) + timedelta(days=1),
+        )
+        for columna, tipos, entradas, salidas, movimientos in tramos
+    ]).subquery()
+    result = await db.execute(
+        insert(MovimientoDiarioModel).from_select(
+            ["fecha", "producto_id", "ubicacion_id", "tipo_movimiento_id", "entradas", "salidas", "movimientos"],
+            select(
+                tramos.c.fecha, tramos.c.producto_id, tramos.c.ubicacion_id, tramos.c.tipo_movimiento_id,
+                func.sum(tramos.c.entradas), func.sum(tramos.c.salidas), func.sum(tramos.c.movimientos),
+            ).group_by(tramos.c.fecha, tramos.c.producto_id, tramos.c.ubicacion_id, tramos.c.tipo_movimiento_id)
+        )
+    )
+    return result.rowcount
+
+def consulta_kardex(
+    producto_id: int,
+    ubicacion_id: Optional[int] = None,
+    fecha_desde: Optional[datetime] = None,
+    fecha_hasta: Optional[Union[datetime, date]] = None,
+):
+    """Kardex de un producto: cada movimiento en cada ubicación con el saldo que deja en ella.
+
+    Como en stock_en_fecha, un movimiento es una entrada en su destino y una
+    salida en su origen según el afecta_stock de su tipo; uno que no mueve
+    stock ("ninguno") aparece una sola vez con variación 0, en su destino o,
+    si no tiene, en su origen. El saldo es una suma acumulada (función de
+    ventana) por ubicación en orden de fecha e id, calculada en la base sobre
+    todo el historial anterior: ``fecha_desde`` solo recorta las filas
+    devueltas, no el saldo de partida. Un ``fecha_hasta`` sin hora (date)
+    incluye todo ese día.
+    """
+    afecta_stock = TipoMovimientoModel.afecta_stock
+    tramos = []
+    for columna, tipos, signo, sin_stock in (
+        (MovimientoModel.ubicacion_destino_id, ("entrada", "transferencia"), 1, afecta_stock == "ninguno"),
+        (MovimientoModel.ubicacion_origen_id, ("salida", "transferencia"), -1,
+         and_(afecta_stock == "ninguno", MovimientoModel.ubicacion_destino_id.is_(None))),
+    ):
+        query = (
+            select(
+                MovimientoModel.fecha,
+                MovimientoModel.id.label("movimiento_id"),
+                columna.label("ubicacion_id"),
+                TipoMovimientoModel.codigo.label("tipo_movimiento"),
+                MovimientoModel.referencia,
+                (case((afecta_stock.in_(tipos), signo), else_=0) * MovimientoModel.cantidad).label("variacion"),
+            )
+            .join(TipoMovimientoModel, TipoMovimientoModel.id == MovimientoModel.tipo_movimiento_id)
+            # Cada tramo solo con los tipos que mueven stock en esa ubicación
+            .where(MovimientoModel.producto_id == producto_id, columna.is_not(None), or_(afecta_stock.in_(tipos), sin_stock))
+        )
+        if ubicacion_id:
+            query = query.where(columna == ubicacion_id)
+        # El saldo solo mira hacia atrás, así que el final del rango sí se puede filtrar antes
+        if isinstance(fecha_hasta, datetime):
+            query = query.where(MovimientoModel.fecha <= fecha_hasta)
+        elif fecha_hasta:
+            query = query.where(MovimientoModel.fecha < datetime.combine(fecha_hasta + timedelta(days=1), datetime.min.time()))
+        tramos.append(query)
+    tramos = union_all(*tramos).subquery()
+
+    orden = (tramos.c.fecha, tramos.c.movimiento_id)
+    kardex = select(
+        tramos,
+        func.sum(tramos.c.variacion).over(partition_by=tramos.c.ubicacion_id, order_by=orden, rows=(None, 0)).label("saldo"),
+    ).subquery()
+    query = (
+        select(
+            kardex.c.fecha, kardex.c.movimiento_id, kardex.c.ubicacion_id, UbicacionModel.nombre.label("ubicacion"),
+            kardex.c.tipo_movimiento, kardex.c.referencia,
+            case((kardex.c.variacion > 0, kardex.c.variacion), else_=0).label("entrada"),
+            case((kardex.c.variacion < 0, -kardex.c.variacion), else_=0).label("salida"),
+            kardex.c.saldo,
+        )
+        .join(UbicacionModel, UbicacionModel.id == kardex.c.ubicacion_id)
+        .order_by(kardex.c.ubicacion_id, kardex.c.fecha, kardex.c.movimiento_id)
+    )
+    if fecha_desde:
+        query = query.where(kardex.c.fecha >= fecha_desde)
+    return query
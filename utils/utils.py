@@ -1,15 +1,31 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Optional
+import hashlib
+import time
+import uuid
 import jwt
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from models.user import TokenBlacklist
+from utils.password_pool import PasswordHashPool
+from utils.revocation import RevocationCache
+from utils.cache import TTLCache
 
 SECRET_KEY = "mysecretkey"
 ALGORITHM = "HS256"
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+password_hash_pool = PasswordHashPool()
+revocation_cache = RevocationCache()
+# Claims ya verificados por digest del token; cada entrada vive hasta el exp.
+# La revocación no pasa por aquí: is_token_blacklisted se consulta siempre.
+decoded_token_cache = TTLCache(maxsize=10_000, ttl=15 * 60)
+# Filas ya vistas que se vuelven a leer en cada sincronización, por si un id
+# menor se confirmó después que uno mayor
+REVOCATION_SYNC_OVERLAP = 100
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -17,16 +33,24 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    # El jti identifica al token en token_blacklist sin guardar el JWT completo
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 def decode_access_token(token: str):
+    key = hashlib.sha256(token.encode()).digest()
+    payload = decoded_token_cache.get(key)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
     except jwt.PyJWTError:
         return None
+    remaining = payload["exp"] - time.time() if "exp" in payload else None
+    if remaining is None or remaining > 0:
+        decoded_token_cache.set(key, payload, ttl=remaining)
+    return payload
 
 def get_password_hash(password: str):
     return pwd_context.hash(password)
@@ -34,10 +58,72 @@ def get_password_hash(password: str):
 def verify_password(plain_password: str, hashed_password: str):
     return pwd_context.verify(plain_password, hashed_password)
 
-def is_token_blacklisted(token: str, db: Session):
-    return db.query(TokenBlacklist).filter(TokenBlacklist.token == token).first() is not None
+async def get_password_hash_async(password: str):
+    return await password_hash_pool.run(get_password_hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str):
+    return await password_hash_pool.run(verify_password, plain_password, hashed_password)
+
+def token_revocation_hash(token: str, payload: dict) -> str:
+    # Los tokens emitidos antes de incluir jti se identifican por el token completo
+    key = payload.get("jti") or token
+    return hashlib.sha256(key.encode()).hexdigest()
+
+def _unverified_payload(token: str) -> dict:
+    try:
+        return jwt.decode(token, options={"verify_signature": False, "verify_exp": False})
+    except jwt.PyJWTError:
+        return {}
+
+def _utc_timestamp(value: datetime) -> float:
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+async def sync_revocation_cache(db: AsyncSession):
+    result = await db.execute(
+        select(TokenBlacklist.id, TokenBlacklist.token_hash, TokenBlacklist.expires_at)
+        .where(
+            TokenBlacklist.id > revocation_cache.watermark - REVOCATION_SYNC_OVERLAP,
+            TokenBlacklist.expires_at > datetime.utcnow()
+        )
+        .order_by(TokenBlacklist.id)
+    )
+    watermark = revocation_cache.watermark
+    for row_id, token_hash, expires_at in result:
+        revocation_cache.add(token_hash, _utc_timestamp(expires_at))
+        watermark = row_id
+    revocation_cache.mark_synced(watermark)
+
+async def _is_token_blacklisted_db(token_hash: str, db: AsyncSession):
+    result = await db.execute(select(TokenBlacklist.id).where(TokenBlacklist.token_hash == token_hash).limit(1))
+    return result.first() is not None
+
+async def is_token_blacklisted(token: str, db: AsyncSession, payload: Optional[dict] = None):
+    if payload is None:
+        payload = _unverified_payload(token)
+    token_hash = token_revocation_hash(token, payload)
+    if revocation_cache.needs_sync():
+        await sync_revocation_cache(db)
+    cached = revocation_cache.check(token_hash)
+    if cached is not None:
+        return cached
+    return await _is_token_blacklisted_db(token_hash, db)
+
+async def add_token_to_blacklist(token: str, db: AsyncSession):
+    payload = decode_access_token(token)
+    if payload is None:
+        # Firma inválida o ya expirado: el token no sirve y no hay nada que guardar
+        return
+    token_hash = token_revocation_hash(token, payload)
+    expires_at = datetime.utcfromtimestamp(payload["exp"])
+    db.add(TokenBlacklist(token_hash=token_hash, expires_at=expires_at))
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Logout repetido con el mismo token
+        await db.rollback()
+    revocation_cache.add(token_hash, float(payload["exp"]))
 
-def add_token_to_blacklist(token: str, db: Session):
-    blacklisted_token = TokenBlacklist(token=token)
-    db.add(blacklisted_token)
-    db.commit()
+async def purge_expired_tokens(db: AsyncSession) -> int:
+    result = await db.execute(delete(TokenBlacklist).where(TokenBlacklist.expires_at <= datetime.utcnow()))
+    await db.commit()
+    return result.rowcount